@@ -1,9 +1,13 @@
+const crypto = require('crypto');
 const runAgent = require('../utils/agentRunner');
 const PocReport = require('../models/PocReport');
 
 // Rate limiting and quota management
+// With AGENT_QUOTA_SCHEDULER=python, every Gemini call is metered by the shared token-bucket
+// scheduler in python-agents/utils/quota.py, so this in-process limiter stands aside.
 class ApiRateLimiter {
     constructor() {
+        this.enabled = process.env.AGENT_QUOTA_SCHEDULER !== 'python';
         this.requestCount = 0;
         this.windowStart = Date.now();
         this.windowSize = 60000; // 1 minute window
@@ -13,6 +17,9 @@ class ApiRateLimiter {
     }
 
     async waitForRateLimit() {
+        if (!this.enabled) {
+            return;
+        }
         const now = Date.now();
         
         // Reset window if needed
@@ -104,7 +111,7 @@ async function runAgentWithIntelligentRetry(agentType, userInput, maxRetries = 4
 async function processBatchWithScheduling(agents, userInput) {
     const results = {};
     const batchSize = 2; // Process 2 agents at a time to spread load
-    const batchDelay = 30000; // 30 seconds between batches
+    const batchDelay = rateLimiter.enabled ? 30000 : 0; // 30 seconds between batches unless Python schedules quota
     
     // Split agents into batches
     const batches = [];
@@ -134,7 +141,7 @@ async function processBatchWithScheduling(agents, userInput) {
         }
         
         // Wait between batches (except for the last batch)
-        if (batchIndex < batches.length - 1) {
+        if (batchDelay > 0 && batchIndex < batches.length - 1) {
             console.log(`Batch ${batchIndex + 1} complete. Waiting ${batchDelay}ms before next batch...`);
             await rateLimiter.delay(batchDelay);
         }
@@ -143,6 +150,22 @@ async function processBatchWithScheduling(agents, userInput) {
     return results;
 }
 
+function sendReport(res, finalReport, startTime) {
+    // TODO: Save the complete report to MongoDB
+    // const report = await PocReport.create(finalReport);
+
+    const statusCode = finalReport.hasErrors ? 206 : 200; // 206 for partial content
+    
+    res.status(statusCode).json({
+        success: true,
+        data: finalReport,
+        message: finalReport.hasErrors ? 
+            `Analysis completed with ${finalReport.successfulAgents}/${finalReport.totalAgents} agents successful. Failed agents can be retried.` :
+            'Complete analysis generated successfully',
+        processingTime: `${((Date.now() - startTime) / 1000).toFixed(1)}s`
+    });
+}
+
 // @desc    Submit a PoC for analysis and get a report
 // @route   POST /api/v1/poc/submit
 // @access  Public
@@ -152,6 +175,8 @@ exports.submitPoc = async (req, res, next) => {
     try {
         // No input truncation - send full data to agents
         const userInput = req.body;
+        // Identifies the stored agent results, for re-evaluating or retrying this report later
+        const reportId = crypto.randomUUID();
         
         console.log('Starting comprehensive PoC analysis...');
         console.log(`Input data size: ${JSON.stringify(userInput).length} characters`);
@@ -164,11 +189,27 @@ exports.submitPoc = async (req, res, next) => {
             'lean_agent'
         ];
 
+        if (process.env.AGENT_ORCHESTRATOR === 'python') {
+            // main_orchestrator.py runs all agents concurrently and builds the same report shape
+            // and stores each successful section under reportId
+            const finalReport = await runAgentWithIntelligentRetry('report', { ...userInput, reportId });
+            finalReport.processingTimeMs = Date.now() - startTime;
+            return sendReport(res, finalReport, startTime);
+        }
+
         // Process agents with intelligent scheduling
         const results = await processBatchWithScheduling(agents, userInput);
+        try {
+            await runAgent('record', { reportId, submission: userInput, results });
+        } catch (error) {
+            // The report is still returned; it just cannot be re-evaluated incrementally
+            console.error(`Could not store agent results for report ${reportId}:`, error.message);
+        }
         
         // Consolidate results with full data preservation
         const finalReport = {
+            reportId,
+
             // Preserve full input data
             projectDescription: userInput.description,
             techStack: userInput.techStack,
@@ -199,19 +240,7 @@ exports.submitPoc = async (req, res, next) => {
             totalAgents: agents.length
         };
 
-        // TODO: Save the complete report to MongoDB
-        // const report = await PocReport.create(finalReport);
-
-        const statusCode = finalReport.hasErrors ? 206 : 200; // 206 for partial content
-        
-        res.status(statusCode).json({
-            success: true,
-            data: finalReport,
-            message: finalReport.hasErrors ? 
-                `Analysis completed with ${finalReport.successfulAgents}/${finalReport.totalAgents} agents successful. Failed agents can be retried.` :
-                'Complete analysis generated successfully',
-            processingTime: `${((Date.now() - startTime) / 1000).toFixed(1)}s`
-        });
+        sendReport(res, finalReport, startTime);
 
     } catch (error) {
         console.error('Critical error in PoC submission:', error);
@@ -231,26 +260,66 @@ exports.submitPoc = async (req, res, next) => {
     }
 };
 
-// @desc    Retry failed agents for a specific report
-// @route   POST /api/v1/poc/retry/:reportId
+// @desc    Submit a PoC and stream progress as newline-delimited JSON
+// @route   POST /api/v1/poc/submit/stream
 // @access  Public
-exports.retryFailedAgents = async (req, res, next) => {
+exports.streamPoc = async (req, res, next) => {
+    const startTime = Date.now();
+    const userInput = req.body;
+    const writeEvent = (event) => {
+        if (!res.writableEnded) {
+            res.write(JSON.stringify(event) + '\n');
+        }
+    };
+
+    res.status(200);
+    res.setHeader('Content-Type', 'application/x-ndjson');
+    res.setHeader('Cache-Control', 'no-cache');
+    res.flushHeaders();
+
     try {
-        // TODO: Fetch the original report and identify failed agents
-        // const report = await PocReport.findById(req.params.reportId);
-        // const failedAgents = Object.entries(report.agentStatus)
-        //     .filter(([agent, status]) => status === 'failed')
-        //     .map(([agent, status]) => agent);
-        
-        res.status(200).json({
-            success: true,
-            message: "Retry functionality coming soon"
-        });
+        await rateLimiter.waitForRateLimit();
+        // Events arrive as each agent starts, finishes its tool or retrieval, streams tokens and
+        // completes sections; the full report always ends the stream
+        const finalReport = await runAgent('report', { ...userInput, reportId: crypto.randomUUID() }, writeEvent);
+        finalReport.processingTimeMs = Date.now() - startTime;
+        writeEvent({ event: 'result', result: finalReport });
     } catch (error) {
-        res.status(500).json({ success: false, error: 'Server Error' });
+        console.error('Error in streamed PoC analysis:', error);
+        writeEvent({ event: 'error', error: error.message });
     }
+    res.end();
 };
 
+// Re-evaluates a stored report through main_orchestrator.py: only agents whose declared input
+// fields (or, for lean_agent, the ingested corpus) changed since the last evaluation are rerun,
+// and failed agents are always rerun because their results are never stored.
+// With retryFailedOnly, every stored section is reused and only the failed agents are rerun.
+async function reevaluateReport(req, res, retryFailedOnly = false) {
+    const startTime = Date.now();
+    try {
+        const userInput = { ...req.body, reportId: req.params.reportId, retryFailedOnly };
+        const finalReport = await runAgentWithIntelligentRetry('report', userInput);
+        finalReport.processingTimeMs = Date.now() - startTime;
+        console.log(`Report ${req.params.reportId}: reran [${finalReport.rerunAgents.join(', ')}], reused ${finalReport.reusedAgents.length} agents`);
+        sendReport(res, finalReport, startTime);
+    } catch (error) {
+        console.error('Error re-evaluating PoC report:', error);
+        res.status(500).json({ success: false, error: 'Server Error', message: error.message });
+    }
+}
+
+// @desc    Re-evaluate an edited submission, rerunning only the agents whose inputs changed
+// @route   POST /api/v1/poc/reports/:reportId/reevaluate
+// @access  Public
+exports.reevaluatePoc = (req, res, next) => reevaluateReport(req, res);
+
+// @desc    Retry failed agents for a specific report
+// @route   POST /api/v1/poc/retry/:reportId
+// @access  Public
+// The body is the report's submission; agents that completed for it are reused as stored.
+exports.retryFailedAgents = (req, res, next) => reevaluateReport(req, res, true);
+
 // @desc    Get all reports
 // @route   GET /api/v1/poc/reports
 // @access  Public
@@ -1,6 +1,9 @@
 const express = require('express');
 const {
     submitPoc,
+    streamPoc,
+    reevaluatePoc,
+    retryFailedAgents,
     getReport,
     getReports,
     runTechStackAgent,
@@ -16,6 +19,18 @@ const router = express.Router();
 // @route   POST /api/v1/poc/submit
 router.post('/submit', submitPoc);
 
+// @desc    Submit a PoC and stream progress events as NDJSON, ending with the report
+// @route   POST /api/v1/poc/submit/stream
+router.post('/submit/stream', streamPoc);
+
+// @desc    Re-evaluate an edited submission, rerunning only the agents whose inputs changed
+// @route   POST /api/v1/poc/reports/:reportId/reevaluate
+router.post('/reports/:reportId/reevaluate', reevaluatePoc);
+
+// @desc    Rerun only the failed agents of a report (body: the report's submission)
+// @route   POST /api/v1/poc/retry/:reportId
+router.post('/retry/:reportId', retryFailedAgents);
+
 // @desc    Get a single report by ID
 // @route   GET /api/v1/poc/reports/:id
 router.get('/reports/:id', getReport);
@@ -1,27 +1,83 @@
 const { spawn } = require('child_process');
 const path = require('path');
+const readline = require('readline');
 
-const runAgent = (agentName, userInput) => {
+const pythonAgentsDir = path.join(__dirname, '..', '..', 'python-agents');
+
+// Number of long-lived Python workers to keep warm. 0 spawns one process per agent call.
+const workerPoolSize = parseInt(process.env.AGENT_WORKER_POOL_SIZE || '0', 10);
+// Longest an agent call may take before its process is killed. 0 waits forever.
+const requestTimeoutMs = parseInt(process.env.AGENT_REQUEST_TIMEOUT_MS || '600000', 10);
+
+// With onEvent the agent is started with --stream: each NDJSON progress event is passed to
+// onEvent as it arrives and the promise resolves with the final "result" event.
+const spawnAgent = (agentName, userInput, onEvent) => {
+    const agentPath = agentName === 'report' || agentName === 'record'
+        ? path.join(pythonAgentsDir, 'main_orchestrator.py')
+        : path.join(pythonAgentsDir, 'agents', `${agentName}.py`);
     return new Promise((resolve, reject) => {
-        const agentPath = path.join(__dirname, '..', '..', 'python-agents', 'agents', `${agentName}.py`);
-        const pythonProcess = spawn('python', [agentPath, JSON.stringify(userInput)]);
+        const args = [agentPath, JSON.stringify(userInput)];
+        if (agentName === 'record') {
+            args.push('--record');
+        }
+        if (onEvent) {
+            args.push('--stream');
+        }
+        const pythonProcess = spawn('python', args);
 
         let result = '';
         let error = '';
+        let streamedResult;
+        let timedOut = false;
+        const timer = requestTimeoutMs > 0 ? setTimeout(() => {
+            timedOut = true;
+            pythonProcess.kill('SIGKILL');
+        }, requestTimeoutMs) : null;
 
-        pythonProcess.stdout.on('data', (data) => {
-            result += data.toString();
-        });
+        if (onEvent) {
+            readline.createInterface({ input: pythonProcess.stdout }).on('line', (line) => {
+                let message;
+                try {
+                    message = JSON.parse(line);
+                } catch (e) {
+                    result += line + '\n';
+                    return;
+                }
+                if (message.event === 'result') {
+                    streamedResult = message.result;
+                } else if (message.event) {
+                    onEvent(message);
+                } else {
+                    result += line + '\n';
+                }
+            });
+        } else {
+            pythonProcess.stdout.on('data', (data) => {
+                result += data.toString();
+            });
+        }
 
         pythonProcess.stderr.on('data', (data) => {
             error += data.toString();
         });
 
+        pythonProcess.on('error', (err) => {
+            clearTimeout(timer);
+            reject(new Error(`Agent ${agentName} could not be started. Error: ${err.message}`));
+        });
+
         pythonProcess.on('close', (code) => {
+            clearTimeout(timer);
+            if (timedOut) {
+                return reject(new Error(`Agent ${agentName} timed out after ${requestTimeoutMs}ms.`));
+            }
             if (code !== 0) {
                 console.error(`stderr from ${agentName}: ${error}`);
                 return reject(new Error(`Agent ${agentName} exited with code ${code}. Error: ${error}`));
             }
+            if (streamedResult !== undefined) {
+                return resolve(streamedResult);
+            }
             try {
                 const jsonResult = JSON.parse(result);
                 resolve(jsonResult);
@@ -33,4 +89,155 @@ const runAgent = (agentName, userInput) => {
     });
 };
 
-module.exports = runAgent; 
\ No newline at end of file
+// A single python-agents/agent_worker.py process speaking newline-delimited JSON
+class AgentWorker {
+    constructor(index) {
+        this.index = index;
+        this.nextId = 0;
+        this.pending = new Map();
+        this.alive = true;
+        this.process = spawn('python', [path.join(pythonAgentsDir, 'agent_worker.py')], { cwd: pythonAgentsDir });
+
+        this.ready = new Promise((resolve, reject) => {
+            this.resolveReady = resolve;
+            this.rejectReady = reject;
+        });
+        // Avoid unhandled rejections when a worker dies before anyone awaits it
+        this.ready.catch(() => {});
+
+        readline.createInterface({ input: this.process.stdout }).on('line', (line) => this.onLine(line));
+
+        this.process.stderr.on('data', (data) => {
+            if (process.env.AGENT_WORKER_DEBUG) {
+                console.error(`[agent worker ${this.index}] ${data.toString()}`);
+            }
+        });
+
+        this.process.on('close', (code) => {
+            this.fail(new Error(`Agent worker ${this.index} exited with code ${code}.`));
+        });
+        this.process.on('error', (err) => {
+            this.fail(new Error(`Agent worker ${this.index} failed. Error: ${err.message}`));
+        });
+        // Writing to a worker that just died raises EPIPE here; the close handler rejects its requests
+        this.process.stdin.on('error', (err) => {
+            console.error(`Agent worker ${this.index} stdin error: ${err.message}`);
+        });
+    }
+
+    // Marks the worker dead and rejects everything waiting on it; the pool replaces it on the next call
+    fail(error) {
+        if (!this.alive) {
+            return;
+        }
+        this.alive = false;
+        this.rejectReady(error);
+        for (const { reject } of this.pending.values()) {
+            reject(error);
+        }
+        this.pending.clear();
+    }
+
+    kill(reason) {
+        this.fail(reason);
+        this.process.kill('SIGKILL');
+    }
+
+    onLine(line) {
+        let message;
+        try {
+            message = JSON.parse(line);
+        } catch (e) {
+            console.error(`Agent worker ${this.index} wrote a non-JSON line: ${line}`);
+            return;
+        }
+        if (message.event === 'ready') {
+            console.log(`Agent worker ${this.index} ready (pid ${message.pid})`);
+            this.resolveReady();
+            return;
+        }
+        const request = this.pending.get(message.id);
+        if (!request) {
+            return;
+        }
+        if (message.event) {
+            // Progress event for a streaming request; the response line comes last
+            if (request.onEvent) {
+                request.onEvent(message);
+            }
+            return;
+        }
+        this.pending.delete(message.id);
+        if (message.ok) {
+            request.resolve(message.result);
+        } else {
+            request.reject(new Error(`Agent ${request.agentName} failed. Error: ${message.error}`));
+        }
+    }
+
+    run(agentName, userInput, onEvent) {
+        const id = `${this.index}-${++this.nextId}`;
+        return new Promise((resolve, reject) => {
+            if (!this.alive) {
+                return reject(new Error(`Agent worker ${this.index} is not running.`));
+            }
+            // A hung worker is killed so neither this request nor its pool slot waits forever;
+            // its other in-flight requests fail with it
+            const timer = requestTimeoutMs > 0 ? setTimeout(() => {
+                this.pending.delete(id);
+                reject(new Error(`Agent ${agentName} timed out after ${requestTimeoutMs}ms.`));
+                this.kill(new Error(`Agent worker ${this.index} was killed after a request timed out.`));
+            }, requestTimeoutMs) : null;
+            this.pending.set(id, {
+                agentName,
+                onEvent,
+                resolve: (value) => { clearTimeout(timer); resolve(value); },
+                reject: (err) => { clearTimeout(timer); reject(err); },
+            });
+            this.ready.then(() => {
+                if (!this.pending.has(id)) {
+                    return;
+                }
+                const request = { id, agent: agentName, input: userInput };
+                if (onEvent) {
+                    request.stream = true;
+                }
+                this.process.stdin.write(JSON.stringify(request) + '\n');
+            }, () => {});
+        });
+    }
+}
+
+// Keeps a fixed number of workers alive and sends each call to the least busy one
+class AgentWorkerPool {
+    constructor(size) {
+        this.workers = Array.from({ length: size }, (_, i) => new AgentWorker(i));
+    }
+
+    pickWorker() {
+        this.workers = this.workers.map((worker) => (worker.alive ? worker : new AgentWorker(worker.index)));
+        return this.workers.reduce((best, worker) => (worker.pending.size < best.pending.size ? worker : best));
+    }
+
+    run(agentName, userInput, onEvent) {
+        return this.pickWorker().run(agentName, userInput, onEvent);
+    }
+}
+
+let pool = null;
+
+// agentName may be 'report' to run all five agents concurrently via main_orchestrator.py, or
+// 'record' to store per-agent results ({ reportId, submission, results }) for a report.
+// The optional onEvent(event) receives progress events (started, tool, retrieval, token,
+// partial, section) while the agent runs; the promise still resolves with the final result.
+const runAgent = (agentName, userInput, onEvent) => {
+    if (workerPoolSize <= 0) {
+        return spawnAgent(agentName, userInput, onEvent);
+    }
+    if (!pool) {
+        pool = new AgentWorkerPool(workerPoolSize);
+    }
+    return pool.run(agentName, userInput, onEvent);
+};
+
+module.exports = runAgent;
@@ -0,0 +1,163 @@
+import io
+import os
+import sys
+import json
+import argparse
+import importlib
+import threading
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+
+# Make the agents package importable when started from any working directory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from utils.quota import get_quota_scheduler, quota_priority
+from utils.progress import emit, progress_sink, ndjson_writer
+from utils.tracing import span, record_startup
+
+AGENT_NAMES = [
+    "tech_stack_agent",
+    "integration_risk_agent",
+    "budget_agent",
+    "checklist_agent",
+    "lean_agent",
+]
+
+def load_agents(names=AGENT_NAMES):
+    """
+    Imports each agent module once so the LLM clients, agents and vector store
+    are built a single time for the lifetime of the worker.
+    """
+    agents = {}
+    for name in names:
+        with span("import", "import", agent=name):
+            agents[name] = importlib.import_module(f"agents.{name}")
+    return agents
+
+def handle_request(agents, request, write_event=None):
+    """
+    Runs one request of the form {"id": ..., "agent": ..., "input": {...}}
+    and returns the response dict with the same id.
+    The pseudo-agent "report" runs all agents concurrently through main_orchestrator, "record"
+    stores per-agent results given as {"reportId", "submission", "results"} for a report, and
+    "quota" returns the shared quota scheduler's bucket levels and queue-wait metrics.
+    An optional "priority" ("interactive" or "batch") sets the quota class for the request.
+    With "stream": true, progress events tagged with the request id are passed to
+    write_event(message) while the request runs, before the response.
+    """
+    if request.get("stream") and write_event is not None:
+        request_id = request.get("id")
+        with progress_sink(lambda event: write_event({"id": request_id, **event})):
+            emit("started", agent=request.get("agent"))
+            return _handle_request(agents, request)
+    return _handle_request(agents, request)
+
+def _handle_request(agents, request):
+    with span("request", "worker", agent=request.get("agent"), priority=request.get("priority") or "interactive") as traced:
+        response = _dispatch(agents, request)
+        traced.set(ok=response.get("ok"))
+        return response
+
+def _dispatch(agents, request):
+    request_id = request.get("id")
+    agent_name = request.get("agent")
+    if agent_name == "ping":
+        return {"id": request_id, "ok": True, "result": {"agents": list(agents)}}
+    if agent_name == "quota":
+        return {"id": request_id, "agent": agent_name, "ok": True, "result": get_quota_scheduler().stats()}
+    if agent_name not in ("report", "record") and agent_name not in agents:
+        return {"id": request_id, "agent": agent_name, "ok": False, "error": f"Unknown agent: {agent_name}"}
+    try:
+        with quota_priority(request.get("priority") or "interactive"):
+            if agent_name == "report":
+                import main_orchestrator
+                result = main_orchestrator.run(request.get("input") or {}, agents=agents)
+            elif agent_name == "record":
+                import main_orchestrator
+                payload = request.get("input") or {}
+                stored = main_orchestrator.record_results(payload.get("submission") or {}, payload["reportId"],
+                                                          payload.get("results") or {}, agents=agents)
+                result = {"reportId": payload["reportId"], "storedAgents": stored}
+            else:
+                result = agents[agent_name].run(request.get("input") or {})
+        return {"id": request_id, "agent": agent_name, "ok": True, "result": result}
+    except Exception as e:
+        return {"id": request_id, "agent": agent_name, "ok": False, "error": f"{type(e).__name__}: {e}"}
+
+def handle_line(agents, line, write_event=None):
+    """
+    Parses a single NDJSON request line and returns the response dict, or None for blank lines.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        request = json.loads(line)
+    except json.JSONDecodeError as e:
+        return {"id": None, "ok": False, "error": f"Invalid JSON request: {e}"}
+    return handle_request(agents, request, write_event)
+
+def serve_stdio(agents, out, concurrency):
+    """
+    Reads newline-delimited JSON requests from stdin and writes one response line per request to `out`.
+    With concurrency > 1 responses may arrive out of order and are matched by id.
+    """
+    write = ndjson_writer(out)
+
+    def respond(line):
+        response = handle_line(agents, line, write)
+        if response is not None:
+            write(response)
+
+    write({"event": "ready", "agents": list(agents), "pid": os.getpid()})
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for line in sys.stdin:
+            executor.submit(respond, line)
+
+def serve_socket(agents, host, port, concurrency):
+    """
+    Serves the same NDJSON protocol over a local TCP socket, one thread per connection.
+    The number of agent runs in flight is capped at `concurrency`.
+    """
+    slots = threading.BoundedSemaphore(concurrency)
+
+    class AgentRequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            write = ndjson_writer(io.TextIOWrapper(self.wfile, encoding="utf-8", write_through=True))
+            for raw in self.rfile:
+                with slots:
+                    response = handle_line(agents, raw.decode("utf-8"), write)
+                if response is not None:
+                    write(response)
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    with socketserver.ThreadingTCPServer((host, port), AgentRequestHandler) as server:
+        server.daemon_threads = True
+        print(f"[agent_worker.py] Listening on {host}:{server.server_address[1]}", file=sys.stderr)
+        server.serve_forever()
+
+def main():
+    """
+    Starts a long-lived agent worker on stdin/stdout or on a local socket.
+    """
+    parser = argparse.ArgumentParser(description="Long-lived worker that serves all PoC agents from one process.")
+    parser.add_argument("--port", type=int, help="Serve on a local TCP port instead of stdin/stdout.")
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind when --port is given.")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("AGENT_WORKER_CONCURRENCY", "1")),
+                        help="Maximum number of requests processed at once by this worker.")
+    args = parser.parse_args()
+
+    # Agents print LangChain verbose output to stdout, which is reserved for the
+    # protocol, so everything else written to stdout goes to stderr instead.
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+
+    agents = load_agents()
+    record_startup("agent_worker")
+    if args.port is not None:
+        serve_socket(agents, args.host, args.port, max(1, args.concurrency))
+    else:
+        serve_stdio(agents, protocol_out, max(1, args.concurrency))
+
+if __name__ == "__main__":
+    main()
@@ -1,83 +1,137 @@
 import os
 import sys
 import json
-import re
-from dotenv import load_dotenv
 from langchain.agents import initialize_agent, Tool
-from langchain_google_genai import ChatGoogleGenerativeAI
 
-# Load environment variables
-load_dotenv()
-gemini_api_key = os.getenv("GEMINI_API_KEY")
-if not gemini_api_key:
-    sys.exit("GEMINI_API_KEY not found in .env file")
+# Make the shared python-agents modules importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.llm import get_llm
+from utils.progress import emit, run_streaming
+from utils.tracing import span, record_startup
+from utils.structured_output import AGENT_MODE, run_structured
+from utils.agent_results import file_version
+from tools import budget_simulator
+from tools.budget_simulator import stress_test
 
 def stress_test_budget(query: str) -> str:
     """
-    Stress-tests a budget against a timeline and project scope.
-    This is a placeholder and returns a mock analysis.
+    Stress-tests a budget against a timeline and project scope with a Monte Carlo simulation.
+    Budget, timeline and team size are parsed from the query; the result is JSON with cost and
+    timeline percentiles, overrun probability and the top cost drivers.
     """
-    # In a real implementation, this tool could use more structured input
-    # (budget, timeline, team size) to perform calculations.
-    return "Budget stress test indicates a potential 20% cost overrun if the project timeline is extended by one month. Recommend re-evaluating the scope of the MVP features."
+    return json.dumps(stress_test(query))
+
+INPUT_FIELDS = ("budget", "timeline", "description")
+
+SCHEMA = {
+    "estimatedDevelopmentCosts": ("string", "expected cost range and how it compares to the budget"),
+    "timelineDelays": ("string", None),
+    "highRiskCostAreas": ("array", None),
+}
 
 tools = [
     Tool(
         name="BudgetStressTestTool",
         func=stress_test_budget,
-        description="Stress-tests a budget against a project timeline and scope."
+        description=(
+            "Simulates cost and schedule risk for a budget. Input: budget, timeline and team size "
+            "in plain text (e.g. '$80k, 3 months, team of 4'). Returns percentiles, overrun probability and top cost drivers as JSON."
+        )
     )
 ]
 
-print("gemini_api_key",gemini_api_key)
-agent = initialize_agent(
-    tools=tools,
-    llm=ChatGoogleGenerativeAI(model="models/gemini-1.5-flash", google_api_key=gemini_api_key, temperature=0),
-    agent="zero-shot-react-description",
-    verbose=True
-)
+# The ReAct loop is only built when AGENT_MODE=react; direct mode calls the tool itself
+with span("init agent", "init", agent="budget_agent"):
+    agent = initialize_agent(
+        tools=tools,
+        llm=get_llm(temperature=0),
+        agent="zero-shot-react-description",
+        verbose=True
+    ) if AGENT_MODE == "react" else None
+
+def dependency_versions():
+    """
+    Besides its input fields, the numbers depend on the simulation model.
+    """
+    return {"simulator": file_version(budget_simulator.__file__)}
 
 def limit_text(text, max_length):
     return text[:max_length] if isinstance(text, str) and len(text) > max_length else text
 
-def extract_json_from_response(response):
-    cleaned = re.sub(r"^```json|^```|```$", "", response.strip(), flags=re.MULTILINE).strip()
-    try:
-        return json.loads(cleaned)
-    except Exception:
-        return None
+def prepare(user_input):
+    """
+    Runs the simulation locally and builds the LLM task for a parsed user input.
+    """
+    # Sanitize input
+    sanitized_user_input = {
+        **user_input,
+        "description": user_input.get('description', '')[:500],
+        "timeline": user_input.get('timeline', '')[:500],
+        "budget": user_input.get('budget', 'Not specified')[:100]
+    }
+    task = (
+        f"Stress-test a budget of {sanitized_user_input['budget']} "
+        f"for a project with timeline: {sanitized_user_input['timeline']} "
+        f"and description: {sanitized_user_input['description']}."
+    )
+    # The simulation is deterministic for a given input, so it is cheap to attach to every result
+    with span("tool", "tool", agent="budget_agent", tool="BudgetStressTestTool"):
+        simulation = stress_test(
+            budget=sanitized_user_input["budget"],
+            timeline=sanitized_user_input["timeline"],
+            description=sanitized_user_input["description"],
+        )
+    emit("tool", agent="budget_agent", tool="BudgetStressTestTool", simulation=simulation)
+    return {
+        "task": limit_text(task, 600),
+        "toolName": "BudgetStressTestTool",
+        "toolOutput": json.dumps(simulation),
+        "simulation": simulation,
+    }
+
+def finish(prepared, result, response, llm_calls):
+    """
+    Completes a validated LLM result (or None) into the report section.
+    """
+    simulation = prepared["simulation"]
+    if result is None:
+        weeks = simulation["timelineWeeksPercentiles"]
+        result = {
+            "estimatedDevelopmentCosts": response,
+            "timelineDelays": (
+                f"Planned {simulation['parameters']['timelineWeeks']} weeks; median {weeks['p50']}, "
+                f"90th percentile {weeks['p90']} weeks. Cost overrun probability {simulation['overrunProbability']:.0%}"
+                + (f" (low confidence: {simulation['confidenceNote']})" if simulation["confidenceNote"] else ".")
+            ),
+            "highRiskCostAreas": [driver["driver"] for driver in simulation["topCostDrivers"]]
+        }
+    result["simulation"] = simulation
+    result["llmCalls"] = llm_calls
+    return result
+
+def run(user_input):
+    """
+    Runs the budget analysis for a parsed user input and returns the result dict.
+    """
+    with span("run", "agent", agent="budget_agent"):
+        prepared = prepare(user_input)
+        result, response, llm_calls = run_structured(
+            "budget_agent", prepared["task"], SCHEMA, prepared["toolName"], prepared["toolOutput"], agent,
+        )
+        return finish(prepared, result, response, llm_calls)
 
 def main():
     """
     Main execution function for the budget agent.
     """
+    record_startup("budget_agent")
     if len(sys.argv) > 1:
-        user_input_json = sys.argv[1]
-        user_input = json.loads(user_input_json)
-        
-        # Sanitize input
-        sanitized_user_input = {
-            **user_input,
-            "description": user_input.get('description', '')[:500],
-            "timeline": user_input.get('timeline', '')[:500],
-            "budget": user_input.get('budget', 'Not specified')[:100]
-        }
-        prompt = (
-            f"Stress-test a budget of {sanitized_user_input['budget']} "
-            f"for a project with timeline: {sanitized_user_input['timeline']} "
-            f"and description: {sanitized_user_input['description']}. "
-            f"Return ONLY a valid JSON object with keys: estimatedDevelopmentCosts, timelineDelays, highRiskCostAreas (array). No markdown, no code block, no explanation."
-        )
-        prompt = limit_text(prompt, 600)
-        response = agent.run(prompt)
-        result = extract_json_from_response(response)
-        if not result:
-            result = {
-                "estimatedDevelopmentCosts": response,
-                "timelineDelays": "Potential 20% cost overrun if timeline slips by 1 month.",
-                "highRiskCostAreas": ["MVP features", "API integrations"]
-            }
-        print(json.dumps(result))
+        user_input = json.loads(sys.argv[1])
+        if "--stream" in sys.argv[2:]:
+            # NDJSON progress events on stdout, ending with a "result" event
+            run_streaming("budget_agent", run, user_input)
+        else:
+            print(json.dumps(run(user_input)))
     else:
         print(json.dumps({"error": "No input provided"}))
 
@@ -1,16 +1,14 @@
 import os
 import sys
 import json
-import re
-from dotenv import load_dotenv
 from langchain.agents import initialize_agent, Tool
-from langchain_google_genai import ChatGoogleGenerativeAI
 
-# Load environment variables
-load_dotenv()
-gemini_api_key = os.getenv("GEMINI_API_KEY")
-if not gemini_api_key:
-    sys.exit("GEMINI_API_KEY not found in .env file")
+# Make the shared python-agents modules importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.llm import get_llm
+from utils.progress import run_streaming
+from utils.tracing import span, record_startup
+from utils.structured_output import AGENT_MODE, run_structured
 
 def generate_checklist(query: str) -> str:
     """
@@ -27,6 +25,14 @@ def generate_checklist(query: str) -> str:
     6.  [ ] Prepare rollback plan.
     """
 
+INPUT_FIELDS = ("description",)
+
+SCHEMA = {
+    "functionalTests": ("array", None),
+    "securityTasks": ("array", None),
+    "priorityChecklist": ("array", "most important items first"),
+}
+
 tools = [
     Tool(
         name="PreLaunchChecklistTool",
@@ -35,45 +41,67 @@ tools = [
     )
 ]
 
-agent = initialize_agent(
-    tools=tools,
-    llm=ChatGoogleGenerativeAI(model="models/gemini-1.5-flash", google_api_key=gemini_api_key, temperature=0),
-    agent="zero-shot-react-description",
-    verbose=True
-)
+# The ReAct loop is only built when AGENT_MODE=react; direct mode calls the tool itself
+with span("init agent", "init", agent="checklist_agent"):
+    agent = initialize_agent(
+        tools=tools,
+        llm=get_llm(temperature=0),
+        agent="zero-shot-react-description",
+        verbose=True
+    ) if AGENT_MODE == "react" else None
 
 def limit_text(text, max_length):
     return text[:max_length] if isinstance(text, str) and len(text) > max_length else text
 
-def extract_json_from_response(response):
-    cleaned = re.sub(r"^```json|^```|```$", "", response.strip(), flags=re.MULTILINE).strip()
-    try:
-        return json.loads(cleaned)
-    except Exception:
-        return None
+def prepare(user_input):
+    """
+    Runs the tool locally and builds the LLM task for a parsed user input.
+    """
+    task = f"Generate a pre-launch checklist for the following project: {user_input.get('description', 'Not specified')}."
+    with span("tool", "tool", agent="checklist_agent", tool="PreLaunchChecklistTool"):
+        checklist = generate_checklist(task)
+    return {
+        "task": limit_text(task, 600),
+        "toolName": "PreLaunchChecklistTool",
+        "toolOutput": checklist,
+    }
+
+def finish(prepared, result, response, llm_calls):
+    """
+    Completes a validated LLM result (or None) into the report section.
+    """
+    if result is None:
+        result = {
+            "functionalTests": ["User acceptance testing (UAT)", "End-to-end tests"],
+            "securityTasks": ["Security audit", "Penetration testing"],
+            "priorityChecklist": [response]
+        }
+    result["llmCalls"] = llm_calls
+    return result
+
+def run(user_input):
+    """
+    Runs the checklist analysis for a parsed user input and returns the result dict.
+    """
+    with span("run", "agent", agent="checklist_agent"):
+        prepared = prepare(user_input)
+        result, response, llm_calls = run_structured(
+            "checklist_agent", prepared["task"], SCHEMA, prepared["toolName"], prepared["toolOutput"], agent,
+        )
+        return finish(prepared, result, response, llm_calls)
 
 def main():
     """
     Main execution function for the checklist agent.
     """
+    record_startup("checklist_agent")
     if len(sys.argv) > 1:
-        user_input_json = sys.argv[1]
-        user_input = json.loads(user_input_json)
-        
-        prompt = (
-            f"Generate a pre-launch checklist for the following project: {user_input.get('description', 'Not specified')}. "
-            f"Return ONLY a valid JSON object with keys: functionalTests (array), securityTasks (array), priorityChecklist (array). No markdown, no code block, no explanation."
-        )
-        prompt = limit_text(prompt, 600)
-        response = agent.run(prompt)
-        result = extract_json_from_response(response)
-        if not result:
-            result = {
-                "functionalTests": ["User acceptance testing (UAT)", "End-to-end tests"],
-                "securityTasks": ["Security audit", "Penetration testing"],
-                "priorityChecklist": [response]
-            }
-        print(json.dumps(result))
+        user_input = json.loads(sys.argv[1])
+        if "--stream" in sys.argv[2:]:
+            # NDJSON progress events on stdout, ending with a "result" event
+            run_streaming("checklist_agent", run, user_input)
+        else:
+            print(json.dumps(run(user_input)))
     else:
         print(json.dumps({"error": "No input provided"}))
 
@@ -1,72 +1,119 @@
 import os
 import sys
 import json
-import re
-from dotenv import load_dotenv
 from langchain.agents import initialize_agent, Tool
-from langchain_google_genai import ChatGoogleGenerativeAI
 
-# Load environment variables
-load_dotenv()
-gemini_api_key = os.getenv("GEMINI_API_KEY")
-if not gemini_api_key:
-    sys.exit("GEMINI_API_KEY not found in .env file")
+# Make the shared python-agents modules importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.llm import get_llm
+from utils.progress import emit, run_streaming
+from utils.tracing import span, record_startup
+from utils.structured_output import AGENT_MODE, run_structured
+from tools.tech_knowledge import analyze_stack, summarize_findings, knowledge_base_version
 
 def predict_integration_risk(query: str) -> str:
     """
-    Predicts potential integration risks between different components of a tech stack.
-    This is a placeholder and returns a mock analysis.
+    Predicts potential integration risks between different components of a tech stack
+    from the local knowledge base. Returns JSON findings with pairwise risks and rate limits.
     """
-    return "Potential integration risk identified: The legacy CRM API may have rate limits that could be exceeded by the new microservice architecture. Recommend implementing a queueing system."
+    return json.dumps(analyze_stack(query))
+
+INPUT_FIELDS = ("techStack", "externalApis", "description")
+
+SCHEMA = {
+    "apiFailurePoints": ("string", "where integrations are likely to fail and why"),
+    "securityAndRateLimits": ("string", None),
+    "riskSeverity": ("string", "Low, Medium or High"),
+    "mitigation": ("string", None),
+}
 
 tools = [
     Tool(
         name="IntegrationRiskPredictionTool",
         func=predict_integration_risk,
-        description="Predicts integration risks for a given tech stack and project description."
+        description="Predicts integration risks for a tech stack (comma-separated technologies and external services) and returns JSON with pairwise risks, rate limits and a 1-10 risk score."
     )
 ]
 
-agent = initialize_agent(
-    tools=tools,
-    llm=ChatGoogleGenerativeAI(model="models/gemini-1.5-flash", google_api_key=gemini_api_key, temperature=0),
-    agent="zero-shot-react-description",
-    verbose=True
-)
+# The ReAct loop is only built when AGENT_MODE=react; direct mode calls the tool itself
+with span("init agent", "init", agent="integration_risk_agent"):
+    agent = initialize_agent(
+        tools=tools,
+        llm=get_llm(temperature=0),
+        agent="zero-shot-react-description",
+        verbose=True
+    ) if AGENT_MODE == "react" else None
+
+def dependency_versions():
+    """
+    Severity and rate limits come from the tech knowledge base, so its version is fingerprinted too.
+    """
+    return {"knowledgeBase": knowledge_base_version()}
+
 def limit_text(text, max_length):
     return text[:max_length] if isinstance(text, str) and len(text) > max_length else text
 
-def extract_json_from_response(response):
-    cleaned = re.sub(r"^```json|^```|```$", "", response.strip(), flags=re.MULTILINE).strip()
-    try:
-        return json.loads(cleaned)
-    except Exception:
-        return None
+def prepare(user_input):
+    """
+    Runs the tool locally and builds the LLM task for a parsed user input.
+    """
+    # Severity and rate limits come from the knowledge base; the LLM only writes the narrative
+    with span("tool", "tool", agent="integration_risk_agent", tool="IntegrationRiskPredictionTool"):
+        findings = analyze_stack([user_input.get('techStack'), user_input.get('externalApis')])
+    emit("tool", agent="integration_risk_agent", tool="IntegrationRiskPredictionTool", findings=findings)
+    task = (
+        f"Analyze the integration risks for a project with this tech stack: {user_input.get('techStack', 'Not specified')} "
+        f"and description: {user_input.get('description', 'Not specified')}."
+    )
+    return {
+        "task": limit_text(task, 600),
+        "toolName": "IntegrationRiskPredictionTool",
+        "toolOutput": summarize_findings(findings),
+        "findings": findings,
+    }
+
+def finish(prepared, result, response, llm_calls):
+    """
+    Completes a validated LLM result (or None) into the report section.
+    """
+    findings = prepared["findings"]
+    if result is None:
+        result = {
+            "apiFailurePoints": response,
+            "mitigation": " ".join(risk["mitigation"] for risk in findings["integrationRisks"]) or "Implement retries and monitoring.",
+        }
+    if findings["rateLimits"]:
+        result["securityAndRateLimits"] = " ".join(f"{limit['component']}: {limit['limit']}" for limit in findings["rateLimits"])
+    else:
+        result.setdefault("securityAndRateLimits", "Standard OAuth and API key limits apply.")
+    result["riskSeverity"] = findings["riskSeverity"]
+    result["findings"] = findings
+    result["llmCalls"] = llm_calls
+    return result
+
+def run(user_input):
+    """
+    Runs the integration risk analysis for a parsed user input and returns the result dict.
+    """
+    with span("run", "agent", agent="integration_risk_agent"):
+        prepared = prepare(user_input)
+        result, response, llm_calls = run_structured(
+            "integration_risk_agent", prepared["task"], SCHEMA, prepared["toolName"], prepared["toolOutput"], agent,
+        )
+        return finish(prepared, result, response, llm_calls)
 
 def main():
     """
     Main execution function for the integration risk agent.
     """
+    record_startup("integration_risk_agent")
     if len(sys.argv) > 1:
-        user_input_json = sys.argv[1]
-        user_input = json.loads(user_input_json)
-        
-        prompt = (
-            f"Analyze the integration risks for a project with this tech stack: {user_input.get('techStack', 'Not specified')} "
-            f"and description: {user_input.get('description', 'Not specified')}. "
-            f"Return ONLY a valid JSON object with keys: apiFailurePoints, securityAndRateLimits, riskSeverity, mitigation. No markdown, no code block, no explanation."
-        )
-        prompt = limit_text(prompt, 600)
-        response = agent.run(prompt)
-        result = extract_json_from_response(response)
-        if not result:
-            result = {
-                "apiFailurePoints": response,
-                "securityAndRateLimits": "Standard OAuth and API key limits apply.",
-                "riskSeverity": "Medium",
-                "mitigation": "Implement retries and monitoring."
-            }
-        print(json.dumps(result))
+        user_input = json.loads(sys.argv[1])
+        if "--stream" in sys.argv[2:]:
+            # NDJSON progress events on stdout, ending with a "result" event
+            run_streaming("integration_risk_agent", run, user_input)
+        else:
+            print(json.dumps(run(user_input)))
     else:
         print(json.dumps({"error": "No input provided"}))
 
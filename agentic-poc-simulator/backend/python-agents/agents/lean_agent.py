@@ -1,101 +1,158 @@
 import os
 import sys
 import json
-import re
-from dotenv import load_dotenv
+import time
 from langchain.agents import initialize_agent, Tool
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain.chains import RetrievalQA
-
-# Load environment variables
-load_dotenv()
-gemini_api_key = os.getenv("GEMINI_API_KEY")
-if not gemini_api_key:
-    sys.exit("GEMINI_API_KEY not found in .env file")
-
-# Setup Vector Store and Retriever
-vectorstore_path = "../data/vector_store"
-embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=gemini_api_key)
-vectorstore = Chroma(persist_directory=vectorstore_path, embedding_function=embedding)
-retriever = vectorstore.as_retriever()
-
-# Setup QA Chain
-qa_chain = RetrievalQA.from_chain_type(
-    llm=ChatGoogleGenerativeAI(model="models/gemini-1.5-flash", google_api_key=gemini_api_key, temperature=0),
-    chain_type="stuff",
-    retriever=retriever
-)
-
-# Define Tools
+
+# Make the shared python-agents modules importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.llm import get_llm, get_embeddings, get_vectorstore, VECTOR_STORE_PATH, VECTOR_STORE_BACKEND
+from utils.progress import emit, run_streaming
+from utils.tracing import span, record_startup
+from utils.structured_output import AGENT_MODE, run_structured
+from rag.retriever import make_query_embedder, retrieve, retrieve_lexical, retrieve_hybrid, pack_context
+from rag.lexical_index import get_lexical_index, index_version as lexical_index_version
+from rag.vector_store import index_version as vector_index_version
+from rag.chunk_store import ChunkStore
+from rag.ingest_manifest import MANIFEST_FILENAME, corpus_version
+
+RETRIEVAL_K = 4
+CONTEXT_TOKEN_BUDGET = 1500
+# "vector" (default), "lexical" (BM25 only, no embedding call) or "hybrid" (fused BM25 + vector)
+RETRIEVAL_MODE = os.getenv("LEAN_RETRIEVAL_MODE", "vector")
+
+# Setup Vector Store and a memoized query embedder; lexical mode needs neither
+with span("init retrieval", "init", agent="lean_agent", mode=RETRIEVAL_MODE):
+    # Opened here to warm it up; retrieval asks again so a rebuilt local index is picked up
+    vectorstore = get_vectorstore() if RETRIEVAL_MODE != "lexical" else None
+    embed_query = make_query_embedder(get_embeddings()) if RETRIEVAL_MODE != "lexical" else None
+    chunk_store = ChunkStore() if RETRIEVAL_MODE != "vector" else None
+
+def retrieve_documents(query):
+    """
+    Runs one retrieval pass for the query in the configured mode.
+    """
+    if chunk_store is not None:
+        # Pick up chunks written by an ingestion run since this worker started
+        chunk_store.refresh()
+    if RETRIEVAL_MODE == "lexical":
+        return retrieve_lexical(get_lexical_index(), chunk_store, query, k=RETRIEVAL_K)
+    if RETRIEVAL_MODE == "hybrid":
+        return retrieve_hybrid(get_vectorstore(), embed_query, get_lexical_index(), chunk_store, query, k=RETRIEVAL_K)
+    return retrieve(get_vectorstore(), embed_query, query, k=RETRIEVAL_K)
+
+def search_case_studies(query):
+    """
+    Retrieves case study chunks for the query and packs the distinct ones into the token budget.
+    """
+    return pack_context(retrieve_documents(query), CONTEXT_TOKEN_BUDGET)
+
 tools = [
     Tool(
         name="LeanMVPSuggestion",
-        func=qa_chain.run,
+        func=search_case_studies,
         description="Used to find lean alternatives and MVP strategies from case studies. Input should be a detailed query about the user's tech stack or product idea."
     )
 ]
 
-# Initialize Agent
-agent = initialize_agent(
-    tools=tools,
-    llm=ChatGoogleGenerativeAI(model="models/gemini-1.5-flash", google_api_key=gemini_api_key, temperature=0.2),
-    agent="chat-conversational-react-description",
-    verbose=True
-)
+# The ReAct loop is only built when AGENT_MODE=react; direct mode retrieves once in prepare
+with span("init agent", "init", agent="lean_agent"):
+    agent = initialize_agent(
+        tools=tools,
+        llm=get_llm(temperature=0.2),
+        agent="zero-shot-react-description",
+        verbose=True
+    ) if AGENT_MODE == "react" else None
+
+INPUT_FIELDS = ("techStack", "description", "concerns")
+
+SCHEMA = {
+    "simplifiedStackAlternatives": ("array", None),
+    "estimatedCostTimeSavings": ("string", None),
+    "prosCons": ("array", None),
+}
+
+def dependency_versions():
+    """
+    Besides its input fields, the answer depends on the ingested corpus, the retrieval mode and
+    the builds of the indexes that mode reads.
+    """
+    versions = {"corpus": corpus_version(os.path.join(VECTOR_STORE_PATH, MANIFEST_FILENAME)), "retrievalMode": RETRIEVAL_MODE}
+    if RETRIEVAL_MODE != "lexical" and VECTOR_STORE_BACKEND == "local":
+        versions["vectorIndex"] = vector_index_version()
+    if RETRIEVAL_MODE in ("lexical", "hybrid"):
+        versions["lexicalIndex"] = lexical_index_version()
+    return versions
 
 def limit_text(text, max_length):
     return text[:max_length] if isinstance(text, str) and len(text) > max_length else text
 
-def extract_json_from_response(response):
-    cleaned = re.sub(r"^```json|^```|```$", "", response.strip(), flags=re.MULTILINE).strip()
-    try:
-        return json.loads(cleaned)
-    except Exception:
-        return None
+def prepare(user_input):
+    """
+    Retrieves the case study context once and builds the LLM task for a parsed user input.
+    """
+    # Construct a detailed prompt for the agent, limit to 600 chars
+    prompt = (
+        f"Based on the following project description, suggest lean alternatives for the MVP. "
+        f"Current Tech Stack: {user_input.get('techStack', 'Not specified')}. "
+        f"Project Goals: {user_input.get('description', 'Not specified')}. "
+        f"My main concern is: {user_input.get('concerns', 'Not specified')}."
+    )
+    prompt = limit_text(prompt, 600)
+    # Retrieve once from the vectorstore and pack distinct chunks into the token budget
+    start = time.perf_counter()
+    with span("retrieval", "rag", agent="lean_agent", mode=RETRIEVAL_MODE) as traced:
+        documents = retrieve_documents(prompt)
+        context = pack_context(documents, CONTEXT_TOKEN_BUDGET)
+        traced.set(chunks=len(documents), contextChars=len(context))
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+    emit("retrieval", agent="lean_agent", mode=RETRIEVAL_MODE, chunks=len(documents), contextChars=len(context), ms=elapsed_ms)
+    print(f"[lean_agent.py] Retrieved {len(documents)} chunks ({len(context)} chars, {RETRIEVAL_MODE}) in {elapsed_ms}ms", file=sys.stderr)
+    # The context is already within the token budget, so it is not cut again
+    return {"task": prompt, "toolName": "Case study context", "toolOutput": context, "maxToolChars": None}
+
+def finish(prepared, result, response, llm_calls):
+    """
+    Completes a validated LLM result (or None) into the report section.
+    """
+    if result is None:
+        # Fallback: mock structure if not JSON
+        result = {
+            "simplifiedStackAlternatives": [response],
+            "estimatedCostTimeSavings": "Estimated 30% cost and 2 months saved.",
+            "prosCons": ["Pro: Faster to market", "Con: May lack advanced features"]
+        }
+    result["llmCalls"] = llm_calls
+    return result
+
+def run(user_input):
+    """
+    Runs the lean alternatives analysis for a parsed user input and returns the result dict.
+    """
+    with span("run", "agent", agent="lean_agent"):
+        prepared = prepare(user_input)
+        # Answer from that context with a single schema-constrained LLM call (no second retrieval)
+        result, response, llm_calls = run_structured(
+            "lean_agent", prepared["task"], SCHEMA, prepared["toolName"], prepared["toolOutput"], agent,
+            max_tool_chars=prepared["maxToolChars"],
+        )
+        return finish(prepared, result, response, llm_calls)
 
 def main():
     """
     Main execution function for the lean agent.
     Receives user input from stdin, processes it, and prints the result to stdout.
     """
-    print("[lean_agent.py] sys.argv:", sys.argv, file=sys.stderr)
+    record_startup("lean_agent")
     if len(sys.argv) > 1:
-        user_input_json = sys.argv[1]
-        print("[lean_agent.py] Raw user_input_json:", user_input_json, file=sys.stderr)
-        user_input = json.loads(user_input_json)
-        print("[lean_agent.py] Parsed user_input:", user_input, file=sys.stderr)
-        # Construct a detailed prompt for the agent, limit to 600 chars
-        prompt = (
-            f"Based on the following project description, suggest lean alternatives for the MVP. "
-            f"Current Tech Stack: {user_input.get('techStack', 'Not specified')}. "
-            f"Project Goals: {user_input.get('description', 'Not specified')}. "
-            f"My main concern is: {user_input.get('concerns', 'Not specified')}. "
-            f"Return ONLY a valid JSON object with keys: simplifiedStackAlternatives (array), estimatedCostTimeSavings, prosCons (array). No markdown, no code block, no explanation."
-        )
-        prompt = limit_text(prompt, 600)
-        print("[lean_agent.py] Constructed prompt:", prompt, file=sys.stderr)
-        # Retrieve context from vectorstore and limit to 2000 chars
-        retrieved_docs = retriever.get_relevant_documents(prompt)
-        context = "\n".join([doc.page_content if hasattr(doc, 'page_content') else str(doc) for doc in retrieved_docs])
-        context = limit_text(context, 2000)
-        print("[lean_agent.py] Retrieved context:", context, file=sys.stderr)
-        # Combine prompt and context for the LLM
-        full_input = f"{prompt}\nContext:\n{context}"
-        print("[lean_agent.py] Full input to QA chain:", full_input, file=sys.stderr)
-        # Run the agent (using the QA chain directly for context injection)
-        response = qa_chain.run(full_input)
-        result = extract_json_from_response(response)
-        if not result:
-            # Fallback: mock structure if not JSON
-            result = {
-                "simplifiedStackAlternatives": [response],
-                "estimatedCostTimeSavings": "Estimated 30% cost and 2 months saved.",
-                "prosCons": ["Pro: Faster to market", "Con: May lack advanced features"]
-            }
-        print(json.dumps(result))
+        user_input = json.loads(sys.argv[1])
+        if "--stream" in sys.argv[2:]:
+            # NDJSON progress events on stdout, ending with a "result" event
+            run_streaming("lean_agent", run, user_input)
+        else:
+            print(json.dumps(run(user_input)))
     else:
         print(json.dumps({"error": "No input provided"}))
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -1,75 +1,117 @@
 import os
 import sys
 import json
-import re
-from dotenv import load_dotenv
 from langchain.agents import initialize_agent, Tool
-from langchain_google_genai import ChatGoogleGenerativeAI
 
-# Load environment variables
-load_dotenv()
-gemini_api_key = os.getenv("GEMINI_API_KEY")
-if not gemini_api_key:
-    sys.exit("GEMINI_API_KEY not found in .env file")
+# Make the shared python-agents modules importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.llm import get_llm
+from utils.progress import emit, run_streaming
+from utils.tracing import span, record_startup
+from utils.structured_output import AGENT_MODE, run_structured
+from tools.tech_knowledge import analyze_stack, summarize_findings, knowledge_base_version
 
-# Placeholder for a tool that analyzes tech stack feasibility.
-# In a real implementation, this could call an API, a database, or another model.
 def analyze_tech_stack(query: str) -> str:
     """
-    Analyzes the feasibility of a given tech stack based on the project description.
-    This is a placeholder and returns a mock analysis.
+    Analyzes the feasibility of a given tech stack against the local knowledge base.
+    Returns JSON findings: components, deprecations, integration risks, rate limits and scores.
     """
-    return "Based on a preliminary analysis, the selected tech stack appears to be viable for the project goals. However, consider potential scalability issues with the database choice."
+    return json.dumps(analyze_stack(query))
+
+# Submission fields the result depends on, fingerprinted by utils/agent_results.py
+INPUT_FIELDS = ("techStack", "description")
+
+SCHEMA = {
+    "compatibilityReport": ("string", "narrative on how well the components fit the project"),
+    "scalabilityScore": ("number", "1-10"),
+    "riskScore": ("number", "1-10"),
+    "deprecatedWarnings": ("array", None),
+}
 
 tools = [
     Tool(
         name="TechStackFeasibilityTool",
         func=analyze_tech_stack,
-        description="Analyzes the feasibility of a proposed tech stack for a new project."
+        description="Analyzes a proposed tech stack (comma-separated technologies) and returns JSON findings with deprecations, integration risks and 1-10 scalability/risk scores."
     )
 ]
 
-agent = initialize_agent(
-    tools=tools,
-    llm=ChatGoogleGenerativeAI(model="models/gemini-1.5-flash", google_api_key=gemini_api_key, temperature=0),
-    agent="zero-shot-react-description",
-    verbose=True
-)
+# The ReAct loop is only built when AGENT_MODE=react; direct mode calls the tool itself
+with span("init agent", "init", agent="tech_stack_agent"):
+    agent = initialize_agent(
+        tools=tools,
+        llm=get_llm(temperature=0),
+        agent="zero-shot-react-description",
+        verbose=True
+    ) if AGENT_MODE == "react" else None
+
+def dependency_versions():
+    """
+    Besides its input fields, the findings depend on the tech knowledge base.
+    """
+    return {"knowledgeBase": knowledge_base_version()}
 
 def limit_text(text, max_length):
     return text[:max_length] if isinstance(text, str) and len(text) > max_length else text
 
-def extract_json_from_response(response):
-    cleaned = re.sub(r"^```json|^```|```$", "", response.strip(), flags=re.MULTILINE).strip()
-    try:
-        return json.loads(cleaned)
-    except Exception:
-        return None
+def prepare(user_input):
+    """
+    Runs the tool locally and builds the LLM task for a parsed user input.
+    """
+    # Scores and warnings come from the knowledge base; the LLM only writes the narrative
+    with span("tool", "tool", agent="tech_stack_agent", tool="TechStackFeasibilityTool"):
+        findings = analyze_stack(user_input.get('techStack', ''))
+    emit("tool", agent="tech_stack_agent", tool="TechStackFeasibilityTool", findings=findings)
+    task = (
+        f"Analyze the feasibility of the following tech stack: {user_input.get('techStack', 'Not specified')} "
+        f"for a project described as: {user_input.get('description', 'Not specified')}."
+    )
+    return {
+        "task": limit_text(task, 600),
+        "toolName": "TechStackFeasibilityTool",
+        "toolOutput": summarize_findings(findings),
+        "findings": findings,
+    }
+
+def finish(prepared, result, response, llm_calls):
+    """
+    Completes a validated LLM result (or None) into the report section.
+    """
+    findings = prepared["findings"]
+    if result is None:
+        result = {"compatibilityReport": response}
+    result.update({
+        "scalabilityScore": findings["scalabilityScore"],
+        "riskScore": findings["riskScore"],
+        "deprecatedWarnings": findings["deprecatedWarnings"] or ["No deprecated tech detected."],
+        "findings": findings,
+        "llmCalls": llm_calls,
+    })
+    return result
+
+def run(user_input):
+    """
+    Runs the tech stack analysis for a parsed user input and returns the result dict.
+    """
+    with span("run", "agent", agent="tech_stack_agent"):
+        prepared = prepare(user_input)
+        result, response, llm_calls = run_structured(
+            "tech_stack_agent", prepared["task"], SCHEMA, prepared["toolName"], prepared["toolOutput"], agent,
+        )
+        return finish(prepared, result, response, llm_calls)
 
 def main():
     """
     Main execution function for the tech stack agent.
     """
+    record_startup("tech_stack_agent")
     if len(sys.argv) > 1:
-        user_input_json = sys.argv[1]
-        user_input = json.loads(user_input_json)
-        
-        prompt = (
-            f"Analyze the feasibility of the following tech stack: {user_input.get('techStack', 'Not specified')} "
-            f"for a project described as: {user_input.get('description', 'Not specified')}. "
-            f"Return ONLY a valid JSON object with keys: compatibilityReport, scalabilityScore, riskScore, deprecatedWarnings (array). No markdown, no code block, no explanation."
-        )
-        prompt = limit_text(prompt, 600)
-        response = agent.run(prompt)
-        result = extract_json_from_response(response)
-        if not result:
-            result = {
-                "compatibilityReport": response,
-                "scalabilityScore": 7,
-                "riskScore": 5,
-                "deprecatedWarnings": ["No deprecated tech detected."]
-            }
-        print(json.dumps(result))
+        user_input = json.loads(sys.argv[1])
+        if "--stream" in sys.argv[2:]:
+            # NDJSON progress events on stdout, ending with a "result" event
+            run_streaming("tech_stack_agent", run, user_input)
+        else:
+            print(json.dumps(run(user_input)))
     else:
         print(json.dumps({"error": "No input provided"}))
 
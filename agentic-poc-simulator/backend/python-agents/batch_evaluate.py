@@ -0,0 +1,225 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# Make the agents package importable when started from any working directory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from utils.quota import quota_priority
+from utils.tracing import span, record_startup
+from main_orchestrator import REPORT_INPUT_FIELDS
+
+DEFAULT_BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+CHECKPOINT_SUFFIX = ".checkpoint.jsonl"
+
+# Agents loaded once per pool process by _init_worker
+_agents = None
+_report_options = {}
+
+def submission_input(submission):
+    """
+    The fields of a submission the orchestrator reads. Metadata such as "id" or "reportId" is
+    dropped, so a batch line never switches the orchestrator into incremental mode.
+    """
+    return {field: submission[field] for field in REPORT_INPUT_FIELDS if field in submission}
+
+def submission_key(submission):
+    """
+    Content hash of a submission's orchestrator input. Key order and metadata do not matter, so
+    the same proposal listed twice is evaluated once.
+    """
+    content = submission_input(submission)
+    return hashlib.sha256(json.dumps(content, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def read_submissions(path):
+    """
+    Reads one submission object per line, skipping blank lines.
+    """
+    submissions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                submission = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{number}: invalid JSON: {e}") from None
+            if not isinstance(submission, dict):
+                raise ValueError(f"{path}:{number}: expected a JSON object")
+            submissions.append(submission)
+    return submissions
+
+def load_checkpoint(path):
+    """
+    Returns {submission key: report} for reports finished by earlier runs. A line cut short
+    by an interrupted write is ignored.
+    """
+    finished = {}
+    if not os.path.exists(path):
+        return finished
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            finished[record["key"]] = record["report"]
+    return finished
+
+def _ends_with_newline(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return True
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+def _init_worker(options):
+    global _agents, _report_options
+    # LangChain verbose output would otherwise interleave with the parent's progress lines
+    sys.stdout = sys.stderr
+    import main_orchestrator
+    _agents = main_orchestrator.load_agents()
+    _report_options = options
+
+def _evaluate(key, submission):
+    import main_orchestrator
+    try:
+        # Interactive requests sharing the quota go first
+        with quota_priority("batch"), span("batch report", "batch", key=key[:12]):
+            return key, main_orchestrator.run(submission, agents=_agents, **_report_options), None
+    except Exception as e:
+        return key, None, f"{type(e).__name__}: {e}"
+
+def iter_reports(pending, workers, options, max_in_flight=None):
+    """
+    Evaluates {key: submission} in a process pool and yields (key, report, error) as reports
+    finish. Each pool process loads the agents once and reuses them for all its reports.
+    """
+    max_in_flight = max_in_flight or workers * 2
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(options,)) as executor:
+        in_flight = set()
+        for key, submission in pending.items():
+            in_flight.add(executor.submit(_evaluate, key, submission_input(submission)))
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+def write_reports(path, submissions, reports, errors=None):
+    """
+    Writes one report per submission, in input order, atomically. Submissions keep their "id"
+    as "submissionId"; ones without a report get an "error" line instead.
+    """
+    errors = errors or {}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for submission in submissions:
+            key = submission_key(submission)
+            line = reports.get(key) or {"error": errors.get(key, "Not evaluated"), "submissionKey": key}
+            if "id" in submission:
+                line = {"submissionId": submission["id"], **line}
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+
+def evaluate_batch(input_path, output_path, checkpoint_path=None, workers=DEFAULT_BATCH_WORKERS, retry_failed=True, **options):
+    """
+    Evaluates every submission in input_path and writes the reports to output_path.
+    Identical submissions are evaluated once. Each finished report is appended to the
+    checkpoint before the next one is awaited, so a rerun after an interruption only
+    evaluates what is missing (plus reports with failed agents, when retry_failed).
+    Returns run statistics: "failed" counts submissions that got no report at all, "withErrors"
+    reports in which some agent failed.
+    """
+    checkpoint_path = checkpoint_path or output_path + CHECKPOINT_SUFFIX
+    submissions = read_submissions(input_path)
+    unique = {}
+    for submission in submissions:
+        unique.setdefault(submission_key(submission), submission)
+
+    reports = load_checkpoint(checkpoint_path)
+    reports = {key: report for key, report in reports.items()
+               if key in unique and not (retry_failed and report.get("hasErrors"))}
+    pending = {key: submission for key, submission in unique.items() if key not in reports}
+    print(f"[batch_evaluate.py] {len(submissions)} submissions, {len(unique)} unique, "
+          f"{len(reports)} already in the checkpoint, {len(pending)} to evaluate", file=sys.stderr)
+
+    start = time.monotonic()
+    evaluated = failed = with_errors = 0
+    errors = {}
+    if pending:
+        torn = not _ends_with_newline(checkpoint_path)
+        with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+            if torn:
+                # End a line cut short by an interrupted run so the next record starts cleanly
+                checkpoint.write("\n")
+            for key, report, error in iter_reports(pending, max(1, min(workers, len(pending))), options):
+                if error:
+                    failed += 1
+                    errors[key] = error
+                    print(f"[batch_evaluate.py] {key[:12]} failed: {error}", file=sys.stderr)
+                    continue
+                checkpoint.write(json.dumps({"key": key, "report": report}, ensure_ascii=False) + "\n")
+                checkpoint.flush()
+                os.fsync(checkpoint.fileno())
+                reports[key] = report
+                evaluated += 1
+                with_errors += bool(report.get("hasErrors"))
+                minutes = (time.monotonic() - start) / 60
+                print(f"[batch_evaluate.py] {evaluated}/{len(pending)} reports, "
+                      f"{evaluated / max(minutes, 1e-9):.1f} reports/min", file=sys.stderr)
+
+    write_reports(output_path, submissions, reports, errors)
+    elapsed = time.monotonic() - start
+    return {
+        "submissions": len(submissions),
+        "unique": len(unique),
+        "resumed": len(unique) - len(pending),
+        "evaluated": evaluated,
+        "failed": failed,
+        "withErrors": with_errors,
+        "elapsedSeconds": round(elapsed, 1),
+        "reportsPerMinute": round(evaluated / (elapsed / 60), 2) if evaluated and elapsed > 0 else 0.0,
+        "output": output_path,
+    }
+
+def main():
+    """
+    Evaluates a JSONL file of PoC submissions and writes one report per line.
+    """
+    import main_orchestrator
+    parser = argparse.ArgumentParser(description="Evaluate many PoC submissions from a JSONL file.")
+    parser.add_argument("input", help="JSONL file with one submission object per line.")
+    parser.add_argument("output", help="JSONL file to write the reports to, in input order.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_BATCH_WORKERS, help="Reports evaluated in parallel processes.")
+    parser.add_argument("--checkpoint", help=f"Checkpoint file (default: output path + {CHECKPOINT_SUFFIX}).")
+    parser.add_argument("--restart", action="store_true", help="Ignore and replace an existing checkpoint.")
+    parser.add_argument("--keep-failed", action="store_true",
+                        help="On resume, keep checkpointed reports that have failed agents instead of rerunning them.")
+    parser.add_argument("--mode", choices=["agents", "combined"], default=main_orchestrator.DEFAULT_REPORT_MODE,
+                        help="One LLM request per agent, or one combined request per report.")
+    parser.add_argument("--timeout", type=float, default=main_orchestrator.DEFAULT_AGENT_TIMEOUT, help="Per-agent timeout in seconds.")
+    parser.add_argument("--max-concurrency", type=int, default=main_orchestrator.DEFAULT_MAX_CONCURRENCY,
+                        help="Maximum agents running at once within one report.")
+    args = parser.parse_args()
+    record_startup("batch_evaluate")
+
+    checkpoint_path = args.checkpoint or args.output + CHECKPOINT_SUFFIX
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    stats = evaluate_batch(
+        args.input, args.output, checkpoint_path, workers=args.workers, retry_failed=not args.keep_failed,
+        mode=args.mode, timeout=args.timeout, max_concurrency=args.max_concurrency,
+    )
+    print(json.dumps(stats))
+    if stats["failed"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
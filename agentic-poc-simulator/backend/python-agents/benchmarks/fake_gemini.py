@@ -0,0 +1,160 @@
+import os
+import re
+import sys
+import json
+import time
+import types
+import random
+import zlib
+from typing import Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Time to first token, streaming pace (0 = instant) and size of each generated response
+FAKE_LLM_LATENCY_MS = float(os.getenv("BENCH_LLM_LATENCY_MS", "0"))
+FAKE_LLM_CHARS_PER_SECOND = float(os.getenv("BENCH_LLM_CHARS_PER_SECOND", "0"))
+FAKE_LLM_RESPONSE_CHARS = int(os.getenv("BENCH_LLM_RESPONSE_CHARS", "1200"))
+FAKE_LLM_CHUNK_CHARS = 24
+# Latency per embedding request (one embed_documents batch or one query)
+FAKE_EMBED_LATENCY_MS = float(os.getenv("BENCH_EMBED_LATENCY_MS", "0"))
+FAKE_EMBED_DIM = int(os.getenv("BENCH_EMBED_DIM", "768"))
+
+# The key list run_structured and the combined report put in every prompt
+SCHEMA_PATTERN = re.compile(r"exactly these keys: (\{.*\})\. No markdown", re.DOTALL)
+FIELD_TYPE_PATTERN = re.compile(r"(?<=: )(string|number|array of strings)(?: \([^()]*\))?")
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+FILLER_WORDS = (
+    "scalable api latency budget risk vendor integration cache queue database timeline mvp "
+    "security auth payments monitoring deploy cloud serverless frontend backend schema test "
+    "rollout quota retry migration compliance feature users growth cost team sprint"
+).split()
+
+def filler_text(seed, size):
+    """
+    Deterministic prose of about size characters.
+    """
+    rng = random.Random(seed)
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(FILLER_WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:max(size, 1)]
+
+def fake_response(prompt, size=FAKE_LLM_RESPONSE_CHARS):
+    """
+    A response of about size characters that satisfies the JSON key list in the prompt, nested
+    sections included, so validation passes as it would with a well-behaved model. Prompts
+    without a key list get plain prose. The same prompt always gives the same response.
+    """
+    seed = zlib.crc32(prompt.encode("utf-8"))
+    match = SCHEMA_PATTERN.search(prompt)
+    if not match:
+        return filler_text(seed, size)
+    template = match.group(1)
+    field_chars = max(8, size // max(1, len(FIELD_TYPE_PATTERN.findall(template))))
+    counter = iter(range(1 << 30))
+
+    def fill(field):
+        index = next(counter)
+        if field.group(1) == "number":
+            return str(1 + (seed + index) % 10)
+        text = filler_text(seed + index, field_chars)
+        if field.group(1) == "string":
+            return json.dumps(text)
+        half = len(text) // 2
+        return json.dumps([text[:half].strip(), text[half:].strip()])
+
+    return json.dumps(json.loads(FIELD_TYPE_PATTERN.sub(fill, template)))
+
+def _usage(prompt, text):
+    input_tokens = len(prompt) // 4 + 1
+    output_tokens = len(text) // 4 + 1
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+def _prompt_text(messages):
+    return "\n".join(str(message.content) for message in messages)
+
+class FakeChatGoogleGenerativeAI(BaseChatModel):
+    """
+    Drop-in for ChatGoogleGenerativeAI that answers locally after a configurable delay.
+    """
+
+    model: str = "fake-gemini"
+    google_api_key: Optional[str] = None
+    temperature: float = 0.0
+    latency_ms: float = FAKE_LLM_LATENCY_MS
+    chars_per_second: float = FAKE_LLM_CHARS_PER_SECOND
+    response_chars: int = FAKE_LLM_RESPONSE_CHARS
+
+    @property
+    def _llm_type(self):
+        return "fake-gemini"
+
+    def _generation_seconds(self, text):
+        return len(text) / self.chars_per_second if self.chars_per_second > 0 else 0.0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = _prompt_text(messages)
+        text = fake_response(prompt, self.response_chars)
+        time.sleep(self.latency_ms / 1000 + self._generation_seconds(text))
+        message = AIMessage(content=text, usage_metadata=_usage(prompt, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = _prompt_text(messages)
+        text = fake_response(prompt, self.response_chars)
+        time.sleep(self.latency_ms / 1000)
+        for start in range(0, len(text), FAKE_LLM_CHUNK_CHARS):
+            piece = text[start:start + FAKE_LLM_CHUNK_CHARS]
+            time.sleep(self._generation_seconds(piece))
+            last = start + FAKE_LLM_CHUNK_CHARS >= len(text)
+            chunk = AIMessageChunk(content=piece, usage_metadata=_usage(prompt, text) if last else None)
+            yield ChatGenerationChunk(message=chunk)
+
+def hashed_embedding(text, dim=FAKE_EMBED_DIM):
+    """
+    Normalized bag-of-words vector with feature hashing: deterministic, and texts that share
+    words score as similar, so retrieval over it behaves like a (weak) real embedding.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    tokens = WORD_PATTERN.findall(text.lower())
+    if tokens:
+        hashes = np.fromiter((zlib.crc32(token.encode("utf-8")) for token in tokens), dtype=np.uint32, count=len(tokens))
+        signs = np.where(hashes & 1, 1.0, -1.0).astype(np.float32)
+        np.add.at(vector, (hashes >> 1) % dim, signs)
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+class FakeGoogleGenerativeAIEmbeddings(Embeddings):
+    """
+    Drop-in for GoogleGenerativeAIEmbeddings backed by hashed_embedding.
+    """
+
+    def __init__(self, model=None, google_api_key=None, latency_ms=FAKE_EMBED_LATENCY_MS, dim=FAKE_EMBED_DIM, **kwargs):
+        self.model = model
+        self.latency_ms = latency_ms
+        self.dim = dim
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency_ms / 1000)
+        return [hashed_embedding(text, self.dim) for text in texts]
+
+    def embed_query(self, text):
+        time.sleep(self.latency_ms / 1000)
+        return hashed_embedding(text, self.dim)
+
+def install():
+    """
+    Registers the fakes as the langchain_google_genai module. Must run before utils.llm
+    builds its first client.
+    """
+    module = types.ModuleType("langchain_google_genai")
+    module.ChatGoogleGenerativeAI = FakeChatGoogleGenerativeAI
+    module.GoogleGenerativeAIEmbeddings = FakeGoogleGenerativeAIEmbeddings
+    sys.modules["langchain_google_genai"] = module
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
@@ -0,0 +1,404 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import importlib
+import tempfile
+import subprocess
+from collections import defaultdict
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+import numpy as np
+
+# Make the shared python-agents modules importable when run as a script
+PYTHON_AGENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PYTHON_AGENTS_DIR)
+from benchmarks.fake_gemini import install
+
+RAW_CORPUS_PATH = os.path.join(PYTHON_AGENTS_DIR, "..", "data", "raw")
+BASELINE_PATH = os.getenv("BENCH_BASELINE_PATH", os.path.join(PYTHON_AGENTS_DIR, "..", "data", "benchmarks", "baseline.json"))
+SUITES = ("json", "ingestion", "retrieval", "agents")
+# A metric regresses when it is this much worse than the baseline (0.25 = 25%)
+DEFAULT_TOLERANCE = 0.25
+SYNTHETIC_PARAGRAPH_WORDS = 80
+# Settings that change the numbers; a baseline recorded with other values is flagged
+COMPARABLE_CONFIG = ("corpusScale", "workers", "llmLatencyMs", "llmCharsPerSecond", "llmResponseChars", "embedLatencyMs")
+
+SAMPLE_INPUT = {
+    "description": "A marketplace connecting local farmers with restaurants, with ordering, payments and delivery tracking.",
+    "techStack": "React, Node.js + Express, MongoDB, Redis, Stripe, Twilio on AWS Lambda",
+    "externalApis": "Stripe, Twilio, Google Maps",
+    "budget": "$80,000",
+    "timeline": "4 months with a team of 4",
+    "concerns": "Payment reliability and delivery-time estimates",
+}
+
+# Starts an agent script exactly like agentRunner.js does, with the fakes installed first
+AGENT_BOOTSTRAP = (
+    "import sys, runpy; sys.path.insert(0, sys.argv[1]); "
+    "from benchmarks.fake_gemini import install; install(); "
+    "sys.argv = sys.argv[2:]; runpy.run_path(sys.argv[0], run_name='__main__')"
+)
+
+def log(message):
+    print(f"[run_benchmarks.py] {message}", file=sys.stderr)
+
+def record(metrics, name, value, unit, better):
+    """
+    Adds one metric. better is "higher", "lower", or None for context that is not compared.
+    """
+    metrics[name] = {"value": round(float(value), 3), "unit": unit, "better": better}
+
+def record_latencies(metrics, prefix, seconds):
+    latencies = np.asarray(seconds) * 1000
+    record(metrics, f"{prefix}.qps", len(latencies) / max(latencies.sum() / 1000, 1e-9), "queries/s", "higher")
+    record(metrics, f"{prefix}.p50Ms", np.percentile(latencies, 50), "ms", "lower")
+    record(metrics, f"{prefix}.p99Ms", np.percentile(latencies, 99), "ms", "lower")
+
+def prepare_workspace(root):
+    """
+    Creates an isolated data tree and points every cache and state file into it. Returns the
+    directory to run from, so the agents' "../data/..." paths resolve inside the workspace.
+    """
+    run_dir = os.path.join(root, "run")
+    data_dir = os.path.join(root, "data")
+    for directory in (run_dir, os.path.join(data_dir, "raw"), os.path.join(data_dir, "cache")):
+        os.makedirs(directory, exist_ok=True)
+    os.environ.update({
+        "LLM_CACHE_BYPASS": "1",
+        "QUOTA_DISABLED": "1",
+        "LLM_CACHE_PATH": os.path.join(data_dir, "cache", "llm_cache.sqlite3"),
+        "EMBEDDING_CACHE_PATH": os.path.join(data_dir, "cache", "embeddings.sqlite3"),
+        "QUOTA_DB_PATH": os.path.join(data_dir, "cache", "quota.sqlite3"),
+    })
+    return run_dir
+
+def synthesize_corpus(raw_dir, out_dir, scale, seed=0):
+    """
+    Writes scale synthetic documents per file in raw_dir. Each is a random walk over the word
+    bigrams of the real corpus with the length of a real document, so chunking, tokens and
+    vocabulary look like data/raw while every document stays distinct.
+    """
+    sources = []
+    for name in sorted(os.listdir(raw_dir)):
+        path = os.path.join(raw_dir, name)
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                words = f.read().split()
+            if words:
+                sources.append(words)
+    if not sources:
+        raise RuntimeError(f"No raw documents in {raw_dir} to scale from")
+
+    vocabulary = [word for words in sources for word in words]
+    successors = defaultdict(list)
+    for words in sources:
+        for current, following in zip(words, words[1:]):
+            successors[current].append(following)
+
+    total_bytes = 0
+    count = scale * len(sources)
+    for index in range(count):
+        rng = random.Random(seed + index)
+        length = len(sources[index % len(sources)])
+        word = rng.choice(vocabulary)
+        words = [word]
+        for _ in range(length - 1):
+            following = successors.get(word)
+            word = rng.choice(following) if following else rng.choice(vocabulary)
+            words.append(word)
+        paragraphs = [" ".join(words[i:i + SYNTHETIC_PARAGRAPH_WORDS]) for i in range(0, len(words), SYNTHETIC_PARAGRAPH_WORDS)]
+        text = "\n\n".join(paragraphs)
+        with open(os.path.join(out_dir, f"synthetic_{index:05d}.txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+        total_bytes += len(text.encode("utf-8"))
+    return count, total_bytes
+
+def ingest_corpus(scale, workers):
+    """
+    Builds the synthetic corpus and ingests it. Returns (files, bytes, chunks, seconds).
+    """
+    from rag import doc_ingestor
+    from rag.chunk_store import ChunkStore
+    files, size = synthesize_corpus(RAW_CORPUS_PATH, doc_ingestor.RAW_DATA_PATH, scale)
+    start = time.perf_counter()
+    # The ingestor reports progress on stdout, which is reserved for the results
+    with redirect_stdout(sys.stderr):
+        doc_ingestor.ingest_documents(rebuild=True, workers=workers)
+    elapsed = time.perf_counter() - start
+    with ChunkStore(doc_ingestor.PROCESSED_DATA_PATH) as store:
+        chunks = len(store)
+    return files, size, chunks, elapsed
+
+def bench_json(metrics, iterations):
+    """
+    Throughput of extracting, validating and incrementally parsing agent responses.
+    """
+    from benchmarks.fake_gemini import fake_response
+    from utils.structured_output import extract_json, validate, schema_instructions
+    from utils.incremental_json import iter_completed
+    schemas = [importlib.import_module(f"agents.{name}").SCHEMA
+               for name in ("tech_stack_agent", "integration_risk_agent", "budget_agent", "checklist_agent")]
+    cases = []
+    for schema in schemas:
+        body = fake_response(schema_instructions(schema))
+        # The shapes seen in practice: bare JSON, a fenced block, and JSON wrapped in prose
+        for response in (body, f"```json\n{body}\n```", f"Here is the analysis you asked for:\n{body}\nLet me know if you need more."):
+            cases.append((response, schema))
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for response, _ in cases:
+            extract_json(response)
+    elapsed = time.perf_counter() - start
+    record(metrics, "json.extractPerSecond", iterations * len(cases) / elapsed, "responses/s", "higher")
+
+    parsed = [(extract_json(response), schema) for response, schema in cases]
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for data, schema in parsed:
+            validate(data, schema)
+    elapsed = time.perf_counter() - start
+    record(metrics, "json.validatePerSecond", iterations * len(parsed) / elapsed, "responses/s", "higher")
+
+    stream_iterations = max(1, iterations // 10)
+    total_chars = 0
+    start = time.perf_counter()
+    for _ in range(stream_iterations):
+        for response, _ in cases:
+            for _ in iter_completed(response[i:i + 24] for i in range(0, len(response), 24)):
+                pass
+            total_chars += len(response)
+    elapsed = time.perf_counter() - start
+    record(metrics, "json.incrementalMegabytesPerSecond", total_chars / elapsed / 1e6, "MB/s", "higher")
+
+def bench_ingestion(metrics, scale, workers):
+    files, size, chunks, elapsed = ingest_corpus(scale, workers)
+    record(metrics, "ingestion.corpusFiles", files, "files", None)
+    record(metrics, "ingestion.corpusMegabytes", size / 1e6, "MB", None)
+    record(metrics, "ingestion.chunks", chunks, "chunks", None)
+    record(metrics, "ingestion.filesPerSecond", files / elapsed, "files/s", "higher")
+    record(metrics, "ingestion.chunksPerSecond", chunks / elapsed, "chunks/s", "higher")
+    record(metrics, "ingestion.megabytesPerSecond", size / 1e6 / elapsed, "MB/s", "higher")
+
+def sample_queries(texts, count, seed=0):
+    """
+    Queries of 6-12 consecutive words taken from random chunks of the corpus.
+    """
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        words = rng.choice(texts).split()
+        length = rng.randint(6, 12)
+        start = rng.randrange(max(1, len(words) - length))
+        queries.append(" ".join(words[start:start + length]))
+    return queries
+
+def time_queries(search, queries):
+    search(queries[0])
+    seconds = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+def bench_retrieval(metrics, query_count):
+    """
+    Latency of one retrieval pass against the Chroma store, the local memory-mapped index
+    converted from it, and the BM25 index.
+    """
+    from langchain_community.vectorstores import Chroma
+    from utils.llm import get_embeddings, VECTOR_STORE_PATH
+    from rag.chunk_store import ChunkStore
+    from rag.retriever import make_query_embedder, retrieve, retrieve_lexical
+    from rag.vector_store import LocalVectorIndex, VECTOR_INDEX_PATH, convert_chroma
+    from rag.lexical_index import LexicalIndex
+
+    chunk_store = ChunkStore()
+    queries = sample_queries([chunk["text"] for chunk in chunk_store.iter_chunks()], query_count)
+    record(metrics, "retrieval.queries", len(queries), "queries", None)
+
+    embeddings = get_embeddings()
+    chroma = Chroma(persist_directory=VECTOR_STORE_PATH, embedding_function=embeddings)
+    convert_chroma(VECTOR_STORE_PATH, VECTOR_INDEX_PATH)
+    stores = {"chroma": chroma, "local": LocalVectorIndex(VECTOR_INDEX_PATH, embedding_function=embeddings)}
+    for name, store in stores.items():
+        # A fresh memo per store, so every store pays for the same query embeddings
+        embed_query = make_query_embedder(embeddings)
+        record_latencies(metrics, f"retrieval.{name}", time_queries(lambda query: retrieve(store, embed_query, query), queries))
+    lexical_index = LexicalIndex()
+    record_latencies(metrics, "retrieval.lexical", time_queries(lambda query: retrieve_lexical(lexical_index, chunk_store, query), queries))
+    chunk_store.close()
+
+def bench_agents(metrics, repeats):
+    """
+    Cold latency of each agent as a fresh process (interpreter start, imports, run), as
+    agentRunner.js spawns it; then warm latency of run() in this process and of full reports.
+    """
+    from main_orchestrator import REPORT_SECTIONS, run as run_report
+    input_json = json.dumps(SAMPLE_INPUT)
+    for name in REPORT_SECTIONS:
+        script = os.path.join(PYTHON_AGENTS_DIR, "agents", f"{name}.py")
+        seconds = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            process = subprocess.run([sys.executable, "-c", AGENT_BOOTSTRAP, PYTHON_AGENTS_DIR, script, input_json],
+                                     capture_output=True, text=True)
+            seconds.append(time.perf_counter() - start)
+            if process.returncode != 0:
+                raise RuntimeError(f"{name} exited with code {process.returncode}: {process.stderr[-2000:]}")
+            json.loads(process.stdout.strip().splitlines()[-1])
+        record(metrics, f"agents.{name}.coldMs", np.median(seconds) * 1000, "ms", "lower")
+
+    modules = {}
+    for name in REPORT_SECTIONS:
+        start = time.perf_counter()
+        with redirect_stdout(sys.stderr):
+            modules[name] = importlib.import_module(f"agents.{name}")
+        record(metrics, f"agents.{name}.importMs", (time.perf_counter() - start) * 1000, "ms", "lower")
+        seconds = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            with redirect_stdout(sys.stderr):
+                result = modules[name].run(dict(SAMPLE_INPUT))
+            seconds.append(time.perf_counter() - start)
+        record(metrics, f"agents.{name}.warmMs", np.median(seconds) * 1000, "ms", "lower")
+        record(metrics, f"agents.{name}.llmCalls", result.get("llmCalls", 0), "calls", None)
+
+    for mode in ("agents", "combined"):
+        seconds = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            with redirect_stdout(sys.stderr):
+                report = run_report(dict(SAMPLE_INPUT), agents=modules, mode=mode)
+            seconds.append(time.perf_counter() - start)
+        record(metrics, f"agents.report.{mode}.warmMs", np.median(seconds) * 1000, "ms", "lower")
+        record(metrics, f"agents.report.{mode}.llmCalls", report["llmCalls"], "calls", None)
+
+def compare(metrics, baseline, tolerance):
+    """
+    Compares every directional metric with the baseline. A metric regresses when it is worse
+    by more than tolerance (a fraction of the baseline value).
+    """
+    rows = []
+    for name, metric in metrics.items():
+        previous = baseline.get(name)
+        if not previous or metric["better"] is None or not previous["value"]:
+            continue
+        change = (metric["value"] - previous["value"]) / previous["value"]
+        worse_by = -change if metric["better"] == "higher" else change
+        rows.append({
+            "metric": name,
+            "baseline": previous["value"],
+            "current": metric["value"],
+            "change": round(change, 4),
+            "regression": worse_by > tolerance,
+        })
+    return rows
+
+def main():
+    """
+    Runs the offline benchmark suites with local fakes for the Gemini chat and embedding clients,
+    prints the results as JSON and compares them with the stored baseline.
+    """
+    parser = argparse.ArgumentParser(description="Offline performance benchmarks; no Gemini quota or network is used.")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Comma-separated subset of {', '.join(SUITES)}.")
+    parser.add_argument("--corpus-scale", type=int, default=20, help="Synthetic documents per file in data/raw.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parser processes for ingestion.")
+    parser.add_argument("--queries", type=int, default=200, help="Retrieval queries per store.")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per agent measurement (the median is kept).")
+    parser.add_argument("--json-iterations", type=int, default=2000, help="Passes over the sample responses.")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline results to compare against.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown before a metric counts as a regression.")
+    parser.add_argument("--output", help="Also write the results JSON to this file.")
+    parser.add_argument("--keep-workspace", action="store_true", help="Keep the temporary data directory for inspection.")
+    args = parser.parse_args()
+
+    suites = [suite.strip() for suite in args.suites.split(",") if suite.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"Unknown suites: {', '.join(sorted(unknown))}")
+    baseline_path = os.path.abspath(args.baseline)
+    output_path = os.path.abspath(args.output) if args.output else None
+
+    install()
+    workspace = tempfile.mkdtemp(prefix="poc-bench-")
+    previous_dir = os.getcwd()
+    os.chdir(prepare_workspace(workspace))
+    metrics = {}
+    try:
+        if "json" in suites:
+            log("json extraction")
+            bench_json(metrics, args.json_iterations)
+        if "ingestion" in suites:
+            log(f"ingestion (corpus scale {args.corpus_scale})")
+            bench_ingestion(metrics, args.corpus_scale, args.workers)
+        elif "retrieval" in suites or "agents" in suites:
+            # Retrieval and the lean agent need an ingested corpus even when ingestion is not measured
+            ingest_corpus(args.corpus_scale, args.workers)
+        if "retrieval" in suites:
+            log(f"retrieval ({args.queries} queries per store)")
+            bench_retrieval(metrics, args.queries)
+        if "agents" in suites:
+            log(f"agents ({args.repeats} runs each)")
+            bench_agents(metrics, args.repeats)
+    finally:
+        os.chdir(previous_dir)
+        if args.keep_workspace:
+            log(f"workspace kept at {workspace}")
+        else:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z"),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpuCount": os.cpu_count()},
+        "config": {
+            "suites": suites,
+            "corpusScale": args.corpus_scale,
+            "workers": args.workers,
+            "queries": args.queries,
+            "repeats": args.repeats,
+            "llmLatencyMs": float(os.getenv("BENCH_LLM_LATENCY_MS", "0")),
+            "llmCharsPerSecond": float(os.getenv("BENCH_LLM_CHARS_PER_SECOND", "0")),
+            "llmResponseChars": int(os.getenv("BENCH_LLM_RESPONSE_CHARS", "1200")),
+            "embedLatencyMs": float(os.getenv("BENCH_EMBED_LATENCY_MS", "0")),
+        },
+        "metrics": metrics,
+    }
+
+    regressions = []
+    if os.path.exists(baseline_path) and not args.save_baseline:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        changed = [key for key in COMPARABLE_CONFIG if baseline.get("config", {}).get(key) != results["config"][key]]
+        if changed:
+            log(f"baseline was recorded with different {', '.join(changed)}; comparison may be misleading")
+        rows = compare(metrics, baseline.get("metrics", {}), args.tolerance)
+        regressions = [row["metric"] for row in rows if row["regression"]]
+        results["comparison"] = {"baseline": baseline_path, "tolerance": args.tolerance, "regressions": regressions, "metrics": rows}
+        for row in rows:
+            if row["regression"]:
+                log(f"REGRESSION {row['metric']}: {row['baseline']} -> {row['current']} ({row['change']:+.1%})")
+    elif not args.save_baseline:
+        log(f"no baseline at {baseline_path}; run with --save-baseline to store one")
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        log(f"baseline saved to {baseline_path}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
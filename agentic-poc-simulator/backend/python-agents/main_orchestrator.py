@@ -0,0 +1,429 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import functools
+import importlib
+import threading
+import contextvars
+from datetime import datetime, timezone
+
+# Make the agents package importable when started from any working directory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from utils.progress import emit, run_streaming
+from utils.tracing import span, record_startup
+
+# Agent module -> report section, in the order submitPoc lists them
+REPORT_SECTIONS = {
+    "tech_stack_agent": "techFeasibility",
+    "integration_risk_agent": "integrationRisk",
+    "budget_agent": "budgetStressTest",
+    "checklist_agent": "preLaunchChecklist",
+    "lean_agent": "leanAlternative",
+}
+
+# Submission fields a report depends on: every agent's INPUT_FIELDS plus the project details
+# build_report echoes. Anything else (ids, reportId, client metadata) does not change the report.
+REPORT_INPUT_FIELDS = ("description", "techStack", "externalApis", "timeline", "budget", "concerns",
+                       "requirements", "constraints", "goals")
+
+DEFAULT_AGENT_TIMEOUT = float(os.getenv("AGENT_TIMEOUT_SECONDS", "120"))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "5"))
+# "agents" runs one LLM-backed request per agent; "combined" answers all sections with one LLM call
+DEFAULT_REPORT_MODE = os.getenv("REPORT_MODE", "agents")
+
+def load_agents(names=REPORT_SECTIONS):
+    """
+    Imports the agent modules. They share one LLM client and one Chroma handle through utils.llm.
+    """
+    agents = {}
+    for name in names:
+        with span("import", "import", agent=name):
+            agents[name] = importlib.import_module(f"agents.{name}")
+    return agents
+
+def iso_timestamp():
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+def run_in_daemon_thread(func, *args):
+    """
+    Runs func in a daemon thread and returns an awaitable for its result.
+    Unlike asyncio.to_thread, an agent that outlives its timeout never blocks interpreter shutdown.
+    The caller's context (e.g. the quota priority class) is carried into the thread.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def settle(result, error):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    context = contextvars.copy_context()
+
+    def target():
+        try:
+            result, error = context.run(func, *args), None
+        except Exception as e:
+            result, error = None, e
+        try:
+            loop.call_soon_threadsafe(settle, result, error)
+        except RuntimeError:
+            # The event loop already closed after this agent timed out
+            pass
+
+    threading.Thread(target=target, daemon=True).start()
+    return future
+
+def emit_section(name, result, error=None):
+    """
+    Emits a "section" progress event as soon as one report section is final.
+    """
+    if error:
+        emit("section", agent=name, section=REPORT_SECTIONS.get(name, name), ok=False, error=error)
+    else:
+        emit("section", agent=name, section=REPORT_SECTIONS.get(name, name), ok=True, result=result)
+
+async def run_agent(name, func, timeout, semaphore):
+    """
+    Runs one agent call func() in a worker thread and returns (name, result, error).
+    A timed-out agent is reported as failed; its thread is left to finish in the background.
+    Either way a "section" progress event is emitted as soon as the agent is done.
+    """
+    async with semaphore:
+        try:
+            result = await asyncio.wait_for(run_in_daemon_thread(func), timeout)
+            error = None
+        except asyncio.TimeoutError:
+            result, error = None, f"timed out after {timeout:g}s"
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+    emit_section(name, result, error)
+    return name, result, error
+
+def build_report(user_input, outcomes, start_time):
+    """
+    Consolidates agent outcomes into the same report shape submitPoc returns.
+    """
+    report = {
+        "projectDescription": user_input.get("description"),
+        "techStack": user_input.get("techStack"),
+        "timeline": user_input.get("timeline"),
+        "budget": user_input.get("budget"),
+        "requirements": user_input.get("requirements"),
+        "constraints": user_input.get("constraints"),
+        "goals": user_input.get("goals"),
+    }
+    agent_status = {}
+    for name, section in REPORT_SECTIONS.items():
+        result, error = outcomes.get(name, (None, "not run"))
+        if error:
+            report[section] = f"Analysis temporarily unavailable: {error}"
+            agent_status[name] = "failed"
+        else:
+            report[section] = result
+            agent_status[name] = "completed"
+
+    successful = sum(1 for status in agent_status.values() if status == "completed")
+    llm_calls = sum(result.get("llmCalls", 0) for result, error in outcomes.values() if isinstance(result, dict))
+    report.update({
+        "timestamp": iso_timestamp(),
+        "processingTimeMs": int((time.monotonic() - start_time) * 1000),
+        "agentStatus": agent_status,
+        "hasErrors": successful < len(REPORT_SECTIONS),
+        "successfulAgents": successful,
+        "totalAgents": len(REPORT_SECTIONS),
+        "llmCalls": llm_calls,
+    })
+    return report
+
+def build_combined_prompt(prepared):
+    """
+    One prompt covering every prepared section: each section's task and tool output, then the
+    expected object for all sections keyed by report section name.
+    """
+    from utils.structured_output import TOOL_OUTPUT_MAX_CHARS, describe_schema
+    parts = ["Write a PoC evaluation report. Answer each section from its own task and tool output."]
+    schemas = []
+    for name, (module, section) in prepared.items():
+        max_chars = section.get("maxToolChars", TOOL_OUTPUT_MAX_CHARS)
+        output = section["toolOutput"][:max_chars] if max_chars else section["toolOutput"]
+        parts.append(f"## {REPORT_SECTIONS[name]}\nTask: {section['task']}\n{section['toolName']} output: {output}")
+        schemas.append(f'"{REPORT_SECTIONS[name]}": {describe_schema(module.SCHEMA)}')
+    parts.append(
+        f"Return ONLY a valid JSON object with exactly these keys: {{{', '.join(schemas)}}}. "
+        "No markdown, no code block, no explanation."
+    )
+    return "\n\n".join(parts)
+
+def answer_prepared(name, module, section):
+    """
+    Answers one agent from a section its prepare() already built, as its run() would, so a
+    fallback after the combined call does not redo the tools or retrieval.
+    """
+    from utils.structured_output import TOOL_OUTPUT_MAX_CHARS, run_structured
+    with span("run", "agent", agent=name, prepared=True):
+        result, response, llm_calls = run_structured(
+            name, section["task"], module.SCHEMA, section["toolName"], section["toolOutput"], module.agent,
+            max_tool_chars=section.get("maxToolChars", TOOL_OUTPUT_MAX_CHARS),
+        )
+        return module.finish(section, result, response, llm_calls)
+
+def run_combined_call(agents, user_input, prepared=None):
+    """
+    Prepares every agent that supports it (local tools, retrieval) and answers all of them with
+    a single LLM call. Returns ({name: section result}, llm_calls); sections that are missing or
+    fail their agent's schema are left out so the caller can run those agents individually.
+    Prepared sections are collected in the prepared dict (name -> (module, section)) as they are
+    built, so they can be reused by the fallback even if this call times out.
+    """
+    from utils.llm import get_llm, CHAT_MODEL
+    from utils.llm_cache import cached_llm_call
+    from utils.structured_output import LLMCallCounter, extract_json, validate, streaming_call, emit_partials
+    from utils.progress import streaming_enabled
+
+    prepared = {} if prepared is None else prepared
+    for name, module in agents.items():
+        if not hasattr(module, "prepare"):
+            continue
+        try:
+            prepared[name] = (module, module.prepare(user_input))
+        except Exception as e:
+            print(f"[main_orchestrator.py] {name} could not be prepared: {type(e).__name__}: {e}", file=sys.stderr)
+    if not prepared:
+        return {}, 0
+
+    llm = get_llm(temperature=0)
+    counter = LLMCallCounter()
+    # Partials go one level deeper than for single agents: section, then its keys, then array items
+    with span("generate", "llm", agent="combined_report", sections=len(prepared)) as traced:
+        response = cached_llm_call("combined_report", build_combined_prompt(prepared),
+                                   streaming_call(llm, counter, "combined_report", max_depth=3), model=CHAT_MODEL, temperature=0)
+        traced.set(cacheHit=not counter.calls, llmCalls=counter.calls)
+    if streaming_enabled() and not counter.calls:
+        emit_partials("combined_report", str(response), max_depth=3)
+    with span("parse", "parse", agent="combined_report"):
+        answers = extract_json(response)
+    answers = answers if isinstance(answers, dict) else {}
+    results = {}
+    for name, (module, section) in prepared.items():
+        with span("parse", "parse", agent=name) as traced:
+            result, errors = validate(answers.get(REPORT_SECTIONS[name]), module.SCHEMA)
+            traced.set(errors=len(errors))
+        if errors:
+            print(f"[main_orchestrator.py] combined {name} section invalid ({'; '.join(errors)}), running it separately", file=sys.stderr)
+            continue
+        # The shared call is counted once for the report, not per section
+        results[name] = module.finish(section, result, response, 0)
+        emit_section(name, results[name])
+    return results, counter.calls
+
+async def run_agents(user_input, agents, timeout, max_concurrency, prepared=None):
+    """
+    Runs the agents concurrently and returns {name: (result, error)}.
+    Agents with a section in prepared (name -> (module, section)) are answered from it instead of
+    being run from scratch.
+    """
+    prepared = prepared or {}
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    results = await asyncio.gather(*[
+        run_agent(name, functools.partial(answer_prepared, name, module, prepared[name][1]) if name in prepared
+                  else functools.partial(module.run, user_input), timeout, semaphore)
+        for name, module in agents.items()
+    ])
+    outcomes = {name: (result, error) for name, result, error in results}
+    for name, (_, error) in outcomes.items():
+        if error:
+            print(f"[main_orchestrator.py] {name} failed: {error}", file=sys.stderr)
+    return outcomes
+
+async def run_combined(user_input, agents, timeout, max_concurrency):
+    """
+    Answers the agents with one combined LLM call; sections it could not answer fall back to
+    per-agent calls that reuse the already prepared sections. The combined call and the fallbacks
+    share one timeout. Returns ({name: (result, error)}, combined LLM calls, combined sections).
+    """
+    deadline = time.monotonic() + timeout
+    outcomes = {}
+    prepared = {}
+    combined_calls = 0
+    try:
+        results, combined_calls = await asyncio.wait_for(
+            run_in_daemon_thread(run_combined_call, agents, user_input, prepared), timeout)
+        outcomes = {name: (result, None) for name, result in results.items()}
+    except asyncio.TimeoutError:
+        print(f"[main_orchestrator.py] combined call timed out after {timeout:g}s", file=sys.stderr)
+    except Exception as e:
+        print(f"[main_orchestrator.py] combined call failed: {type(e).__name__}: {e}", file=sys.stderr)
+
+    combined_sections = len(outcomes)
+    remaining = {name: module for name, module in agents.items() if name not in outcomes}
+    time_left = deadline - time.monotonic()
+    if remaining and time_left <= 0:
+        for name in remaining:
+            outcomes[name] = (None, f"timed out after {timeout:g}s")
+            emit_section(name, None, outcomes[name][1])
+    elif remaining:
+        outcomes.update(await run_agents(user_input, remaining, time_left, max_concurrency, dict(prepared)))
+    return outcomes, combined_calls, combined_sections
+
+async def orchestrate_combined(user_input, agents, timeout, max_concurrency):
+    """
+    Builds the report from one combined LLM call; sections it could not answer fall back to
+    per-agent runs, concurrently as in orchestrate().
+    """
+    start_time = time.monotonic()
+    outcomes, combined_calls, combined_sections = await run_combined(user_input, agents, timeout, max_concurrency)
+    report = build_report(user_input, outcomes, start_time)
+    report["llmCalls"] += combined_calls
+    report["reportMode"] = "combined"
+    report["combinedSections"] = combined_sections
+    return report
+
+async def orchestrate_incremental(user_input, report_id, agents, timeout, max_concurrency, mode, retry_failed=False):
+    """
+    Re-evaluates a stored report after its submission was edited. Sections whose agent's input
+    fingerprint (declared fields, plus the corpus version for the lean agent) still matches the
+    stored one are reused; only the others are run, and their successful results are stored.
+    Failed agents are never stored, so re-evaluating an unchanged submission retries exactly them.
+    With retry_failed, every stored section is reused whatever its fingerprint, so only the agents
+    that failed (or never ran) for the report are run.
+    """
+    from utils.agent_results import get_agent_result_store, input_fingerprint
+
+    start_time = time.monotonic()
+    store = get_agent_result_store()
+    fingerprints = {name: input_fingerprint(name, module, user_input) for name, module in agents.items()}
+    stored = store.load(report_id)
+    outcomes = {}
+    for name, fingerprint in fingerprints.items():
+        if name in stored and (retry_failed or stored[name][0] == fingerprint):
+            # No LLM call was made for a reused section in this run
+            outcomes[name] = ({**stored[name][1], "llmCalls": 0}, None)
+            emit_section(name, outcomes[name][0])
+    stale = {name: module for name, module in agents.items() if name not in outcomes}
+
+    combined_calls = 0
+    if stale:
+        if mode == "combined" and len(stale) > 1:
+            fresh, combined_calls, _ = await run_combined(user_input, stale, timeout, max_concurrency)
+        else:
+            fresh = await run_agents(user_input, stale, timeout, max_concurrency)
+        for name, (result, error) in fresh.items():
+            if not error:
+                store.save(report_id, name, fingerprints[name], result)
+        outcomes.update(fresh)
+    print(f"[main_orchestrator.py] report {report_id}: reran {len(stale)}, reused {len(agents) - len(stale)} agents", file=sys.stderr)
+
+    report = build_report(user_input, outcomes, start_time)
+    report["llmCalls"] += combined_calls
+    report["reportId"] = report_id
+    report["rerunAgents"] = list(stale)
+    report["reusedAgents"] = [name for name in agents if name not in stale]
+    return report
+
+def record_results(user_input, report_id, results, agents=None):
+    """
+    Stores the per-agent results of a report that was run outside orchestrate(), e.g. agent by
+    agent from the Node API, with their input fingerprints, so the report can later be
+    re-evaluated or retried by report_id. Failed results (an "error" key) are not stored.
+    Returns the names of the stored agents.
+    """
+    from utils.agent_results import get_agent_result_store, input_fingerprint
+
+    if agents is None:
+        agents = load_agents()
+    store = get_agent_result_store()
+    stored = []
+    for name, module in agents.items():
+        result = results.get(name)
+        if not isinstance(result, dict) or result.get("error"):
+            continue
+        store.save(report_id, name, input_fingerprint(name, module, user_input), result)
+        stored.append(name)
+    return stored
+
+async def orchestrate(user_input, agents=None, timeout=DEFAULT_AGENT_TIMEOUT, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                      mode=DEFAULT_REPORT_MODE, report_id=None, retry_failed=None):
+    """
+    Runs all agents concurrently and returns the combined report once the slowest one finishes.
+    Failed or timed-out agents are marked in agentStatus and the rest of the report is still returned.
+    With mode="combined", one LLM call answers every section and only the sections it got wrong
+    are run per agent.
+    With a report_id (or a "reportId" in the submission), only the agents whose inputs changed
+    since that report was last evaluated are run; see orchestrate_incremental(). With retry_failed
+    (or "retryFailedOnly" in the submission), only the agents that failed for it are run.
+    """
+    if agents is None:
+        agents = load_agents()
+    if report_id is None:
+        report_id = user_input.get("reportId")
+    if retry_failed is None:
+        retry_failed = bool(user_input.get("retryFailedOnly"))
+    with span("report", "report", mode=mode, agents=len(agents), incremental=report_id is not None):
+        if report_id is not None:
+            return await orchestrate_incremental(user_input, report_id, agents, timeout, max_concurrency, mode,
+                                                 retry_failed)
+        if mode == "combined":
+            return await orchestrate_combined(user_input, agents, timeout, max_concurrency)
+        start_time = time.monotonic()
+        outcomes = await run_agents(user_input, agents, timeout, max_concurrency)
+        return build_report(user_input, outcomes, start_time)
+
+def run(user_input, **kwargs):
+    """
+    Synchronous entry point that returns the combined report dict.
+    """
+    return asyncio.run(orchestrate(user_input, **kwargs))
+
+def main():
+    """
+    Main execution function for the orchestrator.
+    Receives the PoC submission as a JSON argument and prints the combined report to stdout.
+    """
+    parser = argparse.ArgumentParser(description="Run all PoC agents concurrently and print the combined report.")
+    parser.add_argument("input", nargs="?", help="PoC submission as a JSON string.")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_AGENT_TIMEOUT, help="Per-agent timeout in seconds.")
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY, help="Maximum agents running at once.")
+    parser.add_argument("--mode", choices=["agents", "combined"], default=DEFAULT_REPORT_MODE,
+                        help="One LLM request per agent, or one combined request for the whole report.")
+    parser.add_argument("--report-id",
+                        help="Re-evaluate this stored report, rerunning only the agents whose inputs changed.")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="With --report-id, reuse every stored section and rerun only the failed agents.")
+    parser.add_argument("--record", action="store_true",
+                        help="Store the per-agent results given as {\"reportId\", \"submission\", \"results\"} "
+                             "instead of running the agents.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Print NDJSON progress events while the agents run, ending with a \"result\" event.")
+    args = parser.parse_args()
+    record_startup("main_orchestrator")
+
+    if not args.input:
+        print(json.dumps({"error": "No input provided"}))
+        return
+
+    user_input = json.loads(args.input)
+    retry_failed = args.retry_failed or None
+    if args.stream:
+        run_streaming("report", run, user_input, timeout=args.timeout, max_concurrency=args.max_concurrency, mode=args.mode,
+                      report_id=args.report_id, retry_failed=retry_failed)
+        return
+    # LangChain verbose output goes to stdout; keep stdout for the report only
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+    if args.record:
+        stored = record_results(user_input.get("submission") or {}, user_input["reportId"], user_input.get("results") or {})
+        protocol_out.write(json.dumps({"reportId": user_input["reportId"], "storedAgents": stored}) + "\n")
+        return
+    report = run(user_input, timeout=args.timeout, max_concurrency=args.max_concurrency, mode=args.mode,
+                 report_id=args.report_id, retry_failed=retry_failed)
+    protocol_out.write(json.dumps(report) + "\n")
+
+if __name__ == "__main__":
+    main()
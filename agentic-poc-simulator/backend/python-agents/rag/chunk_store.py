@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+import mmap
+import struct
+import hashlib
+import argparse
+
+PROCESSED_DATA_PATH = "../data/processed"
+DATA_FILENAME = "chunks.jsonl"
+INDEX_FILENAME = "chunks.idx"
+
+# Index record: chunk id (up to 32 ASCII bytes), data file offset, record length (0 marks a deletion)
+INDEX_RECORD = struct.Struct("<32sQI")
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class ChunkStore:
+    """
+    Append-only chunk store made of two files in one directory:
+      chunks.jsonl - one JSON record per chunk (id, text, metadata), readable with any text tool
+      chunks.idx   - fixed-size (id, offset, length) records; later records win, length 0 deletes
+    Chunks are read by id through a memory map of the data file, or streamed in insertion order.
+    """
+
+    def __init__(self, directory=PROCESSED_DATA_PATH):
+        self.directory = directory
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.data_path = os.path.join(directory, DATA_FILENAME)
+        self.index_path = os.path.join(directory, INDEX_FILENAME)
+        self._data_file = open(self.data_path, "ab")
+        self._index_file = open(self.index_path, "ab")
+        self._map = None
+        self._index = {}
+        self._garbage = 0
+        self._load_index()
+
+    def _load_index(self):
+        with open(self.index_path, "rb") as f:
+            raw = f.read()
+            stat = os.fstat(f.fileno())
+        # Identifies the index file contents this view was loaded from, for refresh(); the mtime
+        # catches a rewrite that kept the inode and size (e.g. clear() then re-ingest)
+        self._loaded = (stat.st_ino, len(raw), stat.st_mtime_ns)
+        usable = len(raw) - len(raw) % INDEX_RECORD.size
+        data_size = os.path.getsize(self.data_path)
+        for raw_id, offset, length in INDEX_RECORD.iter_unpack(raw[:usable]):
+            chunk_id = raw_id.rstrip(b"\0").decode("ascii")
+            if chunk_id in self._index:
+                self._garbage += 1
+            if length == 0:
+                self._index.pop(chunk_id, None)
+            elif offset + length <= data_size:
+                self._index[chunk_id] = (offset, length)
+
+    def refresh(self):
+        """
+        Reloads the index when another process has appended, compacted or cleared the store
+        since it was loaded, so a long-lived reader never serves stale offsets. Returns True if
+        it reloaded.
+        """
+        stat = os.stat(self.index_path)
+        if (stat.st_ino, stat.st_size, stat.st_mtime_ns) == self._loaded:
+            return False
+        self.close()
+        self._data_file = open(self.data_path, "ab")
+        self._index_file = open(self.index_path, "ab")
+        self._index = {}
+        self._garbage = 0
+        self._load_index()
+        return True
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, chunk_id):
+        return chunk_id in self._index
+
+    def _write_index(self, chunk_id, offset, length):
+        encoded = chunk_id.encode("ascii")
+        if len(encoded) > 32:
+            raise ValueError(f"Chunk id longer than 32 bytes: {chunk_id}")
+        self._index_file.write(INDEX_RECORD.pack(encoded, offset, length))
+
+    def append(self, chunk_id, text, metadata=None):
+        """
+        Adds or replaces a chunk. The text hash is stored with the metadata.
+        """
+        record = {"id": chunk_id, "text": text, "metadata": {**(metadata or {}), "hash": text_hash(text)}}
+        payload = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        self._data_file.seek(0, os.SEEK_END)
+        offset = self._data_file.tell()
+        self._data_file.write(payload)
+        self._write_index(chunk_id, offset, len(payload))
+        if chunk_id in self._index:
+            self._garbage += 1
+        self._index[chunk_id] = (offset, len(payload))
+
+    def delete(self, chunk_ids):
+        for chunk_id in chunk_ids:
+            if chunk_id in self._index:
+                self._write_index(chunk_id, 0, 0)
+                del self._index[chunk_id]
+                self._garbage += 1
+
+    def flush(self):
+        self._data_file.flush()
+        self._index_file.flush()
+
+    def _ensure_mapped(self, end):
+        """
+        Maps the data file read-only, remapping when appends have grown it past the current view.
+        """
+        if self._map is None or end > len(self._map):
+            self.flush()
+            if self._map is not None:
+                self._map.close()
+            with open(self.data_path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _read(self, offset, length):
+        self._ensure_mapped(offset + length)
+        return json.loads(self._map[offset:offset + length])
+
+    def get(self, chunk_id):
+        """
+        Returns the chunk record for chunk_id, or None if it is not stored.
+        """
+        location = self._index.get(chunk_id)
+        if location is None:
+            return None
+        return self._read(*location)
+
+    def iter_chunks(self):
+        """
+        Yields live chunk records in the order they were written.
+        """
+        for offset, length in sorted(self._index.values()):
+            yield self._read(offset, length)
+
+    def needs_compaction(self):
+        return self._garbage > max(1000, len(self._index))
+
+    def compact(self):
+        """
+        Rewrites both files with only the live chunks, dropping replaced and deleted records.
+        """
+        tmp_data = self.data_path + ".tmp"
+        tmp_index = self.index_path + ".tmp"
+        new_index = {}
+        with open(tmp_data, "wb") as data_out, open(tmp_index, "wb") as index_out:
+            for chunk_id, (offset, length) in sorted(self._index.items(), key=lambda item: item[1]):
+                self._ensure_mapped(offset + length)
+                new_offset = data_out.tell()
+                data_out.write(self._map[offset:offset + length])
+                index_out.write(INDEX_RECORD.pack(chunk_id.encode("ascii"), new_offset, length))
+                new_index[chunk_id] = (new_offset, length)
+        self.close()
+        os.replace(tmp_data, self.data_path)
+        os.replace(tmp_index, self.index_path)
+        self._data_file = open(self.data_path, "ab")
+        self._index_file = open(self.index_path, "ab")
+        self._index = new_index
+        self._garbage = 0
+
+    def clear(self):
+        self.close()
+        for path in (self.data_path, self.index_path):
+            open(path, "wb").close()
+        self._data_file = open(self.data_path, "ab")
+        self._index_file = open(self.index_path, "ab")
+        self._index = {}
+        self._garbage = 0
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._data_file.close()
+        self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def main():
+    """
+    Small inspection tool for the processed chunk store.
+    """
+    parser = argparse.ArgumentParser(description="Inspect the processed chunk store.")
+    parser.add_argument("--dir", default=PROCESSED_DATA_PATH, help="Chunk store directory.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Print the number of live chunks and file sizes.")
+    show = subparsers.add_parser("show", help="Print one chunk by id.")
+    show.add_argument("chunk_id")
+    subparsers.add_parser("dump", help="Print every live chunk as JSON lines.")
+    subparsers.add_parser("compact", help="Drop replaced and deleted records.")
+    args = parser.parse_args()
+
+    with ChunkStore(args.dir) as store:
+        if args.command == "stats":
+            print(json.dumps({
+                "chunks": len(store),
+                "dataBytes": os.path.getsize(store.data_path),
+                "indexBytes": os.path.getsize(store.index_path),
+            }))
+        elif args.command == "show":
+            record = store.get(args.chunk_id)
+            if record is None:
+                sys.exit(f"Chunk not found: {args.chunk_id}")
+            print(json.dumps(record, ensure_ascii=False, indent=2))
+        elif args.command == "dump":
+            for record in store.iter_chunks():
+                print(json.dumps(record, ensure_ascii=False))
+        elif args.command == "compact":
+            store.compact()
+            print(f"Compacted to {len(store)} chunks.")
+
+if __name__ == "__main__":
+    main()
@@ -1,68 +1,180 @@
 import os
 import sys
-from dotenv import load_dotenv
-from langchain.document_loaders import DirectoryLoader, UnstructuredFileLoader
+import glob
+import argparse
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain.vectorstores import Chroma
 
-# Load environment variables
-load_dotenv()
-gemini_api_key = os.getenv("GEMINI_API_KEY")
-if not gemini_api_key:
-    sys.exit("GEMINI_API_KEY not found in .env file")
+# Make the shared python-agents modules importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.llm import get_embeddings, EMBEDDING_MODEL
+from rag.embedding_cache import CachedEmbeddings
+from rag.ingest_manifest import MANIFEST_FILENAME, scan_files, load_manifest, save_manifest, plan_changes
+from rag.chunk_store import ChunkStore
+from rag.ingest_pipeline import DEFAULT_PARSE_WORKERS, DEFAULT_BATCH_SIZE, Throughput, iter_parsed, iter_chunk_events
+from rag.lexical_index import LEXICAL_INDEX_PATH, build_lexical_index
+from rag.near_duplicates import NEAR_DUP_INDEX_FILENAME, NEAR_DUP_THRESHOLD, NearDuplicateIndex
+from utils.quota import quota_priority
+from utils.tracing import span, record_startup
 
 # Define paths
 RAW_DATA_PATH = "../data/raw"
 VECTOR_STORE_PATH = "../data/vector_store"
 PROCESSED_DATA_PATH = "../data/processed"
+MANIFEST_PATH = os.path.join(VECTOR_STORE_PATH, MANIFEST_FILENAME)
+NEAR_DUP_INDEX_PATH = os.path.join(VECTOR_STORE_PATH, NEAR_DUP_INDEX_FILENAME)
 
-def ingest_documents():
+def ingest_documents(rebuild=False, workers=DEFAULT_PARSE_WORKERS, batch_size=DEFAULT_BATCH_SIZE,
+                     dedup_threshold=NEAR_DUP_THRESHOLD):
     """
     Ingests documents from the raw data directory, processes them,
     and stores them in a Chroma vector store.
+    Only files that are new or changed since the last run (per the manifest kept next to
+    the vector store) are parsed and upserted; chunks of changed or deleted files are removed.
+    Files are parsed in a process pool and chunks are embedded and written in bounded batches,
+    so memory stays flat however large the corpus is.
+    Chunks whose MinHash similarity to an already kept chunk reaches dedup_threshold are dropped
+    before embedding; a dedup_threshold of None disables the check.
     """
     print("Starting document ingestion process...")
 
-    # Ensure processed data directory exists
-    if not os.path.exists(PROCESSED_DATA_PATH):
-        os.makedirs(PROCESSED_DATA_PATH)
+    # Processed chunks are kept in one indexed store; drop per-chunk files left by older versions
+    chunk_store = ChunkStore(PROCESSED_DATA_PATH)
+    for legacy_path in glob.glob(os.path.join(PROCESSED_DATA_PATH, "chunk_*.txt")):
+        os.remove(legacy_path)
 
-    # Load documents from the raw data directory
-    # This loader will handle various file types like .txt, .pdf, .md
-    loader = DirectoryLoader(RAW_DATA_PATH, glob="**/*.*", loader_cls=lambda p: UnstructuredFileLoader(p), show_progress=True)
-    documents = loader.load()
+    manifest = load_manifest(MANIFEST_PATH)
+    # Create embeddings, reusing cached vectors for chunks embedded by earlier runs
+    embeddings = CachedEmbeddings(get_embeddings(), EMBEDDING_MODEL)
+    vectorstore = Chroma(persist_directory=VECTOR_STORE_PATH, embedding_function=embeddings)
 
-    if not documents:
-        print("No documents found in the raw data directory. Exiting.")
-        return
+    if rebuild or not manifest["files"]:
+        # Without a manifest the store holds chunks with random ids that cannot be matched
+        # to files, so start from an empty collection once and index everything with stable ids.
+        existing_ids = vectorstore.get()["ids"]
+        if existing_ids:
+            print(f"Removing {len(existing_ids)} chunks not tracked by the manifest...")
+            vectorstore.delete(ids=existing_ids)
+        manifest["files"] = {}
+        chunk_store.clear()
 
-    print(f"Loaded {len(documents)} documents.")
+    near_duplicates = NearDuplicateIndex(NEAR_DUP_INDEX_PATH, dedup_threshold or NEAR_DUP_THRESHOLD)
+    if dedup_threshold is None:
+        # Chunks kept by this run are not indexed, so the next deduplicating run refills the index
+        near_duplicates.invalidate()
+        near_duplicates.close()
+        near_duplicates = None
+    elif not manifest["files"] or near_duplicates.needs_rebuild():
+        # Index the chunks already stored so new chunks are compared with them
+        with span("near-duplicate index", "ingest") as traced:
+            indexed = near_duplicates.rebuild((record["id"], record["metadata"]["source"], record["text"])
+                                              for record in chunk_store.iter_chunks())
+            traced.set(chunks=indexed)
 
-    # Split documents into chunks
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = text_splitter.split_documents(documents)
-    print(f"Split documents into {len(chunks)} chunks.")
+    with span("plan", "ingest") as traced:
+        files = scan_files(RAW_DATA_PATH)
+        plan = plan_changes(manifest, files)
+        traced.set(files=len(files), changed=len(plan["changed"]), deleted=len(plan["deleted"]))
+    changed, deleted = plan["changed"], plan["deleted"]
+    print(f"{len(changed)} new or changed, {len(deleted)} deleted, {plan['unchanged']} unchanged files.")
+
+    stale_ids = []
+    removed_sources = list(changed) + deleted
+    while removed_sources:
+        removed_ids = []
+        for source in removed_sources:
+            removed_ids.extend(manifest["files"].get(source, {}).get("chunkIds", []))
+        stale_ids.extend(removed_ids)
+        if near_duplicates is None:
+            break
+        # Files with chunks dropped as near-duplicates of removed chunks are re-ingested to get them back
+        orphaned = near_duplicates.remove(removed_ids, removed_sources) & manifest["files"].keys()
+        removed_sources = sorted(orphaned - set(changed) - set(deleted))
+        for source in removed_sources:
+            changed[source] = {key: value for key, value in manifest["files"][source].items() if key != "chunkIds"}
+        if removed_sources:
+            print(f"Re-ingesting {len(removed_sources)} files whose near-duplicate chunks lost their match.")
+    if stale_ids:
+        vectorstore.delete(ids=stale_ids)
+        chunk_store.delete(stale_ids)
+        print(f"Removed {len(stale_ids)} stale chunks.")
+    for source in deleted:
+        del manifest["files"][source]
 
-    # Save processed chunks for inspection (optional)
-    for i, chunk in enumerate(chunks):
-        with open(os.path.join(PROCESSED_DATA_PATH, f"chunk_{i}.txt"), "w", encoding="utf-8") as f:
-            f.write(chunk.page_content)
+    # Split documents into chunks
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, add_start_index=True)
+    throughput = Throughput()
+    batch = []
+    # Files whose chunks have all been queued; they enter the manifest once their last batch is written
+    finished_files = []
+    dropped_ids = set()
 
-    print("Creating embeddings and storing in ChromaDB...")
-    # Create embeddings
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=gemini_api_key)
+    def write_batch():
+        if batch:
+            with span("write batch", "ingest", chunks=len(batch)):
+                vectorstore.add_documents(batch, ids=[chunk.metadata["chunk_id"] for chunk in batch])
+                # Save processed chunks for retrieval, dedup and inspection
+                for chunk in batch:
+                    metadata = {"source": chunk.metadata["source"], "offset": chunk.metadata["offset"]}
+                    chunk_store.append(chunk.metadata["chunk_id"], chunk.page_content, metadata)
+            throughput.chunks += len(batch)
+            batch.clear()
+        for source, ids in finished_files:
+            manifest["files"][source] = {**changed[source], "chunkIds": [id_ for id_ in ids if id_ not in dropped_ids]}
+            throughput.files += 1
+        finished_files.clear()
+        if near_duplicates is not None:
+            near_duplicates.commit()
 
-    # Create and persist the vector store
-    vectorstore = Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        persist_directory=VECTOR_STORE_PATH
-    )
+    parsed = iter_parsed({source: files[source] for source in changed}, workers=workers)
+    for event, source, payload in iter_chunk_events(parsed, text_splitter):
+        if event == "chunk":
+            if near_duplicates is not None and near_duplicates.add(payload.metadata["chunk_id"], source, payload.page_content):
+                dropped_ids.add(payload.metadata["chunk_id"])
+                continue
+            batch.append(payload)
+            if len(batch) >= batch_size:
+                write_batch()
+        elif event == "file_done":
+            finished_files.append((source, payload))
+        else:
+            print(f"Skipping {source}: {payload}")
+    write_batch()
 
     # Persist the vector store
-    vectorstore.persist()
-    print(f"Successfully created and persisted vector store at {VECTOR_STORE_PATH}")
+    with span("persist", "ingest"):
+        vectorstore.persist()
+        if chunk_store.needs_compaction():
+            chunk_store.compact()
+    # Keep the BM25 index in sync with the chunks; its statistics are corpus-wide, so rebuild it
+    if changed or deleted or stale_ids or not os.path.exists(os.path.join(LEXICAL_INDEX_PATH, "meta.json")):
+        with span("lexical index", "ingest") as traced:
+            indexed = build_lexical_index((record["id"], record["text"]) for record in chunk_store.iter_chunks())
+            traced.set(chunks=indexed)
+        print(f"Rebuilt lexical index with {indexed} chunks.")
+    chunk_store.close()
+    save_manifest(MANIFEST_PATH, manifest)
+    print(f"Upserted {throughput.summary()}.")
+    print(f"Embeddings: {embeddings.reused} reused from cache, {embeddings.computed} newly computed.")
+    if near_duplicates is not None:
+        totals = near_duplicates.stats()
+        near_duplicates.close()
+        print(f"Near-duplicates: dropped {near_duplicates.dropped} chunks ({near_duplicates.dropped_bytes / 1024:.1f} KiB of text) "
+              f"this run, {totals['droppedChunks']} ({totals['droppedBytes'] / 1024:.1f} KiB) in total "
+              f"at similarity >= {dedup_threshold:g}.")
+    print(f"Successfully updated and persisted vector store at {VECTOR_STORE_PATH}")
 
 if __name__ == "__main__":
-    ingest_documents() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Ingest raw documents into the Chroma vector store.")
+    parser.add_argument("--rebuild", action="store_true", help="Drop every indexed chunk and re-ingest all files.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_PARSE_WORKERS, help="Parser processes (1 parses inline).")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Chunks embedded and written per batch.")
+    parser.add_argument("--dedup-threshold", type=float, default=NEAR_DUP_THRESHOLD,
+                        help="Estimated Jaccard similarity at which a chunk is dropped as a near-duplicate.")
+    parser.add_argument("--no-dedup", action="store_true", help="Keep near-duplicate chunks.")
+    args = parser.parse_args()
+    record_startup("doc_ingestor")
+    # Embedding calls yield to interactive agent requests sharing the quota
+    with quota_priority("batch"), span("ingest", "ingest", rebuild=args.rebuild, workers=args.workers):
+        ingest_documents(rebuild=args.rebuild, workers=args.workers, batch_size=args.batch_size,
+                         dedup_threshold=None if args.no_dedup else args.dedup_threshold)
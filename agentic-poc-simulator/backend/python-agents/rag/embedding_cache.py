@@ -0,0 +1,99 @@
+import os
+import array
+import sqlite3
+import hashlib
+import threading
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "../data/cache/embeddings.sqlite3")
+EMBEDDING_BATCH_SIZE = 100
+
+def embedding_key(text, model):
+    """
+    SHA-256 of the embedding model and the exact chunk text.
+    """
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+def pack_vector(vector):
+    return array.array("f", vector).tobytes()
+
+def unpack_vector(blob):
+    vector = array.array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+class EmbeddingCache:
+    """
+    On-disk store of float32 embedding vectors keyed by content hash.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+
+    def get_many(self, keys):
+        """
+        Returns {key: vector} for the keys that are cached.
+        """
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(f"SELECT key, vector FROM vectors WHERE key IN ({placeholders})", batch)
+                for key, blob in rows:
+                    found[key] = unpack_vector(blob)
+        return found
+
+    def put_many(self, items):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, vector) VALUES (?, ?)",
+                [(key, pack_vector(vector)) for key, vector in items],
+            )
+            self._conn.commit()
+
+class CachedEmbeddings:
+    """
+    Wraps a LangChain embeddings object so embed_documents only sends cache misses
+    to the API, in batches. Query embeddings are passed straight through.
+    """
+
+    def __init__(self, embeddings, model, cache=None, batch_size=EMBEDDING_BATCH_SIZE):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache or EmbeddingCache()
+        self.batch_size = batch_size
+        self.reused = 0
+        self.computed = 0
+
+    def embed_documents(self, texts):
+        keys = [embedding_key(text, self.model) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        missing_keys = list(missing)
+        for start in range(0, len(missing_keys), self.batch_size):
+            batch_keys = missing_keys[start:start + self.batch_size]
+            batch_vectors = self.embeddings.embed_documents([missing[key] for key in batch_keys])
+            new_items = list(zip(batch_keys, batch_vectors))
+            self.cache.put_many(new_items)
+            vectors.update(new_items)
+
+        self.computed += len(missing_keys)
+        self.reused += len(texts) - len(missing_keys)
+        return [list(vectors[key]) for key in keys]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
@@ -0,0 +1,63 @@
+import os
+import json
+import time
+import shutil
+
+def new_build(out_dir):
+    """
+    Creates an empty directory next to out_dir for a new build and returns (path, version).
+    The build becomes visible only once publish_build swaps out_dir to it.
+    """
+    version = time.time_ns()
+    out_dir = os.path.normpath(out_dir)
+    parent = os.path.dirname(out_dir) or "."
+    os.makedirs(parent, exist_ok=True)
+    build_dir = os.path.join(parent, _build_prefix(out_dir) + str(version))
+    os.makedirs(build_dir)
+    return build_dir, version
+
+def publish_build(out_dir, build_dir):
+    """
+    Points the out_dir symlink at build_dir with os.replace, so readers see either the old or
+    the new build as a whole, then removes older builds. Processes that still map files of an
+    old build keep them alive until they reopen.
+    """
+    out_dir = os.path.normpath(out_dir)
+    parent = os.path.dirname(out_dir) or "."
+    generation = os.path.basename(build_dir)
+    if os.path.isdir(out_dir) and not os.path.islink(out_dir):
+        # Index written in place by an older version; replaced once by the symlink layout
+        shutil.rmtree(out_dir)
+    link_tmp = out_dir + ".link-tmp"
+    if os.path.lexists(link_tmp):
+        os.remove(link_tmp)
+    os.symlink(generation, link_tmp)
+    os.replace(link_tmp, out_dir)
+    for name in os.listdir(parent):
+        if name.startswith(_build_prefix(out_dir)) and name != generation:
+            shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+def build_key(path, filename):
+    """
+    Identifies the build path currently points to by its header file, or None if there is no
+    build yet. Changes whenever a new build is published.
+    """
+    try:
+        stat = os.stat(os.path.join(path, filename))
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+def build_version(path, filename, field):
+    """
+    Reads the version stamp field from the header file of the build path points to, or None
+    if there is no build yet.
+    """
+    try:
+        with open(os.path.join(path, filename), "r", encoding="utf-8") as f:
+            return json.load(f).get(field)
+    except FileNotFoundError:
+        return None
+
+def _build_prefix(out_dir):
+    return os.path.basename(out_dir) + ".gen-"
@@ -0,0 +1,93 @@
+import os
+import json
+import fnmatch
+import hashlib
+
+MANIFEST_FILENAME = "ingest_manifest.json"
+MANIFEST_VERSION = 1
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_id(source, index, text):
+    """
+    Stable id for the index-th chunk of a source file, so re-ingesting the same content
+    upserts the same vector-store rows instead of adding duplicates.
+    """
+    return hashlib.sha256(f"{source}\0{index}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+def scan_files(root, pattern="*.*"):
+    """
+    Returns {relative path: absolute path} for every file under root matching pattern.
+    Relative paths always use forward slashes so manifests are portable between OSes.
+    """
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if fnmatch.fnmatch(name, pattern):
+                path = os.path.join(directory, name)
+                files[os.path.relpath(path, root).replace(os.sep, "/")] = path
+    return files
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {"version": MANIFEST_VERSION, "files": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION, "files": {}}
+    return manifest
+
+def save_manifest(path, manifest):
+    """
+    Writes the manifest atomically so an interrupted run never leaves a truncated file behind.
+    """
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def corpus_version(path):
+    """
+    Hash of the indexed chunk ids per file in the manifest at path, which changes whenever
+    ingestion adds, changes or removes a chunk. None if nothing was ingested yet.
+    """
+    if not os.path.exists(path):
+        return None
+    chunk_ids = {source: entry.get("chunkIds", []) for source, entry in load_manifest(path)["files"].items()}
+    return hashlib.sha256(json.dumps(chunk_ids, sort_keys=True).encode("utf-8")).hexdigest()
+
+def plan_changes(manifest, files):
+    """
+    Compares the scanned files with the manifest.
+    Size and mtime are checked first; the content hash is only computed when they differ,
+    so unchanged files cost one stat call. Returns a dict with:
+      changed   - new or modified relative paths, with their fresh manifest entries
+      deleted   - relative paths in the manifest that no longer exist
+      unchanged - number of files that need no work
+    Files that were touched but whose content hash still matches have their entry refreshed in place.
+    """
+    known = manifest["files"]
+    changed = {}
+    unchanged = 0
+    for rel, path in sorted(files.items()):
+        entry = known.get(rel)
+        stat = os.stat(path)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            unchanged += 1
+            continue
+        sha256 = file_sha256(path)
+        if entry and entry["sha256"] == sha256:
+            entry["size"], entry["mtime"] = stat.st_size, stat.st_mtime
+            unchanged += 1
+            continue
+        changed[rel] = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": sha256}
+    deleted = sorted(rel for rel in known if rel not in files)
+    return {"changed": changed, "deleted": deleted, "unchanged": unchanged}
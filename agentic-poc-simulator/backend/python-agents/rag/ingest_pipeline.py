@@ -0,0 +1,86 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from rag.ingest_manifest import chunk_id
+from utils.tracing import span
+
+DEFAULT_PARSE_WORKERS = os.cpu_count() or 1
+DEFAULT_BATCH_SIZE = 64
+
+def parse_file(path):
+    """
+    Parses one raw file into LangChain documents. Runs inside a pool process.
+    """
+    from langchain.document_loaders import UnstructuredFileLoader
+    return UnstructuredFileLoader(path).load()
+
+def _parse_job(source, path):
+    try:
+        with span("parse file", "ingest", source=source) as traced:
+            documents = parse_file(path)
+            traced.set(documents=len(documents))
+        return source, documents, None
+    except Exception as e:
+        return source, None, f"{type(e).__name__}: {e}"
+
+def iter_parsed(files, workers=DEFAULT_PARSE_WORKERS, max_in_flight=None):
+    """
+    Parses {source: path} in a process pool and yields (source, documents, error) as files finish.
+    At most max_in_flight files are parsed or waiting to be consumed at once, so a slow consumer
+    holds the pool back instead of letting parsed documents pile up in memory.
+    """
+    items = iter(files.items())
+    if workers <= 1:
+        for source, path in items:
+            yield _parse_job(source, path)
+        return
+
+    max_in_flight = max_in_flight or workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        for source, path in items:
+            in_flight.add(executor.submit(_parse_job, source, path))
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+def iter_chunk_events(parsed, text_splitter):
+    """
+    Splits parsed documents lazily. Yields ("chunk", source, chunk) for every chunk, then
+    ("file_done", source, chunk_ids) once all chunks of a file have been yielded,
+    or ("file_failed", source, error) when the file could not be parsed.
+    """
+    for source, documents, error in parsed:
+        if error:
+            yield "file_failed", source, error
+            continue
+        ids = []
+        for document in documents:
+            for chunk in text_splitter.split_documents([document]):
+                chunk.metadata["source"] = source
+                chunk.metadata["offset"] = chunk.metadata.pop("start_index", None)
+                chunk.metadata["chunk_id"] = chunk_id(source, len(ids), chunk.page_content)
+                ids.append(chunk.metadata["chunk_id"])
+                yield "chunk", source, chunk
+        yield "file_done", source, ids
+
+class Throughput:
+    """
+    Counts files and chunks and reports their rates since start.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.files = 0
+        self.chunks = 0
+
+    def summary(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return (f"{self.files} files, {self.chunks} chunks in {elapsed:.1f}s "
+                f"({self.files / elapsed:.1f} files/sec, {self.chunks / elapsed:.1f} chunks/sec)")
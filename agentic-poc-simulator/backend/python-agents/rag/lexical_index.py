@@ -0,0 +1,173 @@
+import os
+import re
+import sys
+import json
+import time
+import math
+import argparse
+import threading
+from collections import Counter, defaultdict
+import numpy as np
+
+# Make the shared python-agents modules importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag.index_builds import new_build, publish_build, build_key, build_version
+
+LEXICAL_INDEX_PATH = "../data/lexical_index"
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Keeps tech names such as node.js, c++, c#, next.js and gpt-4 as single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:[./\-][a-z0-9+#]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+def build_lexical_index(records, out_dir=LEXICAL_INDEX_PATH):
+    """
+    Builds a BM25 inverted index from (chunk_id, text) pairs and writes it to out_dir:
+      meta.json   - document count, average length and build version
+      ids.json    - chunk id per row
+      vocab.json  - term -> [start, end) slice of the posting arrays
+      rows.npy, tfs.npy - posting lists (document row, term frequency), grouped by term
+      lengths.npy - token count per document
+    The files are written to a new build directory and swapped in atomically (rag/index_builds.py).
+    """
+    postings = defaultdict(list)
+    ids = []
+    lengths = []
+    for row, (chunk_id, text) in enumerate(records):
+        counts = Counter(tokenize(text))
+        ids.append(chunk_id)
+        lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            postings[term].append((row, tf))
+
+    vocab = {}
+    rows = []
+    tfs = []
+    for term in sorted(postings):
+        vocab[term] = [len(rows), len(rows) + len(postings[term])]
+        for row, tf in postings[term]:
+            rows.append(row)
+            tfs.append(tf)
+
+    build_dir, version = new_build(out_dir)
+    np.save(os.path.join(build_dir, "rows.npy"), np.asarray(rows, dtype=np.int32))
+    np.save(os.path.join(build_dir, "tfs.npy"), np.asarray(tfs, dtype=np.float32))
+    np.save(os.path.join(build_dir, "lengths.npy"), np.asarray(lengths, dtype=np.float32))
+    with open(os.path.join(build_dir, "ids.json"), "w", encoding="utf-8") as f:
+        json.dump(ids, f)
+    with open(os.path.join(build_dir, "vocab.json"), "w", encoding="utf-8") as f:
+        json.dump(vocab, f)
+    with open(os.path.join(build_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"count": len(ids), "avgLength": (sum(lengths) / len(lengths)) if lengths else 0.0,
+                   "version": version}, f)
+
+    publish_build(out_dir, build_dir)
+    return len(ids)
+
+class LexicalIndex:
+    """
+    Read-only BM25 index written by build_lexical_index. Queries run locally with no
+    embedding call, so they work even when the embedding quota is exhausted.
+    """
+
+    def __init__(self, path=LEXICAL_INDEX_PATH, k1=BM25_K1, b=BM25_B):
+        # Resolve the symlink once so every file comes from the same build
+        path = os.path.realpath(path)
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(path, "vocab.json"), "r", encoding="utf-8") as f:
+            self.vocab = json.load(f)
+        with open(os.path.join(path, "ids.json"), "r", encoding="utf-8") as f:
+            self.ids = json.load(f)
+        self.count = meta["count"]
+        self.version = meta.get("version")
+        self.k1 = k1
+        self.rows = np.load(os.path.join(path, "rows.npy"), mmap_mode="r")
+        self.tfs = np.load(os.path.join(path, "tfs.npy"), mmap_mode="r")
+        lengths = np.load(os.path.join(path, "lengths.npy"))
+        average = meta["avgLength"] or 1.0
+        # Per-document part of the BM25 denominator, computed once at open
+        self.length_norm = k1 * (1 - b + b * lengths / average)
+
+    def search(self, query, k=4):
+        """
+        Returns up to k (chunk_id, score) pairs for the query, best first.
+        """
+        scores = np.zeros(self.count, dtype=np.float32)
+        for term in set(tokenize(query)):
+            span = self.vocab.get(term)
+            if not span:
+                continue
+            rows = self.rows[span[0]:span[1]]
+            tf = self.tfs[span[0]:span[1]]
+            df = len(rows)
+            idf = math.log(1 + (self.count - df + 0.5) / (df + 0.5))
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + self.length_norm[rows])
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        return [(self.ids[row], float(scores[row])) for row in candidates]
+
+_open_indexes = {}
+_open_lock = threading.Lock()
+
+def get_lexical_index(path=LEXICAL_INDEX_PATH):
+    """
+    Opens the lexical index once per process, and again after ingestion has rebuilt it.
+    Returns None while no index has been built yet.
+    """
+    key = build_key(path, "meta.json")
+    with _open_lock:
+        cached = _open_indexes.get(path)
+        if cached is None or cached[0] != key:
+            if key is None:
+                print(f"[lexical_index.py] No lexical index at {path}; run ingest first "
+                      f"(rag/doc_ingestor.py or rag/lexical_index.py build)", file=sys.stderr)
+                cached = (None, None)
+            else:
+                cached = (key, LexicalIndex(path))
+            _open_indexes[path] = cached
+        return cached[1]
+
+def index_version(path=LEXICAL_INDEX_PATH):
+    """
+    Build version of the published lexical index, or None if none was built yet.
+    """
+    return build_version(path, "meta.json", "version")
+
+def main():
+    """
+    Rebuilds the lexical index from the processed chunk store, or runs a query against it.
+    """
+    from rag.chunk_store import ChunkStore, PROCESSED_DATA_PATH
+
+    parser = argparse.ArgumentParser(description="Build or query the BM25 lexical index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("build", help="Rebuild the index from the processed chunk store.")
+    query = subparsers.add_parser("query", help="Print the top chunks for a query.")
+    query.add_argument("text")
+    query.add_argument("-k", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        with ChunkStore(PROCESSED_DATA_PATH) as store:
+            count = build_lexical_index((record["id"], record["text"]) for record in store.iter_chunks())
+        print(f"Indexed {count} chunks into {LEXICAL_INDEX_PATH}")
+    else:
+        index = get_lexical_index()
+        if index is None:
+            sys.exit(1)
+        start = time.perf_counter()
+        results = index.search(args.text, args.k)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(json.dumps({"results": results, "queryMs": round(elapsed_ms, 3)}))
+
+if __name__ == "__main__":
+    main()
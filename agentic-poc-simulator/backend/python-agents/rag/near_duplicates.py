@@ -0,0 +1,262 @@
+import os
+import re
+import sys
+import json
+import zlib
+import sqlite3
+import hashlib
+import argparse
+import numpy as np
+
+NEAR_DUP_INDEX_FILENAME = "near_duplicates.sqlite3"
+# Estimated Jaccard similarity of word shingles at or above which a chunk counts as a near-duplicate
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.85"))
+NEAR_DUP_PERMUTATIONS = int(os.getenv("NEAR_DUP_PERMUTATIONS", "128"))
+NEAR_DUP_SHINGLE_WORDS = int(os.getenv("NEAR_DUP_SHINGLE_WORDS", "5"))
+NEAR_DUP_SEED = 1
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+def shingle_hashes(text, size=NEAR_DUP_SHINGLE_WORDS):
+    """
+    CRC32 of every run of size consecutive lowercase words. Texts shorter than size words are
+    one shingle; texts without words have none.
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    count = max(1, len(words) - size + 1)
+    hashes = {zlib.crc32(" ".join(words[start:start + size]).encode("utf-8")) for start in range(count)}
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+def lsh_shape(threshold, permutations):
+    """
+    (bands, rows) splitting the signature so that pairs near the threshold almost always share a
+    bucket: the band count whose S-curve midpoint (1/bands)^(1/rows) is the highest one still
+    below the threshold. Candidates are then verified against the threshold exactly.
+    """
+    shapes = [(permutations // rows, rows) for rows in range(1, permutations + 1) if permutations % rows == 0]
+    below = [shape for shape in shapes if (1 / shape[0]) ** (1 / shape[1]) < threshold]
+    return max(below, key=lambda shape: (1 / shape[0]) ** (1 / shape[1])) if below else shapes[0]
+
+class MinHasher:
+    """
+    MinHash signatures from universal hashes (a * x + b) mod 2^61 - 1, vectorized over shingles.
+    The same seed and permutation count always give the same signatures, so they can be stored.
+    """
+
+    def __init__(self, permutations=NEAR_DUP_PERMUTATIONS, shingle_words=NEAR_DUP_SHINGLE_WORDS, seed=NEAR_DUP_SEED):
+        rng = np.random.RandomState(seed)
+        self.permutations = permutations
+        self.shingle_words = shingle_words
+        self._a = rng.randint(1, (1 << 61) - 1, size=permutations, dtype=np.uint64)
+        self._b = rng.randint(0, (1 << 61) - 1, size=permutations, dtype=np.uint64)
+
+    def signature(self, text):
+        """
+        uint32 signature of the text, or None if it has no words.
+        """
+        hashes = shingle_hashes(text, self.shingle_words)
+        if not hashes.size:
+            return None
+        # uint64 products wrap around, which keeps the hash family well mixed
+        with np.errstate(over="ignore"):
+            permuted = (np.outer(hashes, self._a) + self._b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+class NearDuplicateIndex:
+    """
+    Persistent MinHash/LSH index of the chunks kept by ingestion, in one SQLite file:
+      signatures - MinHash signature and source file of every kept chunk
+      buckets    - one LSH bucket per signature band, for candidate lookup
+      duplicates - chunks dropped as near-duplicates, with the kept chunk they matched
+    Chunks are checked against everything ingested before, across incremental runs. Changing the
+    permutation count or shingle size invalidates the stored signatures (see needs_rebuild).
+    """
+
+    def __init__(self, path, threshold=NEAR_DUP_THRESHOLD, permutations=NEAR_DUP_PERMUTATIONS,
+                 shingle_words=NEAR_DUP_SHINGLE_WORDS):
+        self.path = path
+        self.threshold = threshold
+        self.hasher = MinHasher(permutations, shingle_words)
+        self.bands, self.rows = lsh_shape(threshold, permutations)
+        self.dropped = 0
+        self.dropped_bytes = 0
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS signatures (chunk_id TEXT PRIMARY KEY, source TEXT NOT NULL, signature BLOB NOT NULL);
+            CREATE INDEX IF NOT EXISTS signatures_source ON signatures (source);
+            CREATE TABLE IF NOT EXISTS buckets (bucket INTEGER NOT NULL, chunk_id TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS buckets_bucket ON buckets (bucket);
+            CREATE INDEX IF NOT EXISTS buckets_chunk ON buckets (chunk_id);
+            CREATE TABLE IF NOT EXISTS duplicates (chunk_id TEXT PRIMARY KEY, source TEXT NOT NULL, original_id TEXT NOT NULL, bytes INTEGER NOT NULL);
+            CREATE INDEX IF NOT EXISTS duplicates_original ON duplicates (original_id);
+            CREATE INDEX IF NOT EXISTS duplicates_source ON duplicates (source);
+        """)
+        self._conn.commit()
+
+    def _params(self):
+        return json.dumps({"permutations": self.hasher.permutations, "shingleWords": self.hasher.shingle_words,
+                           "seed": NEAR_DUP_SEED, "bands": self.bands, "rows": self.rows}, sort_keys=True)
+
+    def needs_rebuild(self):
+        """
+        True if the index was built with other parameters or is empty, so it has to be refilled
+        from the chunk store before it can be trusted.
+        """
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'params'").fetchone()
+        if row is None or row[0] != self._params():
+            return True
+        return self._conn.execute("SELECT 1 FROM signatures LIMIT 1").fetchone() is None
+
+    def clear(self):
+        self._conn.executescript("DELETE FROM signatures; DELETE FROM buckets; DELETE FROM duplicates;")
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('params', ?)", (self._params(),))
+        self._conn.commit()
+
+    def invalidate(self):
+        """
+        Marks the index for a rebuild, after chunks were stored without being indexed.
+        """
+        self._conn.execute("DELETE FROM meta WHERE key = 'params'")
+        self._conn.commit()
+
+    def rebuild(self, records):
+        """
+        Refills the index from (chunk_id, source, text) of the chunks already stored. Dropped
+        duplicates from earlier runs are forgotten; they stay out of the store.
+        """
+        self.clear()
+        count = 0
+        for chunk_id, source, text in records:
+            signature = self.hasher.signature(text)
+            if signature is not None:
+                self._insert(chunk_id, source, signature)
+                count += 1
+        self._conn.commit()
+        return count
+
+    def _bucket_keys(self, signature):
+        keys = []
+        for band in range(self.bands):
+            digest = hashlib.blake2b(band.to_bytes(2, "little") + signature[band * self.rows:(band + 1) * self.rows].tobytes(),
+                                     digest_size=8).digest()
+            keys.append(int.from_bytes(digest, "little", signed=True))
+        return keys
+
+    def _insert(self, chunk_id, source, signature):
+        self._conn.execute("INSERT OR REPLACE INTO signatures (chunk_id, source, signature) VALUES (?, ?, ?)",
+                           (chunk_id, source, signature.tobytes()))
+        self._conn.execute("DELETE FROM buckets WHERE chunk_id = ?", (chunk_id,))
+        self._conn.executemany("INSERT INTO buckets (bucket, chunk_id) VALUES (?, ?)",
+                               [(key, chunk_id) for key in self._bucket_keys(signature)])
+
+    def _best_match(self, signature):
+        keys = self._bucket_keys(signature)
+        placeholders = ",".join("?" * len(keys))
+        rows = self._conn.execute(
+            f"SELECT s.chunk_id, s.signature FROM signatures s WHERE s.chunk_id IN "
+            f"(SELECT DISTINCT chunk_id FROM buckets WHERE bucket IN ({placeholders}))", keys
+        ).fetchall()
+        best_id, best_similarity = None, 0.0
+        for chunk_id, blob in rows:
+            similarity = float(np.mean(np.frombuffer(blob, dtype=np.uint32) == signature))
+            if similarity > best_similarity:
+                best_id, best_similarity = chunk_id, similarity
+        return (best_id, best_similarity) if best_similarity >= self.threshold else (None, best_similarity)
+
+    def add(self, chunk_id, source, text):
+        """
+        Checks a new chunk against every indexed chunk. Returns the id of the kept chunk it
+        near-duplicates (the new chunk is recorded as dropped), or None after indexing it as kept.
+        """
+        signature = self.hasher.signature(text)
+        if signature is None:
+            return None
+        original_id, _ = self._best_match(signature)
+        if original_id is None:
+            self._insert(chunk_id, source, signature)
+            return None
+        size = len(text.encode("utf-8"))
+        self._conn.execute("INSERT OR REPLACE INTO duplicates (chunk_id, source, original_id, bytes) VALUES (?, ?, ?, ?)",
+                           (chunk_id, source, original_id, size))
+        self.dropped += 1
+        self.dropped_bytes += size
+        return original_id
+
+    def remove(self, chunk_ids, sources=()):
+        """
+        Forgets removed chunks and everything recorded for re-ingested or deleted sources.
+        Returns the other sources that had chunks dropped as near-duplicates of a removed chunk;
+        those files must be re-ingested so their chunks can be kept again.
+        """
+        chunk_ids = list(chunk_ids)
+        sources = list(sources)
+        orphaned = set()
+        for start in range(0, len(chunk_ids), 500):
+            batch = chunk_ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            orphaned.update(row[0] for row in self._conn.execute(
+                f"SELECT DISTINCT source FROM duplicates WHERE original_id IN ({placeholders})", batch))
+            for table in ("signatures", "buckets", "duplicates"):
+                self._conn.execute(f"DELETE FROM {table} WHERE chunk_id IN ({placeholders})", batch)
+            self._conn.execute(f"DELETE FROM duplicates WHERE original_id IN ({placeholders})", batch)
+        for source in sources:
+            self._conn.execute("DELETE FROM buckets WHERE chunk_id IN (SELECT chunk_id FROM signatures WHERE source = ?)", (source,))
+            self._conn.execute("DELETE FROM signatures WHERE source = ?", (source,))
+            self._conn.execute("DELETE FROM duplicates WHERE source = ?", (source,))
+        self._conn.commit()
+        return orphaned - set(sources)
+
+    def commit(self):
+        self._conn.commit()
+
+    def stats(self):
+        kept = self._conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+        dropped, dropped_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM duplicates").fetchone()
+        return {
+            "keptChunks": kept,
+            "droppedChunks": dropped,
+            "droppedBytes": dropped_bytes,
+            "threshold": self.threshold,
+            "bands": self.bands,
+            "rows": self.rows,
+        }
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+def main():
+    """
+    Prints index statistics, or the estimated similarity of two texts.
+    """
+    parser = argparse.ArgumentParser(description="Inspect the near-duplicate chunk index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    stats_parser = subparsers.add_parser("stats", help="Kept and dropped chunk counts.")
+    stats_parser.add_argument("--path", default=os.path.join("../data/vector_store", NEAR_DUP_INDEX_FILENAME))
+    compare_parser = subparsers.add_parser("compare", help="Estimated Jaccard similarity of two texts.")
+    compare_parser.add_argument("first")
+    compare_parser.add_argument("second")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        index = NearDuplicateIndex(args.path)
+        json.dump(index.stats(), sys.stdout)
+        index.close()
+    else:
+        hasher = MinHasher()
+        first, second = hasher.signature(args.first), hasher.signature(args.second)
+        similarity = float(np.mean(first == second)) if first is not None and second is not None else 0.0
+        json.dump({"similarity": round(similarity, 3), "threshold": NEAR_DUP_THRESHOLD}, sys.stdout)
+    print()
+
+if __name__ == "__main__":
+    main()
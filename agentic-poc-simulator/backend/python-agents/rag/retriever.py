@@ -0,0 +1,140 @@
+import re
+import sys
+import hashlib
+from functools import lru_cache
+
+QUERY_EMBEDDING_CACHE_SIZE = 256
+DEFAULT_TOP_K = 4
+DEFAULT_CONTEXT_TOKENS = 1500
+
+@lru_cache(maxsize=1)
+def get_encoder():
+    """
+    Returns the tiktoken encoding used for context budgets, or None if it cannot be loaded
+    (e.g. the BPE file is not cached and there is no network), in which case tokens are estimated.
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+def count_tokens(text):
+    encoder = get_encoder()
+    if encoder is None:
+        return (len(text) + 3) // 4
+    return len(encoder.encode(text))
+
+def truncate_to_tokens(text, max_tokens):
+    encoder = get_encoder()
+    if encoder is None:
+        return text[:max_tokens * 4]
+    return encoder.decode(encoder.encode(text)[:max_tokens])
+
+def make_query_embedder(embeddings, maxsize=QUERY_EMBEDDING_CACHE_SIZE):
+    """
+    Returns embed(query) memoized in an LRU cache, so repeated queries in a long-lived
+    process cost no embedding call.
+    """
+    @lru_cache(maxsize=maxsize)
+    def embed(query):
+        return tuple(embeddings.embed_query(query))
+    return embed
+
+def document_key(document):
+    chunk_id = document.metadata.get("chunk_id") if document.metadata else None
+    if chunk_id:
+        return chunk_id
+    normalized = re.sub(r"\s+", " ", document.page_content).strip().lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def dedupe_documents(documents):
+    """
+    Drops documents whose chunk id or whitespace-normalized text was already seen, keeping rank order.
+    """
+    seen = set()
+    unique = []
+    for document in documents:
+        key = document_key(document)
+        if key not in seen:
+            seen.add(key)
+            unique.append(document)
+    return unique
+
+def retrieve(vectorstore, embed_query, query, k=DEFAULT_TOP_K):
+    """
+    Runs a single vector search for query and returns up to k distinct documents.
+    Twice as many candidates are fetched so duplicates do not shrink the result.
+    """
+    candidates = vectorstore.similarity_search_by_vector(list(embed_query(query)), k=k * 2)
+    return dedupe_documents(candidates)[:k]
+
+def pack_context(documents, max_tokens=DEFAULT_CONTEXT_TOKENS, separator="\n\n"):
+    """
+    Concatenates documents in rank order until the token budget is used up.
+    The first document that does not fit is cut at the budget instead of being dropped.
+    """
+    parts = []
+    remaining = max_tokens
+    separator_tokens = count_tokens(separator)
+    for document in documents:
+        text = document.page_content.strip()
+        cost = count_tokens(text) + (separator_tokens if parts else 0)
+        if cost <= remaining:
+            parts.append(text)
+            remaining -= cost
+            continue
+        if remaining > separator_tokens:
+            parts.append(truncate_to_tokens(text, remaining - (separator_tokens if parts else 0)))
+        break
+    return separator.join(parts)
+
+def retrieve_lexical(lexical_index, chunk_store, query, k=DEFAULT_TOP_K):
+    """
+    BM25-only retrieval. Needs no embedding call, so it still works when the embedding quota is exhausted.
+    Returns no documents when lexical_index is None (nothing ingested yet).
+    """
+    from langchain.schema import Document
+    documents = []
+    if lexical_index is None:
+        return documents
+    for chunk_id, score in lexical_index.search(query, k):
+        record = chunk_store.get(chunk_id)
+        if record is not None:
+            documents.append(Document(page_content=record["text"], metadata={**record["metadata"], "chunk_id": chunk_id, "bm25": score}))
+    return documents
+
+def reciprocal_rank_fusion(rankings, weights=None, k=60):
+    """
+    Fuses ranked key lists into one ranking: each key scores sum(weight / (k + rank)).
+    Rank-based fusion needs no calibration between BM25 and vector similarity scales.
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, key in enumerate(ranking):
+            fused[key] = fused.get(key, 0.0) + weight / (k + rank + 1)
+    return sorted(fused, key=fused.get, reverse=True)
+
+def retrieve_hybrid(vectorstore, embed_query, lexical_index, chunk_store, query, k=DEFAULT_TOP_K, lexical_weight=1.0):
+    """
+    Runs vector and BM25 retrieval for the query and returns the top k documents of their fused ranking.
+    Uses whichever side is available: BM25 alone when the embedding call fails, vectors alone
+    when there is no lexical index yet.
+    """
+    if lexical_index is None:
+        return retrieve(vectorstore, embed_query, query, k=k)
+    try:
+        vector_documents = retrieve(vectorstore, embed_query, query, k=k * 2)
+    except Exception as e:
+        print(f"[retriever.py] Vector search failed ({type(e).__name__}: {e}); using BM25 results only", file=sys.stderr)
+        vector_documents = []
+    lexical_documents = dedupe_documents(retrieve_lexical(lexical_index, chunk_store, query, k=k * 2))
+    by_key = {}
+    for document in lexical_documents + vector_documents:
+        by_key.setdefault(document_key(document), document)
+    ranking = reciprocal_rank_fusion(
+        [[document_key(d) for d in vector_documents], [document_key(d) for d in lexical_documents]],
+        weights=[1.0, lexical_weight],
+    )
+    return [by_key[key] for key in ranking[:k]]
@@ -0,0 +1,344 @@
+import os
+import sys
+import json
+import mmap
+import time
+import argparse
+import threading
+import numpy as np
+
+# Make the shared python-agents modules importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag.index_builds import new_build, publish_build, build_key, build_version
+
+VECTOR_INDEX_PATH = "../data/vector_index"
+CHROMA_COLLECTION = "langchain"
+DTYPES = ("float32", "float16", "int8")
+SEARCH_MODES = ("exact", "ivf", "hnsw")
+# Rows scored per block in exact search, so float16/int8 matrices are never fully upcast in memory
+BLOCK_ROWS = 65536
+# Collections smaller than this are searched exactly; IVF only pays off on larger corpora
+IVF_MIN_ROWS = 10000
+HNSW_FILENAME = "hnsw.faiss"
+HNSW_HEADER_FILENAME = "hnsw.json"
+
+def normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def quantize(matrix, dtype):
+    """
+    Converts normalized float32 rows to the storage dtype. int8 uses a symmetric per-row scale.
+    Returns (stored matrix, per-row scales or None).
+    """
+    if dtype == "float32":
+        return matrix, None
+    if dtype == "float16":
+        return matrix.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        return np.round(matrix / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    raise ValueError(f"Unsupported dtype: {dtype}")
+
+def spherical_kmeans(matrix, n_clusters, iterations=15, seed=0):
+    """
+    Clusters normalized rows by cosine similarity and returns normalized centroids.
+    Trains on a random sample of about 64 rows per cluster so building stays fast on large corpora.
+    """
+    rng = np.random.default_rng(seed)
+    sample_size = min(64 * n_clusters, 50000)
+    sample = matrix
+    if len(matrix) > sample_size:
+        sample = matrix[rng.choice(len(matrix), sample_size, replace=False)]
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        empty = counts == 0
+        sums = np.zeros_like(centroids)
+        sums[~empty] = np.add.reduceat(sample[np.argsort(assignment, kind="stable")], starts[~empty], axis=0)
+        if empty.any():
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+def build_index(out_dir, ids, embeddings, documents, metadatas, dtype="float32", n_lists=None):
+    """
+    Writes a memory-mappable index to out_dir:
+      index.json       - dimensions, row count, storage dtype and IVF settings
+      vectors.npy      - normalized embeddings in the storage dtype (scales.npy for int8)
+      records.jsonl    - metadata sidecar with id, text and metadata per row (offsets in records.npy)
+      centroids.npy, list_rows.npy, list_offsets.npy - inverted lists for IVF search
+    Each build is written to a new directory and swapped in atomically (rag/index_builds.py),
+    so readers never mix files of two builds. A saved HNSW graph stays with the build it
+    belongs to.
+    """
+    build_dir, version = new_build(out_dir)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if len(embeddings):
+        matrix = normalize_rows(embeddings)
+    else:
+        # An empty collection still gets a valid, searchable index
+        matrix = np.zeros((0, embeddings.shape[1] if embeddings.ndim == 2 else 0), dtype=np.float32)
+    count, dim = matrix.shape
+    if count:
+        stored, scales = quantize(matrix, dtype)
+    else:
+        stored = matrix.astype(np.int8 if dtype == "int8" else dtype)
+        scales = np.zeros(0, dtype=np.float32) if dtype == "int8" else None
+    np.save(os.path.join(build_dir, "vectors.npy"), stored)
+    if scales is not None:
+        np.save(os.path.join(build_dir, "scales.npy"), scales)
+
+    offsets = np.zeros(count + 1, dtype=np.uint64)
+    with open(os.path.join(build_dir, "records.jsonl"), "wb") as f:
+        for row, (chunk_id, text, metadata) in enumerate(zip(ids, documents, metadatas)):
+            f.write((json.dumps({"id": chunk_id, "text": text, "metadata": metadata or {}}, ensure_ascii=False) + "\n").encode("utf-8"))
+            offsets[row + 1] = f.tell()
+    np.save(os.path.join(build_dir, "records.npy"), offsets)
+
+    if n_lists is None:
+        n_lists = int(np.sqrt(count)) if count >= IVF_MIN_ROWS else 0
+    if n_lists:
+        centroids = spherical_kmeans(matrix, n_lists)
+        assignment = np.concatenate([
+            np.argmax(matrix[start:start + BLOCK_ROWS] @ centroids.T, axis=1)
+            for start in range(0, count, BLOCK_ROWS)
+        ])
+        list_rows = np.argsort(assignment, kind="stable").astype(np.int64)
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))]).astype(np.int64)
+        np.save(os.path.join(build_dir, "centroids.npy"), centroids)
+        np.save(os.path.join(build_dir, "list_rows.npy"), list_rows)
+        np.save(os.path.join(build_dir, "list_offsets.npy"), list_offsets)
+
+    with open(os.path.join(build_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump({"count": int(count), "dim": int(dim), "dtype": dtype, "metric": "cosine", "lists": int(n_lists),
+                   "build": version}, f)
+    publish_build(out_dir, build_dir)
+
+def top_k(scores, rows, k):
+    """
+    Returns (scores, rows) of the k best candidates per query, best first.
+    """
+    if scores.shape[1] > k:
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, keep, axis=1)
+        rows = np.take_along_axis(rows, keep, axis=1)
+    order = np.argsort(-scores, axis=1)
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+class LocalVectorIndex:
+    """
+    Read-only vector store backed by memory-mapped numpy files written by build_index.
+    Opening only reads index.json and maps the arrays, so cold start does not depend on corpus size.
+    Implements similarity_search_by_vector and similarity_search, which is all rag.retriever needs.
+    """
+
+    def __init__(self, path=VECTOR_INDEX_PATH, embedding_function=None, search="exact", nprobe=8):
+        if search not in SEARCH_MODES:
+            raise ValueError(f"Unsupported search mode: {search}")
+        # Resolve the symlink once so every file comes from the same build
+        path = os.path.realpath(path)
+        with open(os.path.join(path, "index.json"), "r", encoding="utf-8") as f:
+            self.header = json.load(f)
+        self.path = path
+        self.embedding_function = embedding_function
+        self.search_mode = search
+        self.nprobe = nprobe
+        self.count = self.header["count"]
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="r") if self.header["dtype"] == "int8" else None
+        self.record_offsets = np.load(os.path.join(path, "records.npy"), mmap_mode="r")
+        self._records = None
+        self._hnsw = None
+        if self.search_mode == "ivf" and not self.header.get("lists"):
+            # Index too small to have inverted lists; exact search is just as fast
+            self.search_mode = "exact"
+        if self.search_mode == "ivf":
+            self.centroids = np.load(os.path.join(path, "centroids.npy"))
+            self.list_rows = np.load(os.path.join(path, "list_rows.npy"), mmap_mode="r")
+            self.list_offsets = np.load(os.path.join(path, "list_offsets.npy"))
+
+    def _rows_as_float(self, rows):
+        block = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.scales is not None:
+            block *= np.asarray(self.scales[rows])[:, None]
+        return block
+
+    def _search_exact(self, queries, k):
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, self.count, BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, self.count)
+            scores = queries @ self._rows_as_float(slice(start, end)).T
+            rows = np.broadcast_to(np.arange(start, end), scores.shape)
+            best_scores, best_rows = top_k(
+                np.concatenate([best_scores, scores], axis=1),
+                np.concatenate([best_rows, rows], axis=1),
+                k,
+            )
+        return best_scores, best_rows
+
+    def _search_ivf(self, queries, k):
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :self.nprobe]
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        all_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        for i, (query, lists) in enumerate(zip(queries, probes)):
+            rows = np.concatenate([self.list_rows[self.list_offsets[l]:self.list_offsets[l + 1]] for l in lists])
+            if len(rows) == 0:
+                continue
+            rows = np.sort(rows)
+            scores = (self._rows_as_float(rows) @ query)[None, :]
+            best_scores, best_rows = top_k(scores, rows[None, :], min(k, len(rows)))
+            all_scores[i, :best_scores.shape[1]] = best_scores[0]
+            all_rows[i, :best_rows.shape[1]] = best_rows[0]
+        return all_scores, all_rows
+
+    def _hnsw_key(self):
+        return {"count": self.count, "dim": self.header["dim"], "build": self.header.get("build")}
+
+    def _load_hnsw(self):
+        """
+        Loads the saved HNSW graph if it was built from these vectors, otherwise builds and saves
+        a new one. The graph's header records the index it belongs to, so a graph left behind by
+        an earlier build is never searched with this build's row ids.
+        """
+        import faiss
+        hnsw_path = os.path.join(self.path, HNSW_FILENAME)
+        header_path = os.path.join(self.path, HNSW_HEADER_FILENAME)
+        if os.path.exists(hnsw_path) and os.path.exists(header_path):
+            with open(header_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved == self._hnsw_key():
+                hnsw = faiss.read_index(hnsw_path)
+                if hnsw.ntotal == self.count:
+                    return hnsw
+        hnsw = faiss.IndexHNSWFlat(self.header["dim"], 32, faiss.METRIC_INNER_PRODUCT)
+        for start in range(0, self.count, BLOCK_ROWS):
+            hnsw.add(self._rows_as_float(slice(start, min(start + BLOCK_ROWS, self.count))))
+        faiss.write_index(hnsw, hnsw_path + ".tmp")
+        os.replace(hnsw_path + ".tmp", hnsw_path)
+        with open(header_path, "w", encoding="utf-8") as f:
+            json.dump(self._hnsw_key(), f)
+        return hnsw
+
+    def _search_hnsw(self, queries, k):
+        if self._hnsw is None:
+            self._hnsw = self._load_hnsw()
+        return self._hnsw.search(np.ascontiguousarray(queries, dtype=np.float32), k)
+
+    def search(self, queries, k=4):
+        """
+        Batched cosine search. Returns one list of (row, score) pairs per query, best first.
+        """
+        queries = normalize_rows(np.atleast_2d(queries))
+        k = min(k, self.count)
+        if k == 0:
+            return [[] for _ in queries]
+        if self.search_mode == "ivf":
+            scores, rows = self._search_ivf(queries, k)
+        elif self.search_mode == "hnsw":
+            scores, rows = self._search_hnsw(queries, k)
+        else:
+            scores, rows = self._search_exact(queries, k)
+        return [
+            [(int(row), float(score)) for row, score in zip(query_rows, query_scores) if row >= 0]
+            for query_rows, query_scores in zip(rows, scores)
+        ]
+
+    def record(self, row):
+        """
+        Reads the sidecar record (id, text, metadata) for a row.
+        """
+        if self._records is None:
+            with open(os.path.join(self.path, "records.jsonl"), "rb") as f:
+                self._records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        start, end = int(self.record_offsets[row]), int(self.record_offsets[row + 1])
+        return json.loads(self._records[start:end])
+
+    def _to_document(self, row, score):
+        from langchain.schema import Document
+        record = self.record(row)
+        return Document(page_content=record["text"], metadata={**record["metadata"], "chunk_id": record["id"], "score": score})
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [self._to_document(row, score) for row, score in self.search([embedding], k)[0]]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        if self.embedding_function is None:
+            raise ValueError("similarity_search needs an embedding_function; use similarity_search_by_vector instead")
+        return self.similarity_search_by_vector(self.embedding_function.embed_query(query), k)
+
+_open_indexes = {}
+_open_lock = threading.Lock()
+
+def get_local_index(path=VECTOR_INDEX_PATH, embedding_function=None, search="exact"):
+    """
+    Opens the local index once per process, and again after a new build has been published.
+    """
+    key = build_key(path, "index.json")
+    with _open_lock:
+        cached = _open_indexes.get((path, search))
+        if cached is None or cached[0] != key:
+            cached = (key, LocalVectorIndex(path, embedding_function=embedding_function, search=search))
+            _open_indexes[(path, search)] = cached
+        return cached[1]
+
+def index_version(path=VECTOR_INDEX_PATH):
+    """
+    Build stamp of the published local index, or None if none was built yet.
+    """
+    return build_version(path, "index.json", "build")
+
+def read_chroma_collection(persist_directory, collection_name=CHROMA_COLLECTION, page_size=5000):
+    """
+    Reads ids, embeddings, documents and metadatas from a persisted Chroma collection page by page.
+    """
+    import chromadb
+    collection = chromadb.PersistentClient(path=persist_directory).get_collection(collection_name)
+    ids, embeddings, documents, metadatas = [], [], [], []
+    total = collection.count()
+    for offset in range(0, total, page_size):
+        page = collection.get(limit=page_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+        ids.extend(page["ids"])
+        embeddings.extend(page["embeddings"])
+        documents.extend(page["documents"])
+        metadatas.extend(page["metadatas"])
+    return ids, np.asarray(embeddings, dtype=np.float32), documents, metadatas
+
+def convert_chroma(persist_directory, out_dir=VECTOR_INDEX_PATH, dtype="float32", n_lists=None):
+    """
+    One-shot conversion of the existing Chroma store into a local memory-mapped index.
+    """
+    ids, embeddings, documents, metadatas = read_chroma_collection(persist_directory)
+    build_index(out_dir, ids, embeddings, documents, metadatas, dtype=dtype, n_lists=n_lists)
+    return len(ids)
+
+def main():
+    """
+    Converts the Chroma store into a local index, or prints index statistics.
+    """
+    parser = argparse.ArgumentParser(description="Build or inspect the memory-mapped local vector index.")
+    parser.add_argument("--index", default=VECTOR_INDEX_PATH, help="Local index directory.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert = subparsers.add_parser("convert", help="Convert a persisted Chroma store into a local index.")
+    convert.add_argument("--chroma", default="../data/vector_store", help="Chroma persist directory.")
+    convert.add_argument("--dtype", choices=DTYPES, default="float32", help="Storage type for the embedding matrix.")
+    convert.add_argument("--lists", type=int, default=None, help="IVF lists (default sqrt(rows) for 10k+ rows, 0 disables).")
+    subparsers.add_parser("stats", help="Print the index header and open time.")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        count = convert_chroma(args.chroma, args.index, dtype=args.dtype, n_lists=args.lists)
+        print(f"Converted {count} vectors into {args.index}")
+    else:
+        start = time.perf_counter()
+        index = LocalVectorIndex(args.index)
+        print(json.dumps({**index.header, "openMs": round((time.perf_counter() - start) * 1000, 3)}))
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,36 @@
 import os
 import sys
+import json
+import hashlib
 import argparse
+import threading
 import requests
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from html.parser import HTMLParser
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib.parse import urljoin, urlparse, urldefrag
+from urllib.robotparser import RobotFileParser
 
 # Define the path to save raw scraped data
 SAVE_DIR = "../data/raw"
+# Validators and content hashes from earlier crawls, kept outside the raw corpus
+CRAWL_STATE_PATH = "../data/cache/crawl_state.json"
+CRAWLER_USER_AGENT = "agentic-poc-simulator-crawler"
 
 def is_valid_url(url):
     """Checks if the url is valid."""
     parsed = urlparse(url)
     return bool(parsed.netloc) and bool(parsed.scheme)
 
-def save_content(url, content):
+def save_content(url, content, save_dir=SAVE_DIR):
     """Saves the content to a file in the specified directory."""
-    if not os.path.exists(SAVE_DIR):
-        os.makedirs(SAVE_DIR)
+    if not os.path.exists(save_dir):
+        os.makedirs(save_dir, exist_ok=True)
 
     # Create a filename from the URL
     filename = url.replace("https://", "").replace("http://", "").replace("/", "_") + ".txt"
-    filepath = os.path.join(SAVE_DIR, filename)
+    filepath = os.path.join(save_dir, filename)
 
     with open(filepath, "w", encoding="utf-8") as f:
         f.write(content)
@@ -46,6 +56,229 @@ def scrape_url(url):
     except Exception as e:
         print(f"An error occurred while processing {url}: {e}")
 
+class TextExtractor(HTMLParser):
+    """
+    Single-pass extractor for visible text and links. Much cheaper than building a
+    BeautifulSoup tree when all the crawler needs is text and hrefs.
+    """
+
+    SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+    BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "pre", "blockquote"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.links = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self.links.append(href)
+        if tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.parts.append(data)
+
+    def text(self):
+        lines = (line.strip() for line in "".join(self.parts).splitlines())
+        return "\n".join(line for line in lines if line)
+
+def extract_text_and_links(html, base_url):
+    """Returns the visible text of a page and its absolute http(s) links without fragments."""
+    extractor = TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    links = []
+    for href in extractor.links:
+        link = urldefrag(urljoin(base_url, href))[0]
+        if urlparse(link).scheme in ("http", "https"):
+            links.append(link)
+    return extractor.text(), links
+
+class Crawler:
+    """
+    Concurrent crawler that seeds the raw corpus.
+    Connections are pooled per host, requests are capped globally and per host, robots.txt
+    is honoured, unchanged pages are skipped with conditional GETs, and pages whose text was
+    already saved under another URL are not written again.
+    """
+
+    def __init__(self, concurrency=8, per_host=2, max_depth=0, same_site=True,
+                 save_dir=SAVE_DIR, state_path=CRAWL_STATE_PATH, timeout=10, respect_robots=True):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.respect_robots = respect_robots
+        self.max_depth = max_depth
+        self.same_site = same_site
+        self.save_dir = save_dir
+        self.state_path = state_path
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=max(concurrency, per_host))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = CRAWLER_USER_AGENT
+        self.host_slots = {}
+        # robots.txt parser per origin, as a Future so concurrent first requests fetch it once
+        self.robots = {}
+        self.lock = threading.Lock()
+        self.state = self.load_state()
+        self.saved_hashes = {entry["hash"] for entry in self.state.values() if entry.get("hash")}
+        self.stats = {"fetched": 0, "notModified": 0, "duplicates": 0, "saved": 0, "errors": 0, "disallowed": 0}
+
+    def load_state(self):
+        if self.state_path and os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def save_state(self):
+        if not self.state_path:
+            return
+        directory = os.path.dirname(self.state_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def host_slot(self, url):
+        """
+        Semaphore capping requests in flight to the url's host, created once per host.
+        """
+        host = urlparse(url).netloc
+        with self.lock:
+            slot = self.host_slots.get(host)
+            if slot is None:
+                slot = self.host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    def robots_for(self, url):
+        """
+        Returns the robots.txt parser for the url's origin, fetching it on first use. A missing
+        robots.txt allows everything, 401/403 disallow everything, and a robots.txt that cannot
+        be fetched is treated as missing.
+        """
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        with self.lock:
+            pending = self.robots.get(origin)
+            owner = pending is None
+            if owner:
+                pending = self.robots[origin] = Future()
+        if not owner:
+            return pending.result()
+        parser = RobotFileParser(origin + "/robots.txt")
+        try:
+            with self.host_slot(url):
+                response = self.session.get(origin + "/robots.txt", timeout=self.timeout)
+            if response.status_code in (401, 403):
+                parser.disallow_all = True
+            elif response.status_code >= 400:
+                parser.allow_all = True
+            else:
+                parser.parse(response.text.splitlines())
+        except requests.exceptions.RequestException:
+            parser.allow_all = True
+        finally:
+            # Always resolve, so threads waiting on this origin never block
+            pending.set_result(parser)
+        return parser
+
+    def allowed(self, url):
+        return not self.respect_robots or self.robots_for(url).can_fetch(CRAWLER_USER_AGENT, url)
+
+    def fetch(self, url):
+        """
+        Fetches one page and returns the links to follow from it.
+        """
+        if not self.allowed(url):
+            self.count("disallowed")
+            return []
+        with self.lock:
+            previous = dict(self.state.get(url, {}))
+        headers = {}
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("lastModified"):
+            headers["If-Modified-Since"] = previous["lastModified"]
+
+        try:
+            with self.host_slot(url):
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304:
+                self.count("notModified")
+                return previous.get("links", [])
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching {url}: {e}")
+            self.count("errors")
+            return []
+
+        self.count("fetched")
+        if "html" not in response.headers.get("Content-Type", "text/html"):
+            return []
+        text, links = extract_text_and_links(response.text, response.url)
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+        with self.lock:
+            is_duplicate = content_hash in self.saved_hashes
+            self.saved_hashes.add(content_hash)
+            self.state[url] = {
+                "etag": response.headers.get("ETag"),
+                "lastModified": response.headers.get("Last-Modified"),
+                "hash": content_hash,
+                "links": links if self.max_depth else [],
+            }
+        if is_duplicate:
+            self.count("duplicates")
+        elif text:
+            save_content(url, text, self.save_dir)
+            self.count("saved")
+        return links
+
+    def crawl(self, seeds):
+        """
+        Crawls the seed URLs breadth-first up to max_depth and returns the crawl statistics.
+        """
+        seeds = [urldefrag(url)[0] for url in seeds if is_valid_url(url)]
+        sites = {urlparse(url).netloc for url in seeds}
+        visited = set(seeds)
+        frontier = seeds
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for depth in range(self.max_depth + 1):
+                next_frontier = []
+                for links in executor.map(self.fetch, frontier):
+                    if depth == self.max_depth:
+                        continue
+                    for link in links:
+                        if link in visited or (self.same_site and urlparse(link).netloc not in sites):
+                            continue
+                        visited.add(link)
+                        next_frontier.append(link)
+                frontier = next_frontier
+                if not frontier:
+                    break
+        self.save_state()
+        return self.stats
+
 def main():
     """
     Main function to run the web scraper.
@@ -53,9 +286,22 @@ def main():
     """
     parser = argparse.ArgumentParser(description="Scrape text content from web pages.")
     parser.add_argument("urls", nargs='+', help="The URL(s) to scrape.")
+    parser.add_argument("--crawl", action="store_true", help="Fetch concurrently with conditional GETs and content dedup.")
+    parser.add_argument("--depth", type=int, default=0, help="Follow links up to this depth in crawl mode.")
+    parser.add_argument("--all-sites", action="store_true", help="Also follow links to other sites in crawl mode.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum requests in flight in crawl mode.")
+    parser.add_argument("--per-host", type=int, default=2, help="Maximum requests in flight per host in crawl mode.")
+    parser.add_argument("--ignore-robots", action="store_true", help="Do not check robots.txt in crawl mode.")
     
     args = parser.parse_args()
     
+    if args.crawl:
+        crawler = Crawler(concurrency=args.concurrency, per_host=args.per_host,
+                          max_depth=args.depth, same_site=not args.all_sites,
+                          respect_robots=not args.ignore_robots)
+        print(json.dumps(crawler.crawl(args.urls)))
+        return
+
     for url in args.urls:
         scrape_url(url)
 
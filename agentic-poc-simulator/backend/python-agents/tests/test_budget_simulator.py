@@ -0,0 +1,49 @@
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.budget_simulator import parse_amount, parse_parameters, stress_test
+
+SCENARIOS = 2000
+SEED = 7
+
+def test_amounts_accept_thousands_groups_and_one_decimal():
+    assert parse_amount("$1,200,000") == 1_200_000
+    assert parse_amount("$1,200.50") == 1200.5
+    assert parse_amount("1.5M") == 1_500_000
+    assert parse_amount("$80k over 3 months") == 80_000
+
+def test_version_strings_are_not_amounts():
+    assert parse_amount("React 18.2.0") is None
+
+def test_description_numbers_are_not_a_budget():
+    params = parse_parameters("Not specified", "3 months", "5000 users on React 18 and Node 20")
+    assert "budget" in params["assumed"]
+    assert params["budget"] != 5000
+
+def test_money_in_the_description_is_an_assumed_budget():
+    params = parse_parameters("", "", "We raised $80k for the MVP")
+    assert params["budget"] == 80_000
+    assert "budget" in params["assumed"]
+
+def test_stated_budget_is_not_assumed():
+    params = parse_parameters("$50,000", "3 months", "team of 4 developers")
+    assert params["budget"] == 50_000
+    assert params["assumed"] == []
+
+def test_dotted_versions_do_not_crash_the_simulation():
+    result = stress_test(budget="TBD", description="Built on React 18.2.0 and Node 20.11.1", scenarios=SCENARIOS, seed=SEED)
+    assert "budget" in result["parameters"]["assumed"]
+    assert result["confidence"] == "low"
+
+def test_zero_budget_gives_valid_json():
+    result = stress_test(budget="$0", timeline="3 months", scenarios=SCENARIOS, seed=SEED)
+    assert result["parameters"]["budget"] == 0
+    json.dumps(result, allow_nan=False)
+
+def test_same_seed_gives_same_result():
+    first = stress_test(budget="$80k", timeline="3 months", description="team of 4", scenarios=SCENARIOS, seed=SEED)
+    second = stress_test(budget="$80k", timeline="3 months", description="team of 4", scenarios=SCENARIOS, seed=SEED)
+    assert first == second
+    assert first["confidence"] == "normal"
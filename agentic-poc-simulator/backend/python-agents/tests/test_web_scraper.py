@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag.web_scraper import Crawler
+
+ETAG = '"v1"'
+ROBOTS = "User-agent: *\nDisallow: /private\n"
+SLOW_PAGES = 8
+
+class Site:
+    """
+    State shared by the fixture server's handler threads: requested paths and the peak number
+    of page requests in flight at once.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+def make_handler(site):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def send_page(self, body, etag=None):
+            payload = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            if etag:
+                self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            with site.lock:
+                site.requests.append(self.path)
+            if self.path == "/robots.txt":
+                payload = ROBOTS.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            elif self.path == "/":
+                links = "".join(f'<a href="/slow/{i}">slow {i}</a>' for i in range(SLOW_PAGES))
+                self.send_page(f'<html><body><p>Home</p><a href="/private/secret">secret</a>{links}</body></html>')
+            elif self.path == "/cached":
+                if self.headers.get("If-None-Match") == ETAG:
+                    self.send_response(304)
+                    self.end_headers()
+                else:
+                    self.send_page("<html><body><p>Cached page</p></body></html>", etag=ETAG)
+            elif self.path.startswith("/slow/"):
+                with site.lock:
+                    site.in_flight += 1
+                    site.peak_in_flight = max(site.peak_in_flight, site.in_flight)
+                time.sleep(0.1)
+                with site.lock:
+                    site.in_flight -= 1
+                self.send_page(f"<html><body><p>Slow page {self.path}</p></body></html>")
+            else:
+                self.send_page(f"<html><body><p>Page {self.path}</p></body></html>")
+
+    return Handler
+
+@pytest.fixture
+def site():
+    state = Site()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+def make_crawler(tmp_path, **kwargs):
+    return Crawler(save_dir=str(tmp_path / "raw"), state_path=str(tmp_path / "crawl_state.json"), timeout=5, **kwargs)
+
+def test_conditional_get_skips_unchanged_pages(site, tmp_path):
+    first = make_crawler(tmp_path).crawl([site.url + "/cached"])
+    assert first["fetched"] == 1 and first["saved"] == 1
+
+    second = make_crawler(tmp_path).crawl([site.url + "/cached"])
+    assert second["notModified"] == 1
+    assert second["fetched"] == 0 and second["saved"] == 0
+
+def test_robots_disallowed_pages_are_not_fetched(site, tmp_path):
+    stats = make_crawler(tmp_path, max_depth=1).crawl([site.url + "/"])
+    assert stats["disallowed"] == 1
+    assert "/private/secret" not in site.requests
+    # robots.txt is fetched once per origin even though pages are crawled concurrently
+    assert site.requests.count("/robots.txt") == 1
+
+def test_robots_can_be_ignored(site, tmp_path):
+    make_crawler(tmp_path, max_depth=1, respect_robots=False).crawl([site.url + "/"])
+    assert "/private/secret" in site.requests
+    assert "/robots.txt" not in site.requests
+
+def test_per_host_limit_caps_requests_in_flight(site, tmp_path):
+    stats = make_crawler(tmp_path, concurrency=8, per_host=2).crawl(
+        [f"{site.url}/slow/{i}" for i in range(SLOW_PAGES)]
+    )
+    assert stats["fetched"] == SLOW_PAGES
+    assert site.peak_in_flight == 2
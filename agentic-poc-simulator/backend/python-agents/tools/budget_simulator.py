@@ -0,0 +1,259 @@
+import os
+import re
+import json
+import time
+import zlib
+import argparse
+import numpy as np
+
+DEFAULT_SCENARIOS = 100_000
+DEFAULT_TEAM_SIZE = 3
+DEFAULT_TIMELINE_WEEKS = 12.0
+# Loaded cost of one developer-week, used to plan development when the team size is known
+DEFAULT_WEEKLY_RATE = float(os.getenv("BUDGET_WEEKLY_RATE", "2500"))
+
+# Cost drivers as (name, share of the planned budget, time-dependent, (low, mode, high) cost multiplier).
+# Time-dependent drivers also scale with the simulated schedule slip, which carries most of their risk.
+COST_DRIVERS = (
+    ("development", 0.55, True, (0.90, 1.00, 1.10)),
+    ("qaAndTesting", 0.12, True, (0.85, 1.00, 1.15)),
+    ("infrastructure", 0.08, True, (0.80, 1.00, 1.20)),
+    ("thirdPartyServices", 0.08, False, (0.80, 1.00, 2.00)),
+    ("projectManagement", 0.07, True, (0.95, 1.00, 1.05)),
+    ("integrationRework", 0.03, False, (0.50, 1.00, 4.00)),
+)
+# Schedule multiplier: teams rarely finish early and occasionally slip badly
+SCHEDULE_SLIP = (0.85, 1.00, 1.40)
+# Scope creep: with this probability, development grows by a uniform fraction in the range
+SCOPE_CREEP_PROBABILITY = 0.30
+SCOPE_CREEP_RANGE = (0.05, 0.25)
+# Extra slip per developer beyond five, for coordination overhead
+TEAM_OVERHEAD_PER_MEMBER = 0.02
+
+PERCENTILES = (10, 50, 90, 95)
+
+# A number with comma thousands groups or plain digits, and at most one decimal part. Numbers
+# inside dotted strings such as version "18.2.0" are not amounts.
+AMOUNT_PATTERN = re.compile(
+    r"([$€£])?\s*(?<![\d.,])(\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)(?![\d.,]\d)\s*(k|m|mm|thousand|million)?\b",
+    re.IGNORECASE,
+)
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(day|week|wk|month|mo|quarter|year|yr)s?\b", re.IGNORECASE)
+TEAM_PATTERN = re.compile(
+    r"(?:team of\s*(\d+))|(\d+)\s*(?:-|\s)?(?:person|people|developers?|devs?|engineers?|members?|ftes?)\b",
+    re.IGNORECASE,
+)
+UNIT_WEEKS = {"day": 1 / 5, "week": 1, "wk": 1, "month": 52 / 12, "mo": 52 / 12, "quarter": 13, "year": 52, "yr": 52}
+AMOUNT_SCALE = {"k": 1e3, "thousand": 1e3, "m": 1e6, "mm": 1e6, "million": 1e6}
+
+def parse_amount(text, require_money=False):
+    """
+    Returns the largest money amount in text (e.g. "$50,000", "50k", "1.2M"), or None.
+    Durations and team sizes are skipped so "3 months" is not read as a budget. With
+    require_money, only amounts with a currency symbol or a k/M unit count, so free text such
+    as "5000 users" is not read as a budget either.
+    """
+    masked = TEAM_PATTERN.sub(" ", DURATION_PATTERN.sub(" ", text or ""))
+    amounts = []
+    for currency, number, unit in AMOUNT_PATTERN.findall(masked):
+        if require_money and not (currency or unit):
+            continue
+        try:
+            value = float(number.replace(",", ""))
+        except ValueError:
+            continue
+        amounts.append(value * AMOUNT_SCALE.get(unit.lower(), 1))
+    return max(amounts) if amounts else None
+
+def parse_duration_weeks(text):
+    """
+    Returns the total duration in text in weeks ("3 months", "6 weeks and 2 days"), or None.
+    """
+    matches = DURATION_PATTERN.findall(text or "")
+    if not matches:
+        return None
+    return sum(float(value) * UNIT_WEEKS[unit.lower()] for value, unit in matches)
+
+def parse_team_size(text):
+    match = TEAM_PATTERN.search(text or "")
+    if not match:
+        return None
+    return int(match.group(1) or match.group(2))
+
+def parse_parameters(budget="", timeline="", description=""):
+    """
+    Extracts simulation parameters from free-text budget, timeline and description fields.
+    Missing values fall back to defaults and are listed under "assumed".
+    """
+    combined = " ".join([budget or "", timeline or "", description or ""])
+    assumed = []
+    weeks = parse_duration_weeks(timeline) or parse_duration_weeks(combined)
+    if weeks is None:
+        weeks = DEFAULT_TIMELINE_WEEKS
+        assumed.append("timelineWeeks")
+    team_size = parse_team_size(combined)
+    if team_size is None:
+        team_size = DEFAULT_TEAM_SIZE
+        assumed.append("teamSize")
+    # A stated budget of 0 is a budget, not a missing one
+    amount = parse_amount(budget)
+    if amount is None:
+        # A money amount mentioned elsewhere is a guess at the budget, so it counts as assumed
+        amount = parse_amount(combined, require_money=True)
+        if amount is not None:
+            assumed.append("budget")
+    if amount is None:
+        # Without a budget, plan with the default rate so the simulation still reports spread
+        amount = team_size * weeks * DEFAULT_WEEKLY_RATE / COST_DRIVERS[0][1]
+        assumed.append("budget")
+    return {"budget": amount, "timelineWeeks": weeks, "teamSize": team_size, "assumed": assumed}
+
+def confidence_note(params):
+    """
+    Why the overrun estimate says little about this input, or None. Without a stated team size
+    (or budget) the plan is derived from the budget itself, so the overrun probability only
+    reflects the model's generic cost spread and is the same for any amount.
+    """
+    missing = [name for name in ("teamSize", "budget") if name in params.get("assumed", [])]
+    if not missing:
+        return None
+    return (f"No explicit {' or '.join(missing)}; the budget is planned against itself, so the overrun "
+            f"probability reflects generic cost spread, not whether the budget fits the work.")
+
+def _seed_for(params):
+    key = f"{params['budget']:.2f}|{params['timelineWeeks']:.4f}|{params['teamSize']}"
+    return zlib.crc32(key.encode("utf-8"))
+
+def planned_costs(params):
+    """
+    Splits the budget across COST_DRIVERS. When the team size was given, development is
+    planned from team size, timeline and DEFAULT_WEEKLY_RATE instead, so an understaffed
+    budget shows up as an overrun.
+    """
+    budget = float(params["budget"])
+    plan = [budget * share for _, share, _, _ in COST_DRIVERS]
+    if "teamSize" not in params.get("assumed", []):
+        plan[0] = params["teamSize"] * params["timelineWeeks"] * DEFAULT_WEEKLY_RATE
+    return plan
+
+def simulate(params, scenarios=DEFAULT_SCENARIOS, seed=None):
+    """
+    Runs a vectorized Monte Carlo over cost and schedule for the parsed parameters.
+    Each scenario draws a triangular cost multiplier per planned driver cost, a schedule slip
+    applied to time-dependent drivers, and scope creep on development.
+    With no seed, one is derived from the parameters so identical inputs give identical results.
+    """
+    rng = np.random.default_rng(_seed_for(params) if seed is None else seed)
+    budget = float(params["budget"])
+    planned_weeks = float(params["timelineWeeks"])
+    team_overhead = TEAM_OVERHEAD_PER_MEMBER * max(0, params["teamSize"] - 5)
+
+    slip = rng.triangular(*SCHEDULE_SLIP, size=scenarios) + team_overhead
+    creep = np.where(
+        rng.random(scenarios) < SCOPE_CREEP_PROBABILITY,
+        rng.uniform(*SCOPE_CREEP_RANGE, size=scenarios),
+        0.0,
+    )
+    slip += creep * COST_DRIVERS[0][1]
+
+    plan = planned_costs(params)
+    costs = np.empty((len(COST_DRIVERS), scenarios))
+    for row, (name, share, time_dependent, (low, mode, high)) in enumerate(COST_DRIVERS):
+        multiplier = rng.triangular(low, mode, high, size=scenarios)
+        if time_dependent:
+            multiplier *= slip
+        if row == 0:
+            multiplier *= 1.0 + creep
+        costs[row] = plan[row] * multiplier
+    # Reserve not assigned to any driver is held as contingency and spent as planned
+    reserve = budget * (1.0 - sum(driver[1] for driver in COST_DRIVERS))
+    total = costs.sum(axis=0) + reserve
+    weeks = planned_weeks * slip
+
+    cost_percentiles = np.percentile(total, PERCENTILES)
+    week_percentiles = np.percentile(weeks, PERCENTILES)
+    # Share of total-cost variance each driver explains: cov(driver, total) / var(total), sums to 1
+    # Constant costs (e.g. a zero budget with no planned work) have no variance to explain
+    variance = total.var()
+    centered = total - total.mean()
+    if variance > 0:
+        contributions = (costs - costs.mean(axis=1, keepdims=True)) @ centered / scenarios / variance
+    else:
+        contributions = np.zeros(len(COST_DRIVERS))
+    drivers = sorted(
+        (
+            {
+                "driver": name,
+                "plannedCost": round(plan[row], 2),
+                "meanCost": round(float(costs[row].mean()), 2),
+                "p90Cost": round(float(np.percentile(costs[row], 90)), 2),
+                "varianceShare": round(float(contributions[row]), 4),
+            }
+            for row, (name, _, _, _) in enumerate(COST_DRIVERS)
+        ),
+        key=lambda driver: driver["varianceShare"],
+        reverse=True,
+    )
+    overruns = total > budget
+    note = confidence_note(params)
+    return {
+        "parameters": {
+            "budget": round(budget, 2),
+            "timelineWeeks": round(planned_weeks, 2),
+            "teamSize": params["teamSize"],
+            "assumed": params.get("assumed", []),
+        },
+        "scenarios": scenarios,
+        "costPercentiles": {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, cost_percentiles)},
+        "timelineWeeksPercentiles": {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, week_percentiles)},
+        "overrunProbability": round(float(overruns.mean()), 4),
+        "scheduleOverrunProbability": round(float((weeks > planned_weeks).mean()), 4),
+        "expectedOverrunWhenOver": round(float((total[overruns] - budget).mean()) if overruns.any() else 0.0, 2),
+        "topCostDrivers": drivers[:3],
+        "confidence": "low" if note else "normal",
+        "confidenceNote": note,
+    }
+
+def stress_test(text="", budget="", timeline="", description="", scenarios=DEFAULT_SCENARIOS, seed=None):
+    """
+    Parses the inputs and simulates them. Free text (e.g. a tool query) is searched for
+    any field that is not given explicitly.
+    """
+    params = parse_parameters(budget or text, timeline or text, " ".join([description, text]))
+    return simulate(params, scenarios=scenarios, seed=seed)
+
+def benchmark(scenarios=DEFAULT_SCENARIOS, repeat=5, seed=0):
+    params = parse_parameters("$120,000", "4 months", "team of 4 developers")
+    simulate(params, scenarios=1000, seed=seed)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        simulate(params, scenarios=scenarios, seed=seed)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {"scenarios": scenarios, "repeat": repeat, "bestSeconds": round(best, 4),
+            "scenariosPerSecond": round(scenarios / best)}
+
+def main():
+    """
+    Runs a stress test for free-text input, or benchmarks scenarios per second.
+    """
+    parser = argparse.ArgumentParser(description="Monte Carlo budget and timeline stress test.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="Simulate a budget described in free text.")
+    run_parser.add_argument("text", help='e.g. "$80k over 3 months with a team of 4 developers"')
+    run_parser.add_argument("--scenarios", type=int, default=DEFAULT_SCENARIOS)
+    run_parser.add_argument("--seed", type=int, default=None)
+    bench_parser = subparsers.add_parser("bench", help="Measure simulated scenarios per second.")
+    bench_parser.add_argument("--scenarios", type=int, default=DEFAULT_SCENARIOS)
+    bench_parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        result = stress_test(args.text, scenarios=args.scenarios, seed=args.seed)
+    else:
+        result = benchmark(args.scenarios, args.repeat)
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
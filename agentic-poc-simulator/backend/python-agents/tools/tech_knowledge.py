@@ -0,0 +1,227 @@
+import os
+import re
+import json
+import hashlib
+import time
+import argparse
+from functools import lru_cache
+
+KNOWLEDGE_BASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tech_knowledge.json")
+DEFAULT_SCALABILITY = 7
+DEPRECATION_SEVERITY = 0.5
+# Each component the knowledge base does not know adds a little uncertainty to the risk score
+UNRECOGNIZED_SEVERITY = 0.05
+
+# Keeps tech names such as node.js, c++, c#, asp.net and react-native as single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:[./\-][a-z0-9+#]+)*")
+# Separators between items of a free-text stack ("React, Node.js and MongoDB / Redis")
+ITEM_SEPARATOR = re.compile(r"\s*(?:[,;|\n]|\s[+/&]\s|\band\b|\bwith\b|\bplus\b)\s*", re.IGNORECASE)
+TRIE_END = "$"
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall((text or "").lower())
+
+def flatten_text(values):
+    for value in values:
+        if isinstance(value, (list, tuple)):
+            yield from flatten_text(value)
+        elif value:
+            yield str(value)
+
+def risk_label(score):
+    return "Low" if score < 4 else "Medium" if score < 7 else "High"
+
+class KnowledgeBase:
+    """
+    Compatibility and risk knowledge compiled for lookups: a token trie over component aliases,
+    a pair table keyed by sorted component names, and per-component deprecations and rate limits.
+    """
+
+    def __init__(self, path=KNOWLEDGE_BASE_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.components = data["components"]
+        self.rate_limits = data.get("rateLimits", {})
+        self.trie = {}
+        for name, component in self.components.items():
+            for alias in component["aliases"] + [name]:
+                node = self.trie
+                for token in tokenize(alias):
+                    node = node.setdefault(token, {})
+                node[TRIE_END] = name
+        self.pairs = {}
+        for pair in data.get("pairs", []):
+            self.pairs[tuple(sorted(pair["components"]))] = pair
+
+    def match(self, text):
+        """
+        Returns [(component, matched text)] for every alias found in text, longest match first
+        at each position, in order of appearance and without repeats.
+        """
+        tokens = tokenize(text)
+        found = []
+        seen = set()
+        position = 0
+        while position < len(tokens):
+            node = self.trie
+            best = None
+            end = position
+            while end < len(tokens) and tokens[end] in node:
+                node = node[tokens[end]]
+                end += 1
+                if TRIE_END in node:
+                    best = (node[TRIE_END], end)
+            if best is None:
+                position += 1
+                continue
+            name, end = best
+            if name not in seen:
+                seen.add(name)
+                found.append((name, " ".join(tokens[position:end])))
+            position = end
+        return found
+
+    def resolve(self, tech_stack):
+        """
+        Maps a free-text stack (or a list of them) to canonical components. Items with no
+        known alias are returned as unrecognized.
+        """
+        if isinstance(tech_stack, (list, tuple)):
+            tech_stack = ", ".join(flatten_text(tech_stack))
+        components = []
+        seen = set()
+        unrecognized = []
+        for item in ITEM_SEPARATOR.split(tech_stack or ""):
+            item = item.strip(" .")
+            if not item:
+                continue
+            matches = self.match(item)
+            if not matches:
+                unrecognized.append(item)
+            for name, matched in matches:
+                if name not in seen:
+                    seen.add(name)
+                    components.append((name, matched))
+        return components, unrecognized
+
+    def analyze(self, tech_stack):
+        """
+        Returns structured, scored findings for a free-text tech stack: recognized components,
+        deprecations, pairwise integration risks, rate limits, and 1-10 scalability and risk scores.
+        """
+        components, unrecognized = self.resolve(tech_stack)
+        names = [name for name, _ in components]
+        severities = [UNRECOGNIZED_SEVERITY] * len(unrecognized)
+
+        deprecated = []
+        for name in names:
+            deprecation = self.components[name].get("deprecated")
+            if deprecation:
+                replacement = deprecation.get("replacement")
+                deprecated.append(f"{name}: {deprecation['note']}" + (f" Consider {replacement}." if replacement else ""))
+                severities.append(DEPRECATION_SEVERITY)
+
+        risks = []
+        for i, first in enumerate(names):
+            for second in names[i + 1:]:
+                pair = self.pairs.get((first, second) if first < second else (second, first))
+                if pair:
+                    risks.append({
+                        "components": pair["components"],
+                        "severity": pair["severity"],
+                        "issue": pair["issue"],
+                        "mitigation": pair["mitigation"],
+                    })
+                    severities.append(pair["severity"])
+        risks.sort(key=lambda risk: risk["severity"], reverse=True)
+
+        limits = []
+        for name in names:
+            limit = self.rate_limits.get(name)
+            if limit:
+                limits.append({"component": name, "limit": limit["limit"], "severity": limit["severity"]})
+                severities.append(limit["severity"])
+
+        # Scalability is held back by the weakest component, so blend the minimum with the mean
+        ratings = [self.components[name]["scalability"] for name in names]
+        scalability = round((min(ratings) + sum(ratings) / len(ratings)) / 2) if ratings else DEFAULT_SCALABILITY
+        # Independent findings compound: risk = 1 - prod(1 - severity), scaled to 1-10
+        remaining = 1.0
+        for severity in severities:
+            remaining *= 1.0 - severity
+        risk_score = 1 + round(9 * (1.0 - remaining))
+
+        return {
+            "components": [
+                {"name": name, "category": self.components[name]["category"], "matched": matched}
+                for name, matched in components
+            ],
+            "unrecognized": unrecognized,
+            "deprecatedWarnings": deprecated,
+            "integrationRisks": risks,
+            "rateLimits": limits,
+            "scalabilityScore": scalability,
+            "riskScore": risk_score,
+            "riskSeverity": risk_label(risk_score),
+        }
+
+@lru_cache(maxsize=None)
+def get_knowledge_base(path=KNOWLEDGE_BASE_PATH):
+    """
+    Loads and compiles the knowledge base once per process.
+    """
+    return KnowledgeBase(path)
+
+def knowledge_base_version(path=KNOWLEDGE_BASE_PATH):
+    """
+    Content hash of the knowledge base file, so results computed from an older version can be told apart.
+    """
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+def analyze_stack(tech_stack):
+    return get_knowledge_base().analyze(tech_stack)
+
+def summarize_findings(findings):
+    """
+    One-line digest of the findings, short enough to include in an agent prompt.
+    """
+    parts = [
+        f"scalability {findings['scalabilityScore']}/10, risk {findings['riskScore']}/10",
+        f"components: {', '.join(c['name'] for c in findings['components']) or 'none recognized'}",
+    ]
+    if findings["deprecatedWarnings"]:
+        parts.append("deprecated: " + "; ".join(findings["deprecatedWarnings"]))
+    for risk in findings["integrationRisks"]:
+        parts.append(f"{'+'.join(risk['components'])} risk: {risk['issue']}")
+    for limit in findings["rateLimits"]:
+        parts.append(f"{limit['component']} limit: {limit['limit']}")
+    return " | ".join(parts)
+
+def main():
+    """
+    Analyzes a free-text tech stack, or benchmarks analyses per second.
+    """
+    parser = argparse.ArgumentParser(description="Query the local tech-stack knowledge base.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    analyze_parser = subparsers.add_parser("analyze", help="Print findings for a tech stack.")
+    analyze_parser.add_argument("text", help='e.g. "React, Node.js, MongoDB, Stripe on AWS Lambda"')
+    bench_parser = subparsers.add_parser("bench", help="Measure the time per analysis.")
+    bench_parser.add_argument("text", nargs="?", default="React, Node.js + Express, MongoDB, Redis, Stripe, Twilio on AWS Lambda")
+    bench_parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    if args.command == "analyze":
+        print(json.dumps(analyze_stack(args.text), indent=2))
+        return
+    start = time.perf_counter()
+    get_knowledge_base()
+    load_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        analyze_stack(args.text)
+    per_call_us = (time.perf_counter() - start) / args.iterations * 1e6
+    print(json.dumps({"loadMs": round(load_ms, 3), "iterations": args.iterations, "microsecondsPerAnalysis": round(per_call_us, 2)}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from functools import lru_cache
+
+AGENT_RESULTS_PATH = os.getenv("AGENT_RESULTS_PATH", "../data/cache/agent_results.sqlite3")
+
+# Shared code every agent's prompt is built by, besides the agent module itself
+SHARED_CODE_FILES = (os.path.join(os.path.dirname(os.path.abspath(__file__)), "structured_output.py"),)
+
+@lru_cache(maxsize=None)
+def _file_digest(path, mtime_ns):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+def file_version(path):
+    """
+    Content hash of a file, recomputed only when its modification time changes.
+    """
+    return _file_digest(path, os.stat(path).st_mtime_ns)
+
+def input_fingerprint(name, module, user_input):
+    """
+    Hash of everything an agent's result depends on: the input fields the agent declares in
+    INPUT_FIELDS, the agent's code and SCHEMA (which hold its prompt), the shared prompt code,
+    the chat model and agent mode, and for agents that also read external state (the lean
+    agent's corpus, the tech knowledge base) the versions returned by their dependency_versions().
+    An agent without INPUT_FIELDS depends on the whole input.
+    """
+    from utils.llm import CHAT_MODEL
+    from utils.structured_output import AGENT_MODE
+    fields = getattr(module, "INPUT_FIELDS", None)
+    values = {field: user_input.get(field) for field in fields} if fields is not None else user_input
+    dependency_versions = getattr(module, "dependency_versions", None)
+    payload = {
+        "agent": name,
+        "fields": values,
+        "code": [file_version(path) for path in (module.__file__, *SHARED_CODE_FILES)],
+        "schema": getattr(module, "SCHEMA", None),
+        "model": CHAT_MODEL,
+        "agentMode": AGENT_MODE,
+        "versions": dependency_versions() if dependency_versions else None,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class AgentResultStore:
+    """
+    SQLite store of the latest successful result of each agent for each report, with the input
+    fingerprint it was computed from. Safe to share between threads and processes.
+    """
+
+    def __init__(self, path=AGENT_RESULTS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "report_id TEXT NOT NULL, agent TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+            "result TEXT NOT NULL, updated_at REAL NOT NULL, PRIMARY KEY (report_id, agent))"
+        )
+        self._conn.commit()
+
+    def load(self, report_id):
+        """
+        Returns {agent: (fingerprint, result)} stored for the report.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT agent, fingerprint, result FROM results WHERE report_id = ?", (str(report_id),)
+            ).fetchall()
+        return {agent: (fingerprint, json.loads(result)) for agent, fingerprint, result in rows}
+
+    def save(self, report_id, agent, fingerprint, result):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (report_id, agent, fingerprint, result, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (str(report_id), agent, fingerprint, json.dumps(result), time.time()),
+            )
+            self._conn.commit()
+
+    def delete(self, report_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM results WHERE report_id = ?", (str(report_id),))
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            reports, results = self._conn.execute("SELECT COUNT(DISTINCT report_id), COUNT(*) FROM results").fetchone()
+        return {"reports": reports, "results": results}
+
+@lru_cache(maxsize=None)
+def get_agent_result_store():
+    """
+    Returns the process-wide store shared by all reports.
+    """
+    return AgentResultStore()
+
+def main():
+    """
+    Prints store statistics or forgets the stored results of one report.
+    """
+    parser = argparse.ArgumentParser(description="Inspect the per-agent results kept for incremental re-evaluation.")
+    parser.add_argument("command", choices=["stats", "forget"])
+    parser.add_argument("report_id", nargs="?", help="Report whose results to forget.")
+    args = parser.parse_args()
+
+    store = get_agent_result_store()
+    if args.command == "forget":
+        if not args.report_id:
+            parser.error("forget needs a report_id")
+        store.delete(args.report_id)
+    json.dump(store.stats(), sys.stdout)
+    print()
+
+if __name__ == "__main__":
+    main()
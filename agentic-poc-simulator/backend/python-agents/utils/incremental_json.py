@@ -0,0 +1,156 @@
+import re
+import sys
+import json
+import time
+import argparse
+
+# Next character that ends or escapes a JSON string
+STRING_SPECIAL = re.compile(r'["\\]')
+SCALAR_END = ",}] \t\r\n"
+
+class IncrementalJSONParser:
+    """
+    Parses a JSON object as it streams in and reports each value the moment it is complete.
+    feed() returns [(path, value)] for values finished by that chunk, where path is the tuple of
+    keys and array indexes leading to the value; only values up to max_depth deep are reported,
+    so with the default of 2 every top-level key and every item of a top-level array surfaces.
+    Text before the first "{" or "[" (code fences, prose) and after the closing bracket is ignored.
+    """
+
+    def __init__(self, max_depth=2):
+        self.max_depth = max_depth
+        self.buffer = ""
+        self.position = 0
+        self.started = False
+        self.done = False
+        # One frame per open container: [kind, key or index of the current child, child start, expecting a key]
+        self.stack = []
+        self.string_start = None
+        self.scalar_start = None
+
+    def feed(self, text):
+        if self.done or not text:
+            return []
+        self.buffer += text
+        completed = []
+        buffer = self.buffer
+        i = self.position
+        end = len(buffer)
+        while i < end:
+            if self.string_start is not None:
+                match = STRING_SPECIAL.search(buffer, i)
+                if match is None:
+                    i = end
+                    break
+                i = match.start()
+                if buffer[i] == "\\":
+                    if i + 1 >= end:
+                        # Wait for the escaped character before moving past the backslash
+                        break
+                    i += 2
+                    continue
+                self._end_string(i + 1, completed)
+                i += 1
+                continue
+
+            char = buffer[i]
+            if not self.started:
+                if char in "{[":
+                    self.started = True
+                    self.stack.append([char, None if char == "{" else 0, None, char == "{"])
+                i += 1
+                continue
+            if self.scalar_start is not None:
+                if char not in SCALAR_END:
+                    i += 1
+                    continue
+                self._complete(self.scalar_start, i, completed)
+                self.scalar_start = None
+            frame = self.stack[-1]
+            if char == '"':
+                self.string_start = i
+                if not frame[3]:
+                    frame[2] = i
+            elif char in "{[":
+                frame[2] = i
+                self.stack.append([char, None if char == "{" else 0, None, char == "{"])
+            elif char in "}]":
+                self.stack.pop()
+                if not self.stack:
+                    self.done = True
+                    i += 1
+                    break
+                self._complete(self.stack[-1][2], i + 1, completed)
+            elif char == ",":
+                if frame[0] == "[":
+                    frame[1] += 1
+                else:
+                    frame[3] = True
+            elif char not in ": \t\r\n":
+                self.scalar_start = i
+                frame[2] = i
+            i += 1
+        self.position = i
+        return completed
+
+    def _end_string(self, end, completed):
+        start, self.string_start = self.string_start, None
+        frame = self.stack[-1]
+        if frame[3]:
+            frame[1] = json.loads(self.buffer[start:end])
+            frame[3] = False
+        else:
+            self._complete(start, end, completed)
+
+    def _complete(self, start, end, completed):
+        if start is None or len(self.stack) > self.max_depth:
+            return
+        try:
+            value = json.loads(self.buffer[start:end])
+        except ValueError:
+            return
+        completed.append((tuple(frame[1] for frame in self.stack), value))
+
+def iter_completed(chunks, max_depth=2):
+    """
+    Yields (path, value) for every value completed across a stream of text chunks.
+    """
+    parser = IncrementalJSONParser(max_depth=max_depth)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+
+def main():
+    """
+    Prints the values surfaced while a JSON document is fed in small chunks, or benchmarks the parser.
+    """
+    parser = argparse.ArgumentParser(description="Incremental JSON parser for streamed LLM output.")
+    parser.add_argument("command", choices=["parse", "bench"])
+    parser.add_argument("--chunk-size", type=int, default=8, help="Characters per fed chunk.")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    text = sys.stdin.read() if args.command == "parse" else json.dumps({
+        "priorityChecklist": [f"Item {i}: verify \"quoted\" \\ escapes and unicode é" for i in range(20)],
+        "riskLevel": "Medium",
+        "score": 7.5,
+        "nested": {"ok": True, "missing": None},
+    })
+    chunks = [text[i:i + args.chunk_size] for i in range(0, len(text), args.chunk_size)]
+    if args.command == "parse":
+        for path, value in iter_completed(chunks):
+            print(json.dumps({"path": list(path), "value": value}))
+        return
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        for _ in iter_completed(chunks):
+            pass
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "documentChars": len(text),
+        "chunkSize": args.chunk_size,
+        "microsecondsPerDocument": round(elapsed / args.iterations * 1e6, 1),
+        "megabytesPerSecond": round(len(text) * args.iterations / elapsed / 1e6, 2),
+    }))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import os
+import sys
+from functools import lru_cache
+from dotenv import load_dotenv
+
+from utils.quota import quota_call, quota_stream, estimate_tokens
+from utils.tracing import span, tracing_callbacks
+
+# Load environment variables
+load_dotenv()
+gemini_api_key = os.getenv("GEMINI_API_KEY")
+if not gemini_api_key:
+    sys.exit("GEMINI_API_KEY not found in .env file")
+
+CHAT_MODEL = "models/gemini-1.5-flash"
+EMBEDDING_MODEL = "models/embedding-001"
+VECTOR_STORE_PATH = "../data/vector_store"
+# "chroma" (default) or "local" for the memory-mapped index built by rag/vector_store.py
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+VECTOR_INDEX_SEARCH = os.getenv("VECTOR_INDEX_SEARCH", "exact")
+# Output tokens reserved per chat call until the real usage is known
+CHAT_OUTPUT_TOKEN_ESTIMATE = 512
+
+def _usage_tokens(chat_result):
+    """
+    Total tokens reported for a chat generation, or None if the client does not report usage.
+    """
+    generations = getattr(chat_result, "generations", None) or []
+    usage = getattr(getattr(generations[0], "message", None), "usage_metadata", None) if generations else None
+    return usage.get("total_tokens") if isinstance(usage, dict) else None
+
+def _chunk_usage_tokens(chunk):
+    """
+    Total tokens reported on a streamed chunk; Gemini attaches usage to the last one.
+    """
+    usage = getattr(getattr(chunk, "message", None), "usage_metadata", None)
+    return usage.get("total_tokens") if isinstance(usage, dict) else None
+
+@lru_cache(maxsize=None)
+def _quota_limited_classes():
+    """
+    Gemini client subclasses that route every chat generation, streamed or not, and embedding request
+    through the shared quota scheduler (utils/quota.py). Subclassing keeps them valid LangChain models for agents.
+    """
+    from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+
+    class QuotaLimitedChat(ChatGoogleGenerativeAI):
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            tokens = estimate_tokens(" ".join(str(message.content) for message in messages)) + CHAT_OUTPUT_TOKEN_ESTIMATE
+            generate = super()._generate
+            return quota_call("chat", tokens, lambda: generate(messages, stop=stop, run_manager=run_manager, **kwargs),
+                              actual_tokens=_usage_tokens)
+
+        def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+            tokens = estimate_tokens(" ".join(str(message.content) for message in messages)) + CHAT_OUTPUT_TOKEN_ESTIMATE
+            stream = super()._stream
+            return quota_stream("chat", tokens, lambda: stream(messages, stop=stop, run_manager=run_manager, **kwargs),
+                                chunk_tokens=_chunk_usage_tokens)
+
+    class QuotaLimitedEmbeddings(GoogleGenerativeAIEmbeddings):
+        def embed_documents(self, texts, *args, **kwargs):
+            embed = super().embed_documents
+            tokens = sum(estimate_tokens(text) for text in texts)
+            with span("embed documents", "embedding", texts=len(texts), estimatedTokens=tokens):
+                return quota_call("embedding", tokens, lambda: embed(texts, *args, **kwargs))
+
+        def embed_query(self, text, *args, **kwargs):
+            embed = super().embed_query
+            with span("embed query", "embedding", estimatedTokens=estimate_tokens(text)):
+                return quota_call("embedding", estimate_tokens(text), lambda: embed(text, *args, **kwargs))
+
+    return QuotaLimitedChat, QuotaLimitedEmbeddings
+
+@lru_cache(maxsize=None)
+def get_llm(temperature=0):
+    """
+    Returns the shared Gemini chat client for a temperature, built on first use.
+    """
+    chat_class, _ = _quota_limited_classes()
+    # With tracing on, every call made through the client (direct or from an agent loop) is recorded
+    return chat_class(model=CHAT_MODEL, google_api_key=gemini_api_key, temperature=temperature,
+                      callbacks=tracing_callbacks() or None)
+
+@lru_cache(maxsize=None)
+def get_embeddings():
+    """
+    Returns the shared Gemini embedding client, built on first use.
+    """
+    _, embeddings_class = _quota_limited_classes()
+    return embeddings_class(model=EMBEDDING_MODEL, google_api_key=gemini_api_key)
+
+def get_vectorstore():
+    """
+    Returns the configured vector store: the persisted Chroma store, opened once per process,
+    or the local memory-mapped index when VECTOR_STORE_BACKEND=local, reopened whenever
+    `rag/vector_store.py convert` has published a new build.
+    """
+    if VECTOR_STORE_BACKEND == "local":
+        from rag.vector_store import get_local_index
+        return get_local_index(embedding_function=get_embeddings(), search=VECTOR_INDEX_SEARCH)
+    return _get_chroma()
+
+@lru_cache(maxsize=None)
+def _get_chroma():
+    from langchain_community.vectorstores import Chroma
+    return Chroma(persist_directory=VECTOR_STORE_PATH, embedding_function=get_embeddings())
@@ -0,0 +1,171 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from functools import lru_cache
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "../data/cache/llm_cache.sqlite3")
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+def cache_bypassed():
+    """
+    True when LLM_CACHE_BYPASS is set, which forces every call through to the API.
+    """
+    return os.getenv("LLM_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+
+def normalize_prompt(prompt):
+    return re.sub(r"\s+", " ", prompt).strip()
+
+def make_cache_key(namespace, prompt, model, temperature, context=""):
+    """
+    Builds the cache key from the normalized prompt, model, temperature and a hash of the retrieved context.
+    The namespace (usually the agent name) separates chains that would answer the same prompt differently.
+    """
+    context_hash = hashlib.sha256((context or "").encode("utf-8")).hexdigest()
+    payload = json.dumps([namespace, normalize_prompt(prompt), model, float(temperature), context_hash])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    """
+    SQLite-backed response cache with a TTL and least-recently-used eviction once the
+    stored responses exceed max_bytes. Safe to share between threads and processes.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl_seconds=LLM_CACHE_TTL_SECONDS, max_bytes=LLM_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+
+    def _count(self, name):
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, key):
+        """
+        Returns the cached response for key, or None if it is missing or older than the TTL.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] <= self.ttl_seconds:
+                self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                self._count("hits")
+                self._conn.commit()
+                self.hits += 1
+                return row[0]
+            if row:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._count("misses")
+            self._conn.commit()
+            self.misses += 1
+            return None
+
+    def put(self, key, response):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def stats(self):
+        """
+        Returns entry count, stored bytes and hit/miss counters for this process and for all processes.
+        """
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            totals = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "totalHits": totals.get("hits", 0),
+            "totalMisses": totals.get("misses", 0),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.execute("DELETE FROM counters")
+            self._conn.commit()
+
+@lru_cache(maxsize=None)
+def get_llm_cache():
+    """
+    Returns the process-wide cache shared by all agents.
+    """
+    return LLMCache()
+
+def cached_llm_call(namespace, prompt, call, model, temperature, context="", bypass=False):
+    """
+    Returns call(prompt), served from the shared cache when the same normalized prompt was
+    already answered by the same model, temperature and retrieved context.
+    """
+    if bypass or cache_bypassed():
+        return call(prompt)
+    cache = get_llm_cache()
+    key = make_cache_key(namespace, prompt, model, temperature, context)
+    response = cache.get(key)
+    if response is not None:
+        return response
+    response = call(prompt)
+    if isinstance(response, str):
+        cache.put(key, response)
+    return response
+
+def main():
+    """
+    Prints cache statistics or clears the cache.
+    """
+    parser = argparse.ArgumentParser(description="Inspect or clear the shared LLM response cache.")
+    parser.add_argument("command", choices=["stats", "clear"])
+    args = parser.parse_args()
+
+    cache = get_llm_cache()
+    if args.command == "clear":
+        cache.clear()
+    json.dump(cache.stats(), sys.stdout)
+    print()
+
+if __name__ == "__main__":
+    main()
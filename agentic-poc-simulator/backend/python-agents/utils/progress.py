@@ -0,0 +1,63 @@
+import sys
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Receives each progress event dict; None (the default) turns emit() into a no-op
+_sink = contextvars.ContextVar("progress_sink", default=None)
+
+@contextmanager
+def progress_sink(write):
+    """
+    Sends the progress events emitted by the enclosed code, including agent threads started with
+    a copy of this context, to write(event).
+    """
+    token = _sink.set(write)
+    try:
+        yield
+    finally:
+        _sink.reset(token)
+
+def streaming_enabled():
+    return _sink.get() is not None
+
+def emit(event, **fields):
+    """
+    Emits one progress event, e.g. emit("retrieval", agent="lean_agent", chunks=4).
+    """
+    write = _sink.get()
+    if write is not None:
+        write({"event": event, "timestampMs": int(time.time() * 1000), **fields})
+
+def ndjson_writer(out):
+    """
+    Returns a thread-safe write(event) that prints each event as one JSON line and flushes it.
+    """
+    lock = threading.Lock()
+
+    def write(event):
+        line = json.dumps(event) + "\n"
+        with lock:
+            out.write(line)
+            out.flush()
+    return write
+
+def run_streaming(name, func, *args, **kwargs):
+    """
+    Runs func with progress events written to stdout as NDJSON: "started", the events emitted
+    while it runs, then "result" with its return value (or "error", after which the exception
+    is re-raised). Anything else printed to stdout goes to stderr so the stream stays parseable.
+    """
+    write = ndjson_writer(sys.stdout)
+    sys.stdout = sys.stderr
+    with progress_sink(write):
+        emit("started", agent=name)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            emit("error", agent=name, error=f"{type(e).__name__}: {e}")
+            raise
+        emit("result", agent=name, result=result)
+    return result
@@ -0,0 +1,337 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import lru_cache
+
+from utils.tracing import span, instant
+
+QUOTA_DB_PATH = os.getenv("QUOTA_DB_PATH", "../data/cache/quota.sqlite3")
+# Per-minute limits as (requests, tokens) for each Gemini resource
+QUOTAS = {
+    "chat": (float(os.getenv("GEMINI_CHAT_RPM", "15")), float(os.getenv("GEMINI_CHAT_TPM", "1000000"))),
+    "embedding": (float(os.getenv("GEMINI_EMBED_RPM", "1500")), float(os.getenv("GEMINI_EMBED_TPM", "1000000"))),
+}
+PRIORITIES = ("interactive", "batch")
+# Share of every bucket that batch work leaves untouched, so interactive requests never queue behind it
+QUOTA_BATCH_RESERVE = float(os.getenv("QUOTA_BATCH_RESERVE", "0.2"))
+QUOTA_MAX_RETRIES = int(os.getenv("QUOTA_MAX_RETRIES", "3"))
+# Used when a 429 carries no retry hint
+DEFAULT_RETRY_AFTER_SECONDS = 10.0
+# Upper bound on one sleep, so waiters notice refunds and unblocks from other processes
+MAX_SLEEP_SECONDS = 5.0
+
+RETRY_AFTER_PATTERN = re.compile(r"retry[\s_-]*(?:after|delay|in)\D{0,20}?(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+_priority = contextvars.ContextVar("quota_priority", default=os.getenv("QUOTA_PRIORITY", "interactive"))
+
+def quota_disabled():
+    return os.getenv("QUOTA_DISABLED", "").lower() in ("1", "true", "yes")
+
+@contextmanager
+def quota_priority(priority):
+    """
+    Runs the enclosed calls with a priority class ("interactive" or "batch").
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown quota priority: {priority}")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def estimate_tokens(text):
+    return len(text or "") // 4 + 1
+
+def is_rate_limit_error(error):
+    message = str(error).lower()
+    return (
+        type(error).__name__ in ("ResourceExhausted", "TooManyRequests", "RateLimitError")
+        or "429" in message
+        or "resource exhausted" in message
+        or "rate limit" in message
+    )
+
+def retry_after_seconds(error):
+    """
+    Seconds to wait from a rate-limit error: a Retry-After header, a retry_delay in the
+    message, or DEFAULT_RETRY_AFTER_SECONDS when the error gives no hint.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    header = headers.get("Retry-After") or headers.get("retry-after")
+    if header:
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            pass
+    match = RETRY_AFTER_PATTERN.search(str(error))
+    if match:
+        return float(match.group(1))
+    return DEFAULT_RETRY_AFTER_SECONDS
+
+class QuotaScheduler:
+    """
+    Token buckets for requests/min and tokens/min per resource, kept in SQLite so every process
+    on the host (API workers, orchestrator, ingestion, batch jobs) draws from the same quota.
+    Each take is one short IMMEDIATE transaction; a caller that cannot take sleeps exactly until
+    its bucket has refilled, so throughput stays at the ceiling without fixed delays.
+    """
+
+    def __init__(self, path=QUOTA_DB_PATH, quotas=QUOTAS, batch_reserve=QUOTA_BATCH_RESERVE):
+        self.path = path
+        self.quotas = quotas
+        self.batch_reserve = batch_reserve
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS blocks (resource TEXT PRIMARY KEY, until REAL NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS waits ("
+            "resource TEXT NOT NULL, priority TEXT NOT NULL, requests INTEGER NOT NULL, "
+            "total_wait REAL NOT NULL, max_wait REAL NOT NULL, throttled INTEGER NOT NULL, "
+            "PRIMARY KEY (resource, priority))"
+        )
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _level(self, conn, name, capacity, now):
+        row = conn.execute("SELECT level, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return capacity
+        return min(capacity, row[0] + (now - row[1]) * capacity / 60.0)
+
+    def try_acquire(self, resource, tokens, priority):
+        """
+        Takes one request and the tokens from the resource's buckets if both have room.
+        Returns 0 on success, otherwise the seconds until they will.
+        """
+        requests_per_minute, tokens_per_minute = self.quotas[resource]
+        reserve = self.batch_reserve if priority == "batch" else 0.0
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT until FROM blocks WHERE resource = ?", (resource,)).fetchone()
+            if row and row[0] > now:
+                return row[0] - now
+            buckets = [
+                (f"{resource}:requests", requests_per_minute, 1.0),
+                (f"{resource}:tokens", tokens_per_minute, min(float(tokens), tokens_per_minute)),
+            ]
+            wait = 0.0
+            levels = []
+            for name, capacity, cost in buckets:
+                level = self._level(conn, name, capacity, now)
+                needed = cost + reserve * capacity
+                if level < needed:
+                    wait = max(wait, (needed - level) * 60.0 / capacity)
+                levels.append((name, level - cost))
+            if wait > 0:
+                return wait
+            conn.executemany(
+                "INSERT INTO buckets (name, level, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET level = excluded.level, updated = excluded.updated",
+                [(name, level, now) for name, level in levels],
+            )
+        return 0.0
+
+    def acquire(self, resource, tokens=1, priority=None):
+        """
+        Blocks until the request fits the quota and returns the seconds spent waiting.
+        """
+        priority = priority or _priority.get()
+        start = time.monotonic()
+        while True:
+            wait = self.try_acquire(resource, tokens, priority)
+            if wait <= 0:
+                break
+            time.sleep(min(wait, MAX_SLEEP_SECONDS))
+        waited = time.monotonic() - start
+        self._record(resource, priority, waited, throttled=0)
+        return waited
+
+    def settle(self, resource, estimated_tokens, actual_tokens):
+        """
+        Corrects the token bucket once the real usage of a call is known: unused estimate is
+        refunded and an overshoot is charged, possibly taking the bucket below zero.
+        """
+        _, tokens_per_minute = self.quotas[resource]
+        name = f"{resource}:tokens"
+        now = time.time()
+        with self._transaction() as conn:
+            level = self._level(conn, name, tokens_per_minute, now) + estimated_tokens - actual_tokens
+            conn.execute(
+                "INSERT INTO buckets (name, level, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET level = excluded.level, updated = excluded.updated",
+                (name, min(level, tokens_per_minute), now),
+            )
+
+    def block(self, resource, seconds, priority=None):
+        """
+        Pauses the resource for every process after the API answered 429, honoring Retry-After.
+        """
+        until = time.time() + seconds
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO blocks (resource, until) VALUES (?, ?) "
+                "ON CONFLICT(resource) DO UPDATE SET until = MAX(until, excluded.until)",
+                (resource, until),
+            )
+        self._record(resource, priority or _priority.get(), 0.0, throttled=1)
+
+    def _record(self, resource, priority, waited, throttled):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO waits (resource, priority, requests, total_wait, max_wait, throttled) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(resource, priority) DO UPDATE SET requests = requests + excluded.requests, "
+                "total_wait = total_wait + excluded.total_wait, max_wait = MAX(max_wait, excluded.max_wait), "
+                "throttled = throttled + excluded.throttled",
+                (resource, priority, 0 if throttled else 1, waited, waited, throttled),
+            )
+
+    def stats(self):
+        """
+        Returns current bucket levels and queue-wait metrics per resource and priority, across processes.
+        """
+        now = time.time()
+        with self._lock:
+            waits = self._conn.execute(
+                "SELECT resource, priority, requests, total_wait, max_wait, throttled FROM waits ORDER BY resource, priority"
+            ).fetchall()
+            blocks = dict(self._conn.execute("SELECT resource, until FROM blocks").fetchall())
+            buckets = {}
+            for resource, (requests_per_minute, tokens_per_minute) in self.quotas.items():
+                buckets[resource] = {
+                    "requestsPerMinute": requests_per_minute,
+                    "tokensPerMinute": tokens_per_minute,
+                    "requestsAvailable": round(self._level(self._conn, f"{resource}:requests", requests_per_minute, now), 2),
+                    "tokensAvailable": round(self._level(self._conn, f"{resource}:tokens", tokens_per_minute, now)),
+                    "blockedForSeconds": round(max(0.0, blocks.get(resource, 0.0) - now), 2),
+                }
+        return {
+            "buckets": buckets,
+            "waits": [
+                {
+                    "resource": resource,
+                    "priority": priority,
+                    "requests": requests,
+                    "meanWaitMs": round(total_wait / requests * 1000, 1) if requests else 0.0,
+                    "maxWaitMs": round(max_wait * 1000, 1),
+                    "throttled": throttled,
+                }
+                for resource, priority, requests, total_wait, max_wait, throttled in waits
+            ],
+        }
+
+    def reset(self):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM buckets")
+            conn.execute("DELETE FROM blocks")
+            conn.execute("DELETE FROM waits")
+
+@lru_cache(maxsize=None)
+def get_quota_scheduler():
+    """
+    Returns the process-wide scheduler; all instances on the host share state through QUOTA_DB_PATH.
+    """
+    return QuotaScheduler()
+
+def _traced_acquire(scheduler, resource, tokens):
+    with span("quota wait", "quota", resource=resource, tokens=tokens) as traced:
+        waited = scheduler.acquire(resource, tokens)
+        traced.set(waitedMs=round(waited * 1000, 1))
+
+def _pause_after_rate_limit(scheduler, resource, error, attempt):
+    delay = retry_after_seconds(error)
+    print(f"[quota.py] {resource} rate limited, pausing {delay:g}s (attempt {attempt + 1})", file=sys.stderr)
+    instant("quota retry", "quota", resource=resource, attempt=attempt + 1, delaySeconds=delay)
+    scheduler.block(resource, delay)
+
+def quota_call(resource, tokens, call, actual_tokens=None):
+    """
+    Runs call() once the quota allows it. A rate-limit error pauses the resource for all
+    processes for its Retry-After and is retried up to QUOTA_MAX_RETRIES times.
+    actual_tokens(result), if given, returns the real token usage to settle the estimate.
+    """
+    if quota_disabled():
+        return call()
+    scheduler = get_quota_scheduler()
+    for attempt in range(QUOTA_MAX_RETRIES + 1):
+        _traced_acquire(scheduler, resource, tokens)
+        try:
+            result = call()
+        except Exception as e:
+            if attempt == QUOTA_MAX_RETRIES or not is_rate_limit_error(e):
+                raise
+            _pause_after_rate_limit(scheduler, resource, e, attempt)
+            continue
+        used = actual_tokens(result) if actual_tokens else None
+        if used:
+            scheduler.settle(resource, tokens, used)
+        return result
+
+def quota_stream(resource, tokens, start, chunk_tokens=None):
+    """
+    quota_call for streamed responses: start() returns an iterator of chunks, which is yielded
+    through. A rate-limit error before the first chunk is retried like in quota_call; once
+    chunks have been passed on, errors propagate. chunk_tokens(chunk), if given, returns the
+    usage reported on a chunk, and the largest one settles the estimate.
+    """
+    if quota_disabled():
+        yield from start()
+        return
+    scheduler = get_quota_scheduler()
+    for attempt in range(QUOTA_MAX_RETRIES + 1):
+        _traced_acquire(scheduler, resource, tokens)
+        started = False
+        used = None
+        try:
+            for chunk in start():
+                started = True
+                reported = chunk_tokens(chunk) if chunk_tokens else None
+                used = max(used or 0, reported) if reported else used
+                yield chunk
+        except Exception as e:
+            if started or attempt == QUOTA_MAX_RETRIES or not is_rate_limit_error(e):
+                raise
+            _pause_after_rate_limit(scheduler, resource, e, attempt)
+            continue
+        if used:
+            scheduler.settle(resource, tokens, used)
+        return
+
+def main():
+    """
+    Prints bucket levels and queue-wait metrics, or resets the shared quota state.
+    """
+    parser = argparse.ArgumentParser(description="Inspect or reset the shared Gemini quota scheduler.")
+    parser.add_argument("command", choices=["stats", "reset"])
+    args = parser.parse_args()
+
+    scheduler = get_quota_scheduler()
+    if args.command == "reset":
+        scheduler.reset()
+    json.dump(scheduler.stats(), sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import os
+import re
+import json
+from langchain.callbacks.base import BaseCallbackHandler
+
+from utils.llm import get_llm, CHAT_MODEL
+from utils.llm_cache import cached_llm_call
+from utils.incremental_json import IncrementalJSONParser
+from utils.progress import emit, streaming_enabled
+from utils.tracing import span, tracing_callbacks
+
+# "direct" runs the agent's tool locally and makes one schema-constrained LLM call;
+# "react" keeps the zero-shot ReAct agent loop
+AGENT_MODE = os.getenv("AGENT_MODE", "direct")
+TOOL_OUTPUT_MAX_CHARS = 1500
+REPAIR_INPUT_MAX_CHARS = 2000
+
+TYPE_NAMES = {"string": "string", "number": "number", "array": "array of strings"}
+
+class LLMCallCounter(BaseCallbackHandler):
+    """
+    Counts LLM requests. Used as a LangChain callback for agent loops, or through wrap()
+    for direct calls; responses served from the cache are not counted.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.calls += 1
+
+    on_chat_model_start = on_llm_start
+
+    def wrap(self, call):
+        def counted(prompt):
+            self.calls += 1
+            return call(prompt)
+        return counted
+
+def emit_partials(namespace, text, parser=None, max_depth=2):
+    """
+    Emits a "partial" event for every value of the response JSON completed by text.
+    Pass the same parser for each chunk of a stream; without one, text is a whole response.
+    """
+    parser = parser or IncrementalJSONParser(max_depth=max_depth)
+    for path, value in parser.feed(text):
+        emit("partial", agent=namespace, path=list(path), value=value)
+
+def streaming_call(llm, counter, namespace, max_depth=2):
+    """
+    Counted LLM call for cached_llm_call. While a progress sink is active the response is
+    streamed: each chunk is emitted as a "token" event and each completed key or array item
+    as a "partial" event. Otherwise it is a plain invoke.
+    """
+    def call(prompt):
+        counter.calls += 1
+        if not streaming_enabled():
+            return llm.invoke(prompt).content
+        parser = IncrementalJSONParser(max_depth=max_depth)
+        parts = []
+        for chunk in llm.stream(prompt):
+            text = chunk.content if isinstance(chunk.content, str) else ""
+            if not text:
+                continue
+            parts.append(text)
+            emit("token", agent=namespace, text=text)
+            emit_partials(namespace, text, parser)
+        return "".join(parts)
+    return call
+
+def extract_json(response):
+    """
+    Returns the JSON object in an LLM response, tolerating code fences and surrounding prose,
+    or None if there is none.
+    """
+    if not isinstance(response, str):
+        return None
+    cleaned = re.sub(r"^```json|^```|```$", "", response.strip(), flags=re.MULTILINE).strip()
+    try:
+        return json.loads(cleaned)
+    except Exception:
+        pass
+    start, end = cleaned.find("{"), cleaned.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    try:
+        return json.loads(cleaned[start:end + 1])
+    except Exception:
+        return None
+
+def describe_schema(schema):
+    """
+    Describes the expected object for a prompt. schema maps key -> (type, description),
+    with type one of "string", "number" or "array".
+    """
+    fields = ", ".join(
+        f'"{key}": {TYPE_NAMES[kind]}' + (f" ({description})" if description else "")
+        for key, (kind, description) in schema.items()
+    )
+    return f"{{{fields}}}"
+
+def schema_instructions(schema):
+    return f"Return ONLY a valid JSON object with exactly these keys: {describe_schema(schema)}. No markdown, no code block, no explanation."
+
+def _coerce(value, kind):
+    if kind == "number":
+        if isinstance(value, bool):
+            raise ValueError("expected a number")
+        if isinstance(value, (int, float)):
+            return value
+        match = re.search(r"-?\d+(?:\.\d+)?", str(value))
+        if not match:
+            raise ValueError("expected a number")
+        number = float(match.group())
+        return int(number) if number.is_integer() else number
+    if kind == "array":
+        if isinstance(value, list):
+            return [item if isinstance(item, str) else json.dumps(item) for item in value]
+        if isinstance(value, str) and value.strip():
+            return [value]
+        raise ValueError("expected an array of strings")
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return str(value)
+
+def validate(data, schema):
+    """
+    Checks data against the schema, coercing near misses (numbers given as "7/10", a single
+    string where an array is expected). Returns (cleaned, errors); cleaned is None on errors.
+    """
+    if not isinstance(data, dict):
+        return None, ["response is not a JSON object"]
+    cleaned = {}
+    errors = []
+    for key, (kind, _) in schema.items():
+        if key not in data or data[key] is None:
+            errors.append(f'missing key "{key}"')
+            continue
+        try:
+            cleaned[key] = _coerce(data[key], kind)
+        except ValueError as e:
+            errors.append(f'"{key}": {e}')
+    return (None, errors) if errors else (cleaned, [])
+
+def run_structured(namespace, task, schema, tool_name, tool_output, agent=None, temperature=0,
+                   max_tool_chars=TOOL_OUTPUT_MAX_CHARS):
+    """
+    Runs one agent request and returns (result, response, llm_calls).
+    In direct mode the tool output is inlined and a single LLM call is made; in react mode the
+    agent loop is run. Output that fails validation gets at most one repair call. result is
+    None when even the repaired output is invalid, in which case callers fall back to defaults.
+    Under a progress sink the direct call is streamed as "token" and "partial" events.
+    """
+    counter = LLMCallCounter()
+    direct = not (AGENT_MODE == "react" and agent is not None)
+    context = ""
+    if not direct:
+        prompt = f"{task} {schema_instructions(schema)}"
+        # The agent's tools fetch their own data, so key the cache on what they currently return
+        # (e.g. retrieved context after a re-ingest), as the direct prompt does by inlining it
+        context = tool_output
+        # The agent's model traces its own LLM calls; the run adds its tool calls
+        call = lambda text: agent.run(text, callbacks=[counter, *tracing_callbacks(llm=False)])
+    else:
+        output = tool_output[:max_tool_chars] if max_tool_chars else tool_output
+        prompt = f"{task}\n{tool_name} output: {output}\n{schema_instructions(schema)}"
+        llm = get_llm(temperature=temperature)
+        call = streaming_call(llm, counter, namespace)
+    with span("generate", "llm", agent=namespace, mode="direct" if direct else "react") as traced:
+        response = cached_llm_call(namespace, prompt, call, model=CHAT_MODEL, temperature=temperature, context=context)
+        traced.set(cacheHit=counter.calls == 0, llmCalls=counter.calls)
+    if streaming_enabled() and not (direct and counter.calls):
+        # Cache hits and agent loops produce no token stream, so surface the values from the whole response
+        emit_partials(namespace, str(response))
+    with span("parse", "parse", agent=namespace, responseChars=len(str(response))) as traced:
+        result, errors = validate(extract_json(response), schema)
+        traced.set(errors=len(errors))
+    if errors:
+        repair_prompt = (
+            f"The following output should be a JSON object but has these problems: {'; '.join(errors)}.\n"
+            f"Output: {str(response)[:REPAIR_INPUT_MAX_CHARS]}\n"
+            f"Rewrite it keeping its content. {schema_instructions(schema)}"
+        )
+        llm = get_llm(temperature=0)
+        with span("repair", "parse", agent=namespace, errors=len(errors)) as traced:
+            repaired = cached_llm_call(
+                f"{namespace}:repair", repair_prompt, counter.wrap(lambda text: llm.invoke(text).content),
+                model=CHAT_MODEL, temperature=0,
+            )
+            result, _ = validate(extract_json(repaired), schema)
+            traced.set(repaired=result is not None)
+    return result, response, counter.calls
@@ -0,0 +1,364 @@
+import os
+import sys
+import json
+import time
+import atexit
+import argparse
+import itertools
+import threading
+import contextvars
+from collections import defaultdict
+from functools import lru_cache
+
+# Unset disables tracing. "{pid}" in the path is replaced by the process id.
+TRACE_PATH = os.getenv("TRACE_PATH")
+# "jsonl" appends one line per finished span, safe for several processes sharing a file;
+# "chrome" writes a Chrome trace (chrome://tracing, Perfetto) when the process exits
+TRACE_FORMAT = os.getenv("TRACE_FORMAT", "jsonl")
+TRACE_FORMATS = ("jsonl", "chrome")
+# USD per million tokens for cost estimates on LLM spans (gemini-1.5-flash list prices)
+LLM_INPUT_COST_PER_MILLION = float(os.getenv("LLM_INPUT_COST_PER_MILLION", "0.075"))
+LLM_OUTPUT_COST_PER_MILLION = float(os.getenv("LLM_OUTPUT_COST_PER_MILLION", "0.30"))
+
+_current_span = contextvars.ContextVar("trace_span", default=None)
+_span_ids = itertools.count(1)
+
+def _new_span_id():
+    # Prefixed with the pid: batch and ingest worker processes write to the same trace
+    return f"{os.getpid()}-{next(_span_ids)}"
+
+def _now_us():
+    return time.time_ns() // 1000
+
+def process_start_us():
+    """
+    Process start in epoch microseconds, so a startup span covers interpreter start and imports.
+    Falls back to the time this module was imported where /proc is not available.
+    """
+    try:
+        with open("/proc/self/stat", "r") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat", "r") as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+        return int((boot_time + start_ticks / os.sysconf("SC_CLK_TCK")) * 1_000_000)
+    except Exception:
+        return _MODULE_IMPORT_US
+
+_MODULE_IMPORT_US = _now_us()
+
+class Span:
+    """
+    One timed operation. Attributes added with set() are exported as the span's args.
+    """
+
+    __slots__ = ("tracer", "name", "category", "args", "id", "parent", "start_us", "_start", "_token")
+
+    def __init__(self, tracer, name, category, args, parent):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.id = _new_span_id()
+        self.parent = parent
+        self.start_us = _now_us()
+        self._start = time.perf_counter()
+        self._token = None
+
+    def set(self, **args):
+        self.args.update(args)
+        return self
+
+    def finish(self, error=None):
+        if error is not None:
+            self.args["error"] = f"{type(error).__name__}: {error}"
+        self.tracer.export(self, (time.perf_counter() - self._start) * 1e6)
+
+    def __enter__(self):
+        self._token = _current_span.set(self.id)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        _current_span.reset(self._token)
+        self.finish(exc)
+        return False
+
+class _NoopSpan:
+    """
+    Returned when tracing is disabled: entering, setting and finishing cost one method call.
+    """
+
+    __slots__ = ()
+
+    def set(self, **args):
+        return self
+
+    def finish(self, error=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+NOOP_SPAN = _NoopSpan()
+
+class Tracer:
+    """
+    Records finished spans as JSON lines or collects them for a Chrome trace written at exit.
+    """
+
+    def __init__(self, path, trace_format="jsonl"):
+        if trace_format not in TRACE_FORMATS:
+            raise ValueError(f"Unknown trace format: {trace_format}")
+        self.path = path.replace("{pid}", str(os.getpid()))
+        self.format = trace_format
+        self._lock = threading.Lock()
+        self._events = []
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if trace_format == "jsonl":
+            self._file = open(self.path, "a", encoding="utf-8")
+            atexit.register(self._file.close)
+        else:
+            atexit.register(self.write_chrome)
+
+    def start(self, name, category, **args):
+        return Span(self, name, category, args, _current_span.get())
+
+    def export(self, span, duration_us):
+        record = {
+            "name": span.name,
+            "cat": span.category,
+            "ts": span.start_us,
+            "durMs": round(duration_us / 1000, 3),
+            # Read per span: pool processes forked from a traced process append to the same file
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "id": span.id,
+            "parent": span.parent,
+            "args": span.args,
+        }
+        self._write(record)
+
+    def instant(self, name, category, **args):
+        self._write({"name": name, "cat": category, "ts": _now_us(), "durMs": None, "pid": os.getpid(),
+                     "tid": threading.get_ident(), "id": _new_span_id(), "parent": _current_span.get(), "args": args})
+
+    def _write(self, record):
+        if self.format == "jsonl":
+            line = json.dumps(record, default=str) + "\n"
+            with self._lock:
+                self._file.write(line)
+                self._file.flush()
+        else:
+            with self._lock:
+                self._events.append(record)
+
+    def write_chrome(self):
+        with self._lock:
+            events = list(self._events)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(to_chrome_trace(events), f, default=str)
+
+_tracer = Tracer(TRACE_PATH, TRACE_FORMAT) if TRACE_PATH else None
+
+def tracing_enabled():
+    return _tracer is not None
+
+def span(name, category="app", **args):
+    """
+    Context manager timing the enclosed block, nested under the enclosing span:
+        with span("retrieval", "rag", mode="hybrid") as s:
+            ...
+            s.set(chunks=4)
+    """
+    if _tracer is None:
+        return NOOP_SPAN
+    return _tracer.start(name, category, **args)
+
+def start_span(name, category="app", **args):
+    """
+    Starts a span that is finished explicitly with finish(), for operations that begin and end
+    in different callbacks. It is not made the parent of spans started meanwhile.
+    """
+    if _tracer is None:
+        return NOOP_SPAN
+    return _tracer.start(name, category, **args)
+
+def record_span(name, category, start_us, **args):
+    """
+    Records a span that started at start_us (epoch microseconds) and ends now.
+    """
+    if _tracer is not None:
+        span_ = _tracer.start(name, category, **args)
+        span_.start_us = start_us
+        _tracer.export(span_, _now_us() - start_us)
+
+def instant(name, category="app", **args):
+    """
+    Records a point-in-time event such as a retry.
+    """
+    if _tracer is not None:
+        _tracer.instant(name, category, **args)
+
+def record_startup(name):
+    """
+    Records a "startup" span from process start until now: interpreter start, imports and
+    module-level construction of a script.
+    """
+    record_span("startup", "import", process_start_us(), script=name)
+
+def tracing_callbacks(llm=True):
+    """
+    LangChain callbacks to attach to models and agents; empty when tracing is disabled.
+    With llm=False only tool calls are recorded, for agents whose models already trace their calls.
+    """
+    return [_callback_handler_class()(llm=llm)] if _tracer is not None else []
+
+def _usage_from_result(response):
+    """
+    (prompt tokens, completion tokens) from an LLMResult, or (None, None) if usage is not reported.
+    """
+    for generations in getattr(response, "generations", None) or []:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if isinstance(usage, dict):
+                return usage.get("input_tokens"), usage.get("output_tokens")
+    usage = (getattr(response, "llm_output", None) or {}).get("usage_metadata") or {}
+    return usage.get("input_tokens") or usage.get("prompt_token_count"), usage.get("output_tokens") or usage.get("candidates_token_count")
+
+class TracingCallbacks:
+    """
+    Records a span per LLM call (with prompt and completion tokens, estimated cost and client
+    retries) and per tool call, for direct calls and for every step of a ReAct loop alike.
+    Combined with LangChain's BaseCallbackHandler by _callback_handler_class, so modules that
+    only record spans do not import LangChain.
+    """
+
+    def __init__(self, llm=True):
+        super().__init__()
+        self.llm = llm
+        self._spans = {}
+
+    @property
+    def ignore_llm(self):
+        return not self.llm
+
+    @property
+    def ignore_chat_model(self):
+        return not self.llm
+
+    @property
+    def ignore_retry(self):
+        return not self.llm
+
+    def _start(self, run_id, name, category, **args):
+        self._spans[run_id] = start_span(name, category, **args)
+
+    def _finish(self, run_id, error=None, **args):
+        span_ = self._spans.pop(run_id, None)
+        if span_ is not None:
+            span_.set(**args).finish(error)
+
+    def on_llm_start(self, serialized, prompts, run_id=None, **kwargs):
+        self._start(run_id, "llm", "llm", promptChars=sum(len(prompt) for prompt in prompts))
+
+    def on_chat_model_start(self, serialized, messages, run_id=None, **kwargs):
+        chars = sum(len(str(message.content)) for batch in messages for message in batch)
+        self._start(run_id, "llm", "llm", promptChars=chars)
+
+    def on_llm_end(self, response, run_id=None, **kwargs):
+        prompt_tokens, completion_tokens = _usage_from_result(response)
+        cost = None
+        if prompt_tokens is not None and completion_tokens is not None:
+            cost = round((prompt_tokens * LLM_INPUT_COST_PER_MILLION + completion_tokens * LLM_OUTPUT_COST_PER_MILLION) / 1e6, 8)
+        self._finish(run_id, promptTokens=prompt_tokens, completionTokens=completion_tokens, costUsd=cost)
+
+    def on_retry(self, retry_state, run_id=None, **kwargs):
+        span_ = self._spans.get(run_id)
+        if span_ is not None:
+            span_.set(retries=span_.args.get("retries", 0) + 1)
+
+    def on_llm_error(self, error, run_id=None, **kwargs):
+        self._finish(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, run_id=None, **kwargs):
+        self._start(run_id, f"tool {(serialized or {}).get('name', 'unknown')}", "tool", inputChars=len(str(input_str)))
+
+    def on_tool_end(self, output, run_id=None, **kwargs):
+        self._finish(run_id, outputChars=len(str(output)))
+
+    def on_tool_error(self, error, run_id=None, **kwargs):
+        self._finish(run_id, error)
+
+@lru_cache(maxsize=None)
+def _callback_handler_class():
+    from langchain.callbacks.base import BaseCallbackHandler
+    return type("TracingCallbackHandler", (TracingCallbacks, BaseCallbackHandler), {})
+
+def to_chrome_trace(records):
+    """
+    Converts span records to the Chrome trace event format.
+    """
+    events = []
+    for record in records:
+        args = dict(record.get("args") or {}, id=record.get("id"), parent=record.get("parent"))
+        event = {"name": record["name"], "cat": record["cat"], "ts": record["ts"], "pid": record["pid"], "tid": record["tid"], "args": args}
+        if record.get("durMs") is None:
+            event.update(ph="i", s="t")
+        else:
+            event.update(ph="X", dur=round(record["durMs"] * 1000))
+        events.append(event)
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def read_records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def summarize(records):
+    """
+    Per span name: count, total, mean and max duration, plus summed tokens and cost.
+    """
+    groups = defaultdict(list)
+    for record in records:
+        groups[(record["cat"], record["name"])].append(record)
+    rows = []
+    for (category, name), items in groups.items():
+        durations = [item["durMs"] for item in items if item.get("durMs") is not None]
+        row = {"category": category, "name": name, "count": len(items)}
+        if durations:
+            row.update(totalMs=round(sum(durations), 3), meanMs=round(sum(durations) / len(durations), 3), maxMs=round(max(durations), 3))
+        for key in ("promptTokens", "completionTokens", "costUsd", "retries"):
+            values = [item["args"].get(key) for item in items if isinstance(item.get("args", {}).get(key), (int, float))]
+            if values:
+                row[key] = sum(values)
+        rows.append(row)
+    rows.sort(key=lambda row: row.get("totalMs", 0), reverse=True)
+    return rows
+
+def main():
+    """
+    Summarizes a JSON-lines trace, or converts one (from any number of processes) into a Chrome trace.
+    """
+    parser = argparse.ArgumentParser(description="Inspect traces written with TRACE_PATH.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    summary_parser = subparsers.add_parser("summary", help="Time and tokens per span name.")
+    summary_parser.add_argument("trace", help="JSON-lines trace file.")
+    chrome_parser = subparsers.add_parser("chrome", help="Convert to a Chrome trace for chrome://tracing or Perfetto.")
+    chrome_parser.add_argument("trace", help="JSON-lines trace file.")
+    chrome_parser.add_argument("output", help="Chrome trace file to write.")
+    args = parser.parse_args()
+
+    records = read_records(args.trace)
+    if args.command == "summary":
+        json.dump(summarize(records), sys.stdout, indent=2)
+        print()
+        return
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(to_chrome_trace(records), f)
+    print(f"Wrote {len(records)} events to {args.output}")
+
+if __name__ == "__main__":
+    main()